@@ -3,6 +3,11 @@ from importlib import metadata
 from django_ai_assistant.helpers.assistants import (
     AIAssistant,
 )
+from django_ai_assistant.helpers.cancellation import CancelToken
+from django_ai_assistant.helpers.resilience import CircuitBreaker, RetryPolicy
+from django_ai_assistant.helpers.retrievers import RetrieverIndex
+from django_ai_assistant.helpers.tool_cache import ToolCache
+from django_ai_assistant.langchain.checkpoint import DjangoCheckpointSaver
 from django_ai_assistant.langchain.tools import (
     BaseModel,
     BaseTool,
@@ -20,6 +25,12 @@ VERSION = __version__ = metadata.version(PACKAGE_NAME)
 
 __all__ = [
     "AIAssistant",
+    "CancelToken",
+    "CircuitBreaker",
+    "RetryPolicy",
+    "RetrieverIndex",
+    "ToolCache",
+    "DjangoCheckpointSaver",
     "BaseModel",
     "BaseTool",
     "Field",
@@ -5,13 +5,13 @@ from django.contrib.admin.options import InlineModelAdmin
 from django.urls import reverse
 from django.utils.safestring import mark_safe
 
-from django_ai_assistant.models import Message, Thread
+from django_ai_assistant.models import Message, Run, Thread
 
 
 class MessageInline(admin.TabularInline):
     model = Message
     extra = 0
-    fields = ("pk", "message_type", "content", "created_at")
+    fields = ("pk", "type", "content", "created_at")
     readonly_fields = fields
     ordering = ("created_at",)
     show_change_link = True
@@ -25,12 +25,6 @@ class MessageInline(admin.TabularInline):
         )
         return mark_safe(display_text)  # noqa: S308
 
-    def message_type(self, obj):
-        return obj.message.get("type") if obj.message else None
-
-    def content(self, obj):
-        return obj.message.get("data", {}).get("content") if obj.message else None
-
     def has_add_permission(self, request, obj=None):
         return False
 
@@ -52,7 +46,15 @@ class ThreadAdmin(admin.ModelAdmin):
 
 @admin.register(Message)
 class MessageAdmin(admin.ModelAdmin):
-    list_display = ("id", "thread", "created_at")
-    search_fields = ("thread__name", "message")
-    list_filter = ("created_at",)
+    list_display = ("id", "thread", "type", "created_at")
+    search_fields = ("thread__name", "content")
+    list_filter = ("created_at", "type", "has_tool_calls")
     raw_id_fields = ("thread",)
+
+
+@admin.register(Run)
+class RunAdmin(admin.ModelAdmin):
+    list_display = ("id", "thread", "assistant_id", "status", "created_at", "finished_at")
+    search_fields = ("thread__name", "assistant_id")
+    list_filter = ("created_at", "status")
+    raw_id_fields = ("thread", "created_by")
@@ -1,10 +1,11 @@
 from enum import Enum
+from typing import Any
 
 from django.utils import timezone
 
 from ninja import Field, ModelSchema, Schema
 
-from django_ai_assistant.models import Thread
+from django_ai_assistant.models import Run, Thread
 
 
 class Assistant(Schema):
@@ -47,3 +48,23 @@ class ThreadMessage(Schema):
     id: str  # noqa: A003
     type: ThreadMessageTypeEnum  # noqa: A003
     content: str
+
+
+class Run(ModelSchema):
+    output: Any = None
+    node_timings: list[dict[str, Any]]
+    tool_calls: list[dict[str, Any]]
+    token_usage: dict[str, Any] | None = None
+
+    class Meta:
+        model = Run
+        fields = (
+            "id",
+            "thread",
+            "assistant_id",
+            "status",
+            "error",
+            "created_at",
+            "started_at",
+            "finished_at",
+        )
@@ -1,16 +1,18 @@
-from typing import Any, List
+import json
+from typing import Any, AsyncIterator, List
 
-from django.http import Http404
+from django.http import Http404, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 
-from langchain_core.messages import message_to_dict
-from ninja import NinjaAPI
+from asgiref.sync import sync_to_async
+from ninja import NinjaAPI, Query
 from ninja.operation import Operation
 from ninja.security import django_auth
 
 from django_ai_assistant import PACKAGE_NAME, VERSION
 from django_ai_assistant.api.schemas import (
     Assistant,
+    Run,
     Thread,
     ThreadIn,
     ThreadMessage,
@@ -20,7 +22,9 @@ from django_ai_assistant.conf import app_settings
 from django_ai_assistant.decorators import with_cast_id
 from django_ai_assistant.exceptions import AIAssistantNotDefinedError, AIUserNotAllowedError
 from django_ai_assistant.helpers import use_cases
+from django_ai_assistant.helpers.runs import astream_run
 from django_ai_assistant.models import Message as MessageModel
+from django_ai_assistant.models import Run as RunModel
 from django_ai_assistant.models import Thread as ThreadModel
 
 
@@ -75,8 +79,22 @@ def get_assistant(request, assistant_id: str):
 
 
 @api.get("threads/", response=List[Thread], url_name="threads_list_create")
-def list_threads(request, assistant_id: str | None = None):
-    return list(use_cases.get_threads(user=request.user, assistant_id=assistant_id))
+def list_threads(
+    request,
+    assistant_id: str | None = None,
+    before: str | None = None,
+    limit: int | None = Query(None, ge=1),
+):
+    try:
+        return use_cases.get_threads(
+            user=request.user,
+            assistant_id=assistant_id,
+            request=request,
+            before=before,
+            limit=limit,
+        )
+    except ThreadModel.DoesNotExist:
+        raise Http404(f"No Thread with id={before} found") from None
 
 
 @api.post("threads/", response=Thread, url_name="threads_list_create")
@@ -122,13 +140,28 @@ def delete_thread(request, thread_id: Any):
     url_name="messages_list_create",
 )
 @with_cast_id
-def list_thread_messages(request, thread_id: Any):
+def list_thread_messages(
+    request,
+    thread_id: Any,
+    before: str | None = None,
+    after: str | None = None,
+    limit: int | None = Query(None, ge=1),
+):
     thread = get_object_or_404(ThreadModel, id=thread_id)
-    messages = use_cases.get_thread_messages(thread=thread, user=request.user, request=request)
-    return [message_to_dict(m)["data"] for m in messages]
+    try:
+        message_dicts = use_cases.get_thread_message_dicts(
+            thread=thread,
+            user=request.user,
+            request=request,
+            before=before,
+            after=after,
+            limit=limit,
+        )
+    except MessageModel.DoesNotExist:
+        raise Http404("Cursor message not found in this thread") from None
+    return [message_dict["data"] for message_dict in message_dicts]
 
 
-# TODO: Support content streaming
 @api.post(
     "threads/{thread_id}/messages/",
     response={201: None},
@@ -148,6 +181,92 @@ def create_thread_message(request, thread_id: Any, payload: ThreadMessageIn):
     return 201, None
 
 
+async def _as_server_sent_events(events: AsyncIterator[dict[str, Any]]) -> AsyncIterator[str]:
+    async for event in events:
+        yield f"event: {event['event']}\ndata: {json.dumps(event['data'])}\n\n"
+
+
+@api.post(
+    "threads/{thread_id}/messages/stream/",
+    response={200: None},
+    url_name="messages_stream",
+)
+@with_cast_id
+async def stream_thread_message(request, thread_id: Any, payload: ThreadMessageIn):
+    thread = await sync_to_async(get_object_or_404)(ThreadModel, id=thread_id)
+
+    events = await sync_to_async(use_cases.stream_message)(
+        assistant_id=payload.assistant_id,
+        thread=thread,
+        user=request.user,
+        content=payload.content,
+        request=request,
+    )
+    return StreamingHttpResponse(
+        _as_server_sent_events(events),
+        content_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@api.post(
+    "threads/{thread_id}/runs/",
+    response={202: Run},
+    url_name="runs_create",
+)
+@with_cast_id
+def create_thread_run(request, thread_id: Any, payload: ThreadMessageIn):
+    thread = get_object_or_404(ThreadModel, id=thread_id)
+
+    run = use_cases.create_run(
+        assistant_id=payload.assistant_id,
+        thread=thread,
+        user=request.user,
+        content=payload.content,
+        request=request,
+    )
+    return 202, run
+
+
+@api.get("runs/{run_id}/", response=Run, url_name="run_detail_cancel")
+@with_cast_id
+def get_run(request, run_id: Any):
+    try:
+        run = use_cases.get_single_run(run_id=run_id, user=request.user, request=request)
+    except RunModel.DoesNotExist:
+        raise Http404(f"No Run with id={run_id} found") from None
+    return run
+
+
+@api.delete("runs/{run_id}/", response={202: Run}, url_name="run_detail_cancel")
+@with_cast_id
+def cancel_run(request, run_id: Any):
+    run = get_object_or_404(RunModel.objects.select_related("thread"), id=run_id)
+    run = use_cases.cancel_run(run=run, user=request.user, request=request)
+    return 202, run
+
+
+async def _as_run_events(runs: AsyncIterator[RunModel]) -> AsyncIterator[dict[str, Any]]:
+    async for run in runs:
+        yield {"event": "status", "data": Run.from_orm(run).model_dump(mode="json")}
+
+
+@api.get("runs/{run_id}/stream/", response={200: None}, url_name="run_stream")
+@with_cast_id
+async def stream_run(request, run_id: Any):
+    try:
+        run = await sync_to_async(use_cases.get_single_run)(
+            run_id=run_id, user=request.user, request=request
+        )
+    except RunModel.DoesNotExist:
+        raise Http404(f"No Run with id={run_id} found") from None
+    return StreamingHttpResponse(
+        _as_server_sent_events(_as_run_events(astream_run(run))),
+        content_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @api.delete(
     "threads/{thread_id}/messages/{message_id}/", response={204: None}, url_name="messages_delete"
 )
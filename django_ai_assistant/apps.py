@@ -9,6 +9,8 @@ class AIAssistantConfig(AppConfig):
     name = "django_ai_assistant"
 
     def ready(self):
+        from django_ai_assistant import checks  # noqa: F401
+
         # import all ai_assistants.py files in all other apps to register the assistants:
         # TODO: recursive search for ai_assistants.py files in all apps in nested directories
 
@@ -0,0 +1,28 @@
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.checks import Warning, register  # noqa: A004
+
+from django_ai_assistant.conf import app_settings
+
+
+@register()
+def check_retriever_index_cache(app_configs, **kwargs):
+    from django_ai_assistant.helpers.retrievers import RetrieverIndex
+
+    if not RetrieverIndex.get_cls_registry():
+        return []
+
+    alias = app_settings.get_setting("RETRIEVER_INDEX_CACHE")
+    if not isinstance(caches[alias], LocMemCache | DummyCache):
+        return []
+    return [
+        Warning(
+            f"AI_ASSISTANT_RETRIEVER_INDEX_CACHE is set to '{alias}', a per-process cache.",
+            hint=(
+                "Retriever indexes updated in one worker aren't seen by the others. "
+                "Set it to a cache shared by all workers, like Redis or the file-based cache."
+            ),
+            id="django_ai_assistant.W001",
+        )
+    ]
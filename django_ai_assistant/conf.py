@@ -1,3 +1,4 @@
+from functools import lru_cache
 from typing import Any
 
 from django.conf import settings
@@ -8,6 +9,11 @@ from django.utils.module_loading import import_string
 PREFIX = "AI_ASSISTANT_"
 
 
+# Settings are dotted paths that are called on every request,
+# so avoid resolving the same path again and again:
+_import_fn = lru_cache(maxsize=None)(import_string)
+
+
 DEFAULTS = {
     "INIT_API_FN": "django_ai_assistant.api.views.init_api",
     "CAN_CREATE_THREAD_FN": "django_ai_assistant.permissions.allow_all",
@@ -18,6 +24,19 @@ DEFAULTS = {
     "CAN_UPDATE_MESSAGE_FN": "django_ai_assistant.permissions.owns_thread",
     "CAN_DELETE_MESSAGE_FN": "django_ai_assistant.permissions.owns_thread",
     "CAN_RUN_ASSISTANT": "django_ai_assistant.permissions.allow_all",
+    "FILTER_THREADS_QS_FN": "django_ai_assistant.permissions.filter_viewable_threads",
+    "LLM_CLIENT_KWARGS_FN": "django_ai_assistant.helpers.llms.no_client_kwargs",
+    "ENQUEUE_RUN_FN": "django_ai_assistant.helpers.runs.enqueue_run_in_thread_pool",
+    # Cache alias from `CACHES` to cache thread messages in. Disabled by default:
+    "MESSAGES_CACHE": None,
+    # Cache alias from `CACHES` to cache RAG question rewrites in. Disabled by default:
+    "CONTEXTUALIZE_CACHE": None,
+    # Cache alias from `CACHES` to store the `RetrieverIndex` documents in:
+    "RETRIEVER_INDEX_CACHE": "default",
+    # Cache alias from `CACHES` to store the `@method_tool(cache=...)` results in:
+    "TOOL_CACHE": "default",
+    # Cache alias from `CACHES` to store the `CircuitBreaker` states in:
+    "CIRCUIT_BREAKER_CACHE": "default",
 }
 
 
@@ -55,7 +74,7 @@ class Settings:
 
     def call_fn(self, name: str, **kwargs):
         dotted_path = self.get_setting(name)
-        fn = import_string(dotted_path)
+        fn = _import_fn(dotted_path)
         return fn(**kwargs)
 
 
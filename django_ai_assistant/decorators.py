@@ -1,3 +1,4 @@
+import inspect
 import uuid
 from functools import wraps
 
@@ -8,28 +9,45 @@ def _cast_id(item_id, model):
     return item_id
 
 
-# Decorator to cast ids to the correct type when using workaround UUIDAutoField
-def with_cast_id(func):
-    @wraps(func)
-    def wrapper(*args, **kwargs):
-        from django_ai_assistant.models import Message, Thread
+def _cast_kwargs_ids(kwargs):
+    from django_ai_assistant.models import Message, Run, Thread
 
-        thread_id = kwargs.get("thread_id")
-        message_id = kwargs.get("message_id")
-        message_ids = kwargs.get("message_ids")
+    thread_id = kwargs.get("thread_id")
+    message_id = kwargs.get("message_id")
+    message_ids = kwargs.get("message_ids")
+    run_id = kwargs.get("run_id")
 
-        if thread_id:
-            thread_id = _cast_id(thread_id, Thread)
-            kwargs["thread_id"] = thread_id
+    if thread_id:
+        thread_id = _cast_id(thread_id, Thread)
+        kwargs["thread_id"] = thread_id
 
-        if message_id:
-            message_id = _cast_id(message_id, Message)
-            kwargs["message_id"] = message_id
+    if message_id:
+        message_id = _cast_id(message_id, Message)
+        kwargs["message_id"] = message_id
 
-        if message_ids:
-            message_ids = [_cast_id(message_id, Message) for message_id in message_ids]
-            kwargs["message_ids"] = message_ids
+    if message_ids:
+        message_ids = [_cast_id(message_id, Message) for message_id in message_ids]
+        kwargs["message_ids"] = message_ids
 
+    if run_id:
+        run_id = _cast_id(run_id, Run)
+        kwargs["run_id"] = run_id
+
+
+# Decorator to cast ids to the correct type when using workaround UUIDAutoField
+def with_cast_id(func):
+    if inspect.iscoroutinefunction(func):
+
+        @wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            _cast_kwargs_ids(kwargs)
+            return await func(*args, **kwargs)
+
+        return async_wrapper
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        _cast_kwargs_ids(kwargs)
         return func(*args, **kwargs)
 
     return wrapper
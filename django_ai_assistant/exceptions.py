@@ -14,3 +14,21 @@ class AIUserNotAllowedError(Exception):
     """Raised when the user has no permission to manage a Thread, Message, or AIAssistant."""
 
     pass
+
+
+class AIRunCancelledError(Exception):
+    """Raised when an assistant run is stopped because its cancel token was cancelled."""
+
+    pass
+
+
+class AIRunTimeoutError(AIRunCancelledError):
+    """Raised when an assistant run is stopped because it exceeded its `run_timeout`."""
+
+    pass
+
+
+class AICircuitOpenError(Exception):
+    """Raised when a call is rejected because the circuit breaker of its dependency is open."""
+
+    pass
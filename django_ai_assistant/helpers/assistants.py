@@ -1,29 +1,52 @@
 import abc
+import asyncio
+import hashlib
 import importlib
 import inspect
+import json
+import logging
 import re
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from contextvars import ContextVar
+from functools import partial
 from typing import (
     Annotated,
     Any,
     AsyncIterable,
     AsyncIterator,
+    Awaitable,
+    Callable,
     ClassVar,
     Dict,
     Literal,
     Sequence,
     Type,
     TypedDict,
+    TypeVar,
     cast,
     overload,
 )
 
+from django.core.cache import BaseCache, caches
+from django.core.exceptions import ValidationError
+from django.db import connections, transaction
+from django.utils import timezone
+
+from asgiref.sync import async_to_sync, sync_to_async
+from langchain_core.callbacks import BaseCallbackHandler, BaseCallbackManager
 from langchain_core.language_models import BaseChatModel
 from langchain_core.messages import (
     AIMessage,
+    AIMessageChunk,
     AnyMessage,
     BaseMessage,
     HumanMessage,
+    RemoveMessage,
     SystemMessage,
+    ToolMessage,
+    get_buffer_string,
+    trim_messages,
 )
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.prompts import (
@@ -39,20 +62,60 @@ from langchain_core.retrievers import (
 from langchain_core.runnables import (
     Runnable,
     RunnableBranch,
+    RunnableConfig,
+    RunnableLambda,
+    RunnableParallel,
 )
 from langchain_core.tools import BaseTool, StructuredTool
-from langgraph.graph import END, StateGraph, add_messages
+from langchain_core.utils.function_calling import convert_to_openai_tool
+from langchain_core.utils.json import parse_partial_json
+from langchain_core.utils.pydantic import is_basemodel_subclass
+from langgraph.checkpoint.base import BaseCheckpointSaver
+from langgraph.graph import END, START, StateGraph, add_messages
+from langgraph.graph.message import REMOVE_ALL_MESSAGES
 from langgraph.prebuilt import ToolNode
+from langgraph.prebuilt.tool_node import ToolCallRequest
+from langgraph.types import Command
 from pydantic import BaseModel
 
+from django_ai_assistant.conf import app_settings
 from django_ai_assistant.decorators import with_cast_id
 from django_ai_assistant.exceptions import (
     AIAssistantMisconfiguredError,
+    AICircuitOpenError,
+    AIRunCancelledError,
+    AIRunTimeoutError,
+)
+from django_ai_assistant.helpers.cancellation import (
+    CancelToken,
+    DeadlineCancelToken,
+    aiter_until_cancelled,
+)
+from django_ai_assistant.helpers.django_messages import (
+    asave_django_messages,
+    save_django_messages,
+)
+from django_ai_assistant.helpers.llms import get_shared_llm
+from django_ai_assistant.helpers.resilience import (
+    CircuitBreaker,
+    RetryPolicy,
+    acall_with_resilience,
+    acall_with_timeout,
+    call_with_resilience,
+    call_with_timeout,
 )
-from django_ai_assistant.helpers.django_messages import save_django_messages
+from django_ai_assistant.langchain.callbacks import (
+    AsyncCancellationCallbackHandler,
+    CancellationCallbackHandler,
+    RunTrackingCallbackHandler,
+)
+from django_ai_assistant.langchain.checkpoint import DjangoCheckpointSaver
 from django_ai_assistant.langchain.tools import tool as tool_decorator
 
 
+logger = logging.getLogger(__name__)
+
+
 ProviderName = Literal["openai", "anthropic", "google"]
 
 
@@ -61,6 +124,17 @@ class ProviderConfig(TypedDict):
     llm_class: str
 
 
+class AgentState(TypedDict):
+    messages: Annotated[list[AnyMessage], add_messages]
+    history_message_ids: list[str | None]
+    input: str | None  # noqa: A003
+    output: Any
+    # Set by the nodes that run before "prompt", which builds the messages from them:
+    instructions: str | None
+    history: dict | None
+    context: str | None
+
+
 PROVIDER_LLM_LOOKUP: dict[ProviderName, ProviderConfig] = {
     "openai": {
         "langchain_module": "langchain_openai",
@@ -111,18 +185,103 @@ class AIAssistant(abc.ABC):  # noqa: F821
     """
     tool_max_concurrency: int = 1
     """Maximum number of tools to run concurrently / in parallel.\nDefaults to `1` (no concurrency)."""
+    tool_timeout: float | None = None
+    """Seconds to wait for each tool call. Defaults to `None` (no timeout).\n
+    A tool that times out returns an error message to the LLM. Sync tools keep running
+    in their thread of the shared timeout pool, but their result is discarded.
+    For tools with `retry` or `circuit_breaker`, it applies to each attempt.
+    Override it for a single tool with `@method_tool(timeout=...)`."""
+    run_timeout: float | None = None
+    """Seconds each run can take, including all its LLM and tool calls. Defaults to `None` (no deadline).\n
+    When the deadline passes, the run stops like a cancelled one, and raises `AIRunTimeoutError`.
+    Sync runs stop before the next graph node, LLM call, or tool call.
+    Async runs also abort the in-flight LLM and tool calls."""
+    llm_timeout: float | None = None
+    """Seconds to wait for each agent LLM call attempt. Defaults to `None` (no timeout)."""
+    llm_retry: RetryPolicy | None = None
+    """Policy to retry the agent LLM calls that fail with retryable errors, like rate limits.
+    Defaults to `None` (no retries, besides the ones of the LLM client)."""
+    llm_circuit_breaker: CircuitBreaker | None = None
+    """Circuit breaker of the LLM provider, so runs fail fast with `AICircuitOpenError`
+    while the provider is down. Defaults to `None`."""
     has_rag: bool = False
     """Whether the assistant uses RAG (Retrieval-Augmented Generation) or not.\n
     Defaults to `False`.
     When True, the assistant will use a retriever to get documents to provide as context to the LLM.
     Additionally, the assistant class should implement the `get_retriever` method to return
     the retriever to use."""
+    contextualize_policy: Literal["always", "auto", "never"] = "always"
+    """When to rewrite the latest user question with the chat history before RAG retrieval.
+    Only used when `has_rag=True`.\n
+    Defaults to `"always"`: the question is rewritten by an LLM call whenever there is chat history.
+    `"auto"` only rewrites it when `needs_contextualization` says so, e.g. when it refers to
+    previous messages, saving a full LLM round trip on self-contained questions.
+    `"never"` always retrieves with the question as is.
+    See `get_history_aware_retriever`."""
+    contextualize_with_raw_input: bool = False
+    """Whether to also retrieve with the question as is, in parallel with the rewrite,
+    when the question is rewritten. Only used when `has_rag=True`.\n
+    Defaults to `False`. When `True`, the documents retrieved with the rewritten question come first,
+    followed by the ones retrieved only with the question as is,
+    so a bad rewrite doesn't lose the documents of the original question."""
     structured_output: Dict[str, Any] | Type[BaseModel] | Type | None = None
     """Structured output to use for the assistant.\n
     Defaults to `None`.
     When not `None`, the assistant will return a structured output in the provided format.
     See https://python.langchain.com/v0.3/docs/how_to/structured_output/ for the available formats.
     """
+    structured_output_mode: Literal["extra_call", "tool", "native"] = "extra_call"
+    """How the structured output is produced, when `structured_output` is set.\n
+    Defaults to `"extra_call"`: after the agent answers, a second LLM call over the whole
+    chat history produces the structured output, see `get_structured_output_llm`.
+    `"tool"` binds a final answer tool with the `structured_output` schema next to the assistant
+    tools, and requires the LLM to call a tool on each step, so the final agent step
+    produces the structured output.
+    `"native"` uses the provider-native response format on the agent LLM calls,
+    so the final agent answer is the structured output. Only OpenAI is supported,
+    other providers use `"tool"`.\n
+    With `"tool"` and `"native"`, the extra LLM call is only made as a fallback,
+    when the final agent step doesn't produce a valid structured output."""
+    history_max_messages: int | None = None
+    """Maximum number of thread messages to load as chat history on each run.\n
+    Defaults to `None` (no limit).
+    When set, only the most recent messages are loaded from the database,
+    so the cost of each run doesn't grow with the thread length.
+    See `get_history_messages`."""
+    history_max_tokens: int | None = None
+    """Maximum number of tokens of thread messages to send as chat history on each run.\n
+    Defaults to `None` (no limit).
+    When set, the most recent messages that fit in this budget are sent to the LLM.
+    Tokens are counted by the `get_num_tokens` method.
+    See `get_history_messages`."""
+    history_summary_max_tokens: int | None = None
+    """Maximum number of tokens of chat history to send verbatim before summarizing it.\n
+    Defaults to `None` (no summarization).
+    When set, after each run, if the history newer than the thread summary exceeds this budget,
+    its older messages are folded into the rolling summary stored in the thread,
+    keeping the most recent `history_summary_keep_tokens` verbatim.
+    The summary is sent with the instructions, and only the newer messages are sent as history.
+    See `update_thread_summary`."""
+    history_summary_keep_tokens: int | None = None
+    """Number of tokens of the most recent chat history to keep verbatim when summarizing.\n
+    Defaults to `None`, which keeps half of `history_summary_max_tokens`."""
+    history_summary_in_background: bool = False
+    """Whether to summarize the thread in a background thread, off the request path.\n
+    Defaults to `False`: the summary is updated at the end of the run.
+    When `True`, the summary is updated after the run, so the next run may still send
+    the full history if it starts before the summary is ready."""
+    track_runs: bool = True
+    """Whether to record each execution of the assistant in a thread as a `Run`,
+    with its status, graph node timings, tool calls, and token usage.\n
+    Defaults to `True`. The run is saved when it starts and once more when it ends,
+    whatever the number of nodes and tool calls."""
+    checkpointer: BaseCheckpointSaver | None = None
+    """LangGraph checkpoint saver used to persist the graph state of each thread.\n
+    Defaults to `None`: each run rebuilds the state by loading the thread messages.
+    When set, like to `DjangoCheckpointSaver()`, each run resumes from the last checkpoint
+    of the thread, and only checks the latest thread message to detect changes.
+    An interrupted run can be resumed with `invoke(None, thread_id=...)`.
+    See `get_checkpointer`."""
     _user: Any | None
     """The current user the assistant is helping. A model instance.\n
     Set by the constructor.
@@ -142,18 +301,43 @@ class AIAssistant(abc.ABC):  # noqa: F821
     Can be used in any `@method_tool` to customize behavior."""
     _method_tools: Sequence[BaseTool]
     """List of `@method_tool` tools the assistant can use. Automatically set by the constructor."""
+    _method_tool_templates: ClassVar[Sequence[tuple[Callable, BaseTool]]] = ()
+    """List of `@method_tool` methods and their tools, not bound to any instance.\n
+    Automatically set when a subclass is declared, and bound to each instance by the constructor."""
     _provider: ProviderName
     """The provider key used to resolve and import the chat model class."""
+    _llm_with_tools: Runnable | None
+    """The LLM with the assistant tools bound to it. Lazily set by `_get_llm_with_tools`."""
+    _tools_by_name: dict[str, BaseTool] | None
+    """The assistant tools by name, run by the shared tool node. Lazily set by `_get_tools_by_name`."""
 
     _registry: ClassVar[dict[str, type["AIAssistant"]]] = {}
     """Registry of all AIAssistant subclasses by their id.\n
     Automatically populated by when a subclass is declared.\n
     Use `get_cls_registry` and `get_cls` to access the registry."""
 
+    _compiled_graphs: ClassVar[dict[tuple, Runnable[dict, dict]]] = {}
+    """Cache of compiled graphs by assistant class and tool names.\n
+    Automatically populated by `as_graph`."""
+    _tool_nodes: ClassVar[dict[tuple, ToolNode]] = {}
+    """Cache of the LangGraph nodes that run the tools, by assistant class and tool names.\n
+    Each tool call runs the tool of the assistant instance of the run.
+    Automatically populated by `_get_tool_node`."""
+    _tool_schemas: ClassVar[dict[tuple, list[dict[str, Any]]]] = {}
+    """Cache of the tool schemas bound to the LLM, by assistant class, tool names,
+    and structured output mode. Automatically populated by `_get_llm_with_tools`."""
+
     DEFAULT_DOCUMENT_PROMPT: ClassVar[PromptTemplate] = PromptTemplate.from_template(
         "{page_content}"
     )
     DEFAULT_DOCUMENT_SEPARATOR: ClassVar[str] = "\n\n"
+    HISTORY_WINDOW_SIZE: ClassVar[int] = 20
+    """Initial number of messages loaded when filling the `history_max_tokens` budget.
+    The window is doubled until the budget is filled or the thread has no older messages."""
+    HISTORY_SUMMARY_TEMPLATE: ClassVar[
+        str
+    ] = "\n\n---START OF CONVERSATION SUMMARY---\n{summary}\n---END OF CONVERSATION SUMMARY---"
+    """Template used to add the thread summary to the instructions."""
 
     def __init__(
         self,
@@ -186,6 +370,8 @@ class AIAssistant(abc.ABC):  # noqa: F821
         self._view = view
         self._provider = provider
         self._init_kwargs = kwargs
+        self._llm_with_tools = None
+        self._tools_by_name = None
 
         self._set_method_tools()
 
@@ -214,39 +400,66 @@ class AIAssistant(abc.ABC):  # noqa: F821
             )
 
         cls._registry[cls.id] = cls
+        cls._set_method_tool_templates()
 
-    def _set_method_tools(self):
+    @classmethod
+    def _set_method_tool_templates(cls):
         # Find tool methods (decorated with `@method_tool` from django_ai_assistant/tools.py):
         members = inspect.getmembers(
-            self,
-            predicate=lambda m: inspect.ismethod(m) and getattr(m, "_is_tool", False),
+            cls,
+            predicate=lambda m: inspect.isfunction(m) and getattr(m, "_is_tool", False),
         )
         tool_methods = [m for _, m in members]
 
         # Sort tool methods by the order they appear in the source code,
         # since this can be meaningful:
-        tool_methods.sort(key=lambda m: inspect.getsourcelines(m)[1])
+        tool_methods.sort(key=lambda m: inspect.unwrap(m).__code__.co_firstlineno)
 
-        # Transform tool methods into tool objects:
-        tools = []
+        # Transform tool methods into tool objects.
+        # Methods are bound to the class only to build the tool args_schema without `self`,
+        # the actual instance is bound by `_set_method_tools`:
+        templates = []
         for method in tool_methods:
+            bound_method = method.__get__(cls)
             if hasattr(method, "_tool_maker_args"):
                 tool = tool_decorator(
                     *method._tool_maker_args,
                     **method._tool_maker_kwargs,
-                )(method)
+                )(bound_method)
             else:
-                tool = tool_decorator(method)
-            tools.append(cast(BaseTool, tool))
+                tool = tool_decorator(bound_method)
+            templates.append((method, cast(BaseTool, tool)))
 
-        # Remove self from each tool args_schema:
-        for tool in tools:
-            if tool.args_schema:
-                if isinstance(tool.args_schema.__fields_set__, set):
-                    tool.args_schema.__fields_set__.remove("self")
-                tool.args_schema.__fields__.pop("self", None)
+        cls._method_tool_templates = templates
 
-        self._method_tools = tools
+    def _set_method_tools(self):
+        # Bind the tools built at class creation by `_set_method_tool_templates` to this instance:
+        self._method_tools = []
+        for method, tool in self._method_tool_templates:
+            func = method.__get__(self)
+            tool_cache = getattr(method, "_tool_cache", None)
+            resilience = {
+                "retry": getattr(method, "_tool_retry", None),
+                "circuit_breaker": getattr(method, "_tool_circuit_breaker", None),
+            }
+            has_resilience = any(value is not None for value in resilience.values())
+            # With retries or a circuit breaker, the timeout applies to each attempt:
+            get_timeout = partial(self._get_method_tool_timeout, method)
+            if inspect.iscoroutinefunction(method):
+                # `async def` tools are awaited natively in async runs,
+                # and run in an event loop in sync runs:
+                if has_resilience:
+                    func = _make_resilient_coroutine(func, resilience, get_timeout)
+                if tool_cache is not None:
+                    func = tool_cache.awrap(self, tool.name, func)
+                update = {"coroutine": func, "func": _make_sync_tool_func(func)}
+            else:
+                if has_resilience:
+                    func = _make_resilient_func(func, resilience, get_timeout)
+                if tool_cache is not None:
+                    func = tool_cache.wrap(self, tool.name, func)
+                update = {"func": func}
+            self._method_tools.append(tool.model_copy(update=update))
 
     @classmethod
     def get_cls_registry(cls) -> dict[str, type["AIAssistant"]]:
@@ -283,6 +496,20 @@ class AIAssistant(abc.ABC):  # noqa: F821
         """
         return self.instructions
 
+    async def aget_instructions(self) -> str:
+        """Async version of `get_instructions`, used when the assistant runs in async mode.\n
+        By default, returns the `instructions` attribute right away. If `get_instructions`
+        is overridden, it's called in the Django sync thread, since it may use the Django ORM,
+        so it waits for other ORM calls of the run, like loading the chat history.
+        Override this method with async calls to run it concurrently with them.
+
+        Returns:
+            str: The instructions for the AI assistant.
+        """
+        if type(self).get_instructions is AIAssistant.get_instructions:
+            return self.get_instructions()
+        return await sync_to_async(self.get_instructions)()
+
     def get_model(self) -> str:
         """Get the LLM model name for the assistant. By default, this is the `model` attribute.\n
         Used by the `get_llm` method to create the LLM instance.\n
@@ -348,6 +575,10 @@ class AIAssistant(abc.ABC):  # noqa: F821
         """Get the LangChain LLM instance for the assistant.
         By default, this uses the OpenAI implementation.\n
         `get_model`, `get_temperature`, and `get_model_kwargs` are used to create the LLM instance.\n
+        LLM instances are shared process-wide by provider, model, temperature, and model kwargs,
+        so their HTTP connection pools are reused across assistants and requests.
+        Use the `AI_ASSISTANT_LLM_CLIENT_KWARGS_FN` setting to configure the clients,
+        e.g. the connection pool size per provider.\n
         Override this method to use a different LLM implementation.
 
         Returns:
@@ -360,13 +591,17 @@ class AIAssistant(abc.ABC):  # noqa: F821
         llm_class = self._import_llm_class()
 
         if temperature is not None:
-            return llm_class(
+            return get_shared_llm(
+                llm_class,
+                self._provider,
                 model=model,
                 temperature=temperature,
                 model_kwargs=model_kwargs,
             )
         else:
-            return llm_class(
+            return get_shared_llm(
+                llm_class,
+                self._provider,
                 model=model,
                 model_kwargs=model_kwargs,
             )
@@ -391,6 +626,250 @@ class AIAssistant(abc.ABC):  # noqa: F821
 
         return llm.with_structured_output(self.structured_output, method=method)
 
+    def get_num_tokens(self, messages: list[BaseMessage]) -> int:
+        """Get the number of tokens in the messages, using the LLM tokenizer.\n
+        Used by `get_history_messages` when `history_max_tokens` is set.\n
+        Override this method to use a different token counting method.
+
+        Args:
+            messages (list[BaseMessage]): The messages to count tokens for.
+
+        Returns:
+            int: The number of tokens in the messages.
+        """
+        return self.get_llm().get_num_tokens_from_messages(messages)
+
+    def get_history_messages(self, thread: Any) -> list[BaseMessage]:
+        """Get the thread messages to use as chat history in the current run.\n
+        By default, all thread messages are loaded.
+        When `history_max_messages` is set, only the most recent messages are loaded.
+        When `history_max_tokens` is set, the most recent messages that fit in the token budget
+        are loaded, in increasingly larger windows limited in the database.
+        When the thread has a summary, the messages included in it are not loaded.\n
+        The history always starts at a human message, to avoid sending orphaned tool messages.\n
+        Override this method to use a different history strategy.
+
+        Args:
+            thread (Thread): The thread to get the messages from.
+
+        Returns:
+            list[BaseMessage]: The messages to use as chat history.
+        """
+        if self.history_max_tokens is None:
+            messages = thread.get_messages(
+                include_extra_messages=True, last_n=self.history_max_messages
+            )
+        else:
+            window_size = self._clamp_history_window_size(self.HISTORY_WINDOW_SIZE)
+            messages = thread.get_messages(include_extra_messages=True, last_n=window_size)
+            while self._should_grow_history_window(messages, window_size):
+                window_size = self._clamp_history_window_size(window_size * 2)
+                messages = thread.get_messages(include_extra_messages=True, last_n=window_size)
+
+        messages = self._drop_summarized_messages(thread, messages)
+        return self._trim_history_messages(messages)
+
+    async def aget_history_messages(self, thread: Any) -> list[BaseMessage]:
+        """Async version of `get_history_messages`, using Django async queries.\n
+        Used when the assistant runs in async mode, like with `ainvoke` and `astream`.
+        If you override `get_history_messages`, override this method too.
+
+        Args:
+            thread (Thread): The thread to get the messages from.
+
+        Returns:
+            list[BaseMessage]: The messages to use as chat history.
+        """
+        if self.history_max_tokens is None:
+            messages = await thread.aget_messages(
+                include_extra_messages=True, last_n=self.history_max_messages
+            )
+        else:
+            window_size = self._clamp_history_window_size(self.HISTORY_WINDOW_SIZE)
+            messages = await thread.aget_messages(include_extra_messages=True, last_n=window_size)
+            while self._should_grow_history_window(messages, window_size):
+                window_size = self._clamp_history_window_size(window_size * 2)
+                messages = await thread.aget_messages(
+                    include_extra_messages=True, last_n=window_size
+                )
+
+        messages = self._drop_summarized_messages(thread, messages)
+        return self._trim_history_messages(messages)
+
+    def _clamp_history_window_size(self, window_size: int) -> int:
+        if self.history_max_messages is not None:
+            return min(window_size, self.history_max_messages)
+        return window_size
+
+    def _should_grow_history_window(self, messages: list[BaseMessage], window_size: int) -> bool:
+        return not (
+            len(messages) < window_size
+            or window_size == self.history_max_messages
+            or self.get_num_tokens(messages) >= cast(int, self.history_max_tokens)
+        )
+
+    def _trim_history_messages(self, messages: list[BaseMessage]) -> list[BaseMessage]:
+        if self.history_max_messages is not None:
+            messages = messages[-self.history_max_messages :]
+        if self.history_max_tokens is not None:
+            messages = trim_messages(
+                messages,
+                max_tokens=self.history_max_tokens,
+                token_counter=self.get_num_tokens,
+                strategy="last",
+                start_on="human",
+            )
+
+        if self.history_max_messages is not None or self.history_max_tokens is not None:
+            # The window may start in the middle of a turn, e.g. at a tool message:
+            first_human_idx = next(
+                (i for i, m in enumerate(messages) if isinstance(m, HumanMessage)),
+                len(messages),
+            )
+            messages = messages[first_human_idx:]
+        return messages
+
+    def _drop_summarized_messages(self, thread: Any, messages: list) -> list:
+        if not self.history_summary_max_tokens or not thread.summarized_until_id:
+            return messages
+
+        summarized_until_id = str(thread.summarized_until_id)
+        for i in range(len(messages) - 1, -1, -1):
+            if messages[i].id == summarized_until_id:
+                return messages[i + 1 :]
+        # The summarized messages are older than the loaded ones:
+        return messages
+
+    def get_history_summary(self, thread: Any) -> str:
+        """Get the thread summary to send with the instructions in the current run.\n
+        By default, this is the `summary` of the thread, if `history_summary_max_tokens` is set.
+
+        Args:
+            thread (Thread): The thread to get the summary from.
+
+        Returns:
+            str: The summary of the thread, or an empty string if there is none.
+        """
+        if not self.history_summary_max_tokens or not thread.summarized_until_id:
+            return ""
+        return thread.summary
+
+    def get_summarize_prompt(self) -> ChatPromptTemplate:
+        """Get the prompt used to fold older messages into the thread summary.\n
+        The prompt receives the previous `summary` and the `messages` to fold, as text.\n
+        Override this method to use a different summarization prompt.
+
+        Returns:
+            ChatPromptTemplate: The summarization prompt.
+        """
+        return ChatPromptTemplate.from_messages(
+            [
+                (
+                    "system",
+                    "Progressively summarize the lines of conversation provided, "
+                    "adding onto the previous summary and returning a new summary. "
+                    "Keep the facts, names, numbers, and decisions "
+                    "needed to continue the conversation.",
+                ),
+                (
+                    "human",
+                    "Previous summary:\n{summary}\n\n"
+                    "New lines of conversation:\n{messages}\n\n"
+                    "New summary:",
+                ),
+            ]
+        )
+
+    def get_summarize_chain(self) -> Runnable[dict, str]:
+        """Get the LangChain chain used to fold older messages into the thread summary.\n
+        By default, this is `get_summarize_prompt` piped to `get_llm`.\n
+        Override this method to summarize with a different, e.g. cheaper, LLM.
+
+        Returns:
+            Runnable[dict, str]: The summarization chain.
+        """
+        return self.get_summarize_prompt() | self.get_llm() | StrOutputParser()
+
+    def update_thread_summary(self, thread: Any) -> bool:
+        """Fold the older chat history of the thread into its summary, if it exceeds
+        `history_summary_max_tokens`. Only the messages newer than the current summary are
+        summarized, so each call costs a single LLM call over the overflow.\n
+        Called after each run when `history_summary_max_tokens` is set.
+        Can also be called from a task queue, with `history_summary_in_background=False`.
+
+        Args:
+            thread (Thread): The thread to summarize.
+
+        Returns:
+            bool: Whether the summary was updated.
+        """
+        thread.refresh_from_db(fields=["summary", "summarized_until"])
+        messages = self.get_history_messages(thread)
+        messages_to_fold = self._get_messages_to_fold(messages)
+        if not messages_to_fold:
+            return False
+
+        summary = self.get_summarize_chain().invoke(
+            self._get_summarize_input(thread, messages_to_fold)
+        )
+        return self._save_thread_summary(thread, summary, messages_to_fold)
+
+    async def aupdate_thread_summary(self, thread: Any) -> bool:
+        """Async version of `update_thread_summary`.
+
+        Args:
+            thread (Thread): The thread to summarize.
+
+        Returns:
+            bool: Whether the summary was updated.
+        """
+        await thread.arefresh_from_db(fields=["summary", "summarized_until"])
+        messages = await self.aget_history_messages(thread)
+        messages_to_fold = self._get_messages_to_fold(messages)
+        if not messages_to_fold:
+            return False
+
+        summary = await self.get_summarize_chain().ainvoke(
+            self._get_summarize_input(thread, messages_to_fold)
+        )
+        return await sync_to_async(self._save_thread_summary)(thread, summary, messages_to_fold)
+
+    def _get_messages_to_fold(self, messages: list[BaseMessage]) -> list[BaseMessage]:
+        max_tokens = cast(int, self.history_summary_max_tokens)
+        if not messages or self.get_num_tokens(messages) <= max_tokens:
+            return []
+
+        keep_tokens = self.history_summary_keep_tokens
+        if keep_tokens is None:
+            keep_tokens = max_tokens // 2
+        # Keep whole turns verbatim, so the kept history starts at a human message:
+        kept_messages = trim_messages(
+            messages,
+            max_tokens=keep_tokens,
+            token_counter=self.get_num_tokens,
+            strategy="last",
+            start_on="human",
+        )
+        return messages[: len(messages) - len(kept_messages)]
+
+    def _get_summarize_input(self, thread: Any, messages: list[BaseMessage]) -> dict:
+        return {
+            "summary": self.get_history_summary(thread) or "(empty)",
+            "messages": get_buffer_string(messages),
+        }
+
+    def _save_thread_summary(self, thread: Any, summary: str, messages: list[BaseMessage]) -> bool:
+        # Only update if no other run updated the summary meanwhile, to avoid folding twice:
+        updated = (
+            type(thread)
+            .objects.filter(id=thread.id, summarized_until=thread.summarized_until_id)
+            .update(summary=summary, summarized_until=messages[-1].id)
+        )
+        if updated:
+            thread.summary = summary
+            thread.summarized_until_id = messages[-1].id
+        return bool(updated)
+
     def get_tools(self) -> Sequence[BaseTool]:
         """Get the list of method tools the assistant can use.
         By default, this is the `_method_tools` attribute, which are all `@method_tool`s.\n
@@ -402,6 +881,16 @@ class AIAssistant(abc.ABC):  # noqa: F821
         """
         return self._method_tools
 
+    def get_checkpointer(self) -> BaseCheckpointSaver | None:
+        """Get the LangGraph checkpoint saver to use when the assistant runs with a thread.
+        By default, this is the `checkpointer` attribute.\n
+        Override this method to use a different checkpoint saver per run.
+
+        Returns:
+            BaseCheckpointSaver | None: The checkpoint saver, or `None` to not use checkpoints.
+        """
+        return self.checkpointer
+
     def get_document_separator(self) -> str:
         """Get the RAG document separator to use in the prompt. Only used when `has_rag=True`.\n
         Defaults to `"\\n\\n"`, which is the LangChain default.\n
@@ -465,12 +954,86 @@ class AIAssistant(abc.ABC):  # noqa: F821
             ]
         )
 
+    def get_contextualize_llm(self) -> BaseChatModel:
+        """Get the LLM used to rewrite the latest user question with the chat history.
+        By default, this is `get_llm`.\n
+        Override this method to rewrite questions with a smaller, faster LLM.
+
+        Returns:
+            BaseChatModel: The LLM used to rewrite questions.
+        """
+        return self.get_llm()
+
+    def get_contextualize_chain(self) -> Runnable[dict, str]:
+        """Get the LangChain chain used to rewrite the latest user question with the chat history.\n
+        By default, this is `get_contextualize_prompt` piped to `get_contextualize_llm`.
+        When the `AI_ASSISTANT_CONTEXTUALIZE_CACHE` setting is set, rewrites are cached
+        by chat history and question, so the same question isn't rewritten twice.\n
+        Override this method to use a different chain.
+
+        Returns:
+            Runnable[dict, str]: The chain that returns the standalone question.
+        """
+        chain = self.get_contextualize_prompt() | self.get_contextualize_llm() | StrOutputParser()
+        cache = get_contextualize_cache()
+        if cache is None:
+            return chain
+
+        def _contextualize(x: dict) -> str:
+            key = _make_contextualize_key(self.id, x)
+            question = cache.get(key)
+            if question is None:
+                question = chain.invoke(x)
+                cache.set(key, question)
+            return question
+
+        async def _acontextualize(x: dict) -> str:
+            key = _make_contextualize_key(self.id, x)
+            question = await cache.aget(key)
+            if question is None:
+                question = await chain.ainvoke(x)
+                await cache.aset(key, question)
+            return question
+
+        return RunnableLambda(_contextualize, afunc=_acontextualize)
+
+    def needs_contextualization(self, input: str, history: list[BaseMessage]) -> bool:  # noqa: A002
+        """Check if the latest user question needs to be rewritten with the chat history
+        before RAG retrieval. Only used when `contextualize_policy="auto"`.\n
+        By default, this is a cheap heuristic: the question needs to be rewritten when it's short,
+        like "What about tomorrow?", or when it has words that refer to previous messages,
+        like "it" or "that". Only English words are checked.\n
+        Override this method to use a different heuristic.
+
+        Args:
+            input (str): The latest user question.
+            history (list[BaseMessage]): The chat history, without the question.
+
+        Returns:
+            bool: Whether the question needs to be rewritten.
+        """
+        if not history:
+            return False
+        words = re.findall(r"[\w']+", input.lower())
+        return len(words) <= CONTEXTUALIZE_SHORT_INPUT_WORDS or any(
+            word in CONTEXTUALIZE_REFERRING_WORDS for word in words
+        )
+
+    def _should_contextualize(self, x: dict) -> bool:
+        if not x.get("history") or self.contextualize_policy == "never":
+            return False
+        if self.contextualize_policy == "auto":
+            return self.needs_contextualization(x["input"], x["history"])
+        return True
+
     def get_history_aware_retriever(self) -> Runnable[dict, RetrieverOutput]:
         """Get the history-aware retriever LangChain chain for the assistant.\n
         This is used when `has_rag=True` to fetch documents based on the chat history.\n
         By default, this is a chain that checks if there is chat history,
         and if so, it uses the chat history to generate a new standalone question
-        to query the retriever for relevant documents.\n
+        to query the retriever for relevant documents.
+        `contextualize_policy` controls when the question is rewritten,
+        and `contextualize_with_raw_input` also retrieves with the question as is.\n
         When there is no chat history, it just passes the input to the retriever.\n
         Override this method to use a different history-aware retriever chain.
 
@@ -480,20 +1043,172 @@ class AIAssistant(abc.ABC):  # noqa: F821
         Returns:
             Runnable[dict, RetrieverOutput]: a history-aware retriever LangChain chain.
         """
-        llm = self.get_llm()
         retriever = self.get_retriever()
-        prompt = self.get_contextualize_prompt()
+        raw_input_retriever = (lambda x: x["input"]) | retriever
+        if self.contextualize_policy == "never":
+            return raw_input_retriever
+
+        contextualized_retriever = self.get_contextualize_chain() | retriever
+        if self.contextualize_with_raw_input:
+            contextualized_retriever = RunnableParallel(
+                contextualized=contextualized_retriever, raw=raw_input_retriever
+            ) | RunnableLambda(_merge_retrieved_documents)
 
         # Based on create_history_aware_retriever:
         return RunnableBranch(
             (
-                lambda x: not x.get("history", False),  # pyright: ignore[reportAttributeAccessIssue]
+                lambda x: not self._should_contextualize(x),
                 # If no chat history, then we just pass input to retriever
-                (lambda x: x["input"]) | retriever,
+                raw_input_retriever,
             ),
             # If chat history, then we pass inputs to LLM chain, then to retriever
-            prompt | llm | StrOutputParser() | retriever,
+            contextualized_retriever,
+        )
+
+    def _get_structured_output_mode(self) -> str | None:
+        if not self.structured_output:
+            return None
+        if self.structured_output_mode == "native" and self._provider != "openai":
+            return "tool"
+        return self.structured_output_mode
+
+    def _get_tool_schemas(self, mode: str | None) -> list[dict[str, Any]]:
+        # Converting the tools to schemas introspects their args, so it's done once
+        # per assistant class and tool set, instead of once per assistant instance:
+        cache_key = (*self._get_graph_cache_key(), mode)
+        tool_schemas = self._tool_schemas.get(cache_key)
+        if tool_schemas is None:
+            tool_schemas = [convert_to_openai_tool(tool) for tool in self.get_tools()]
+            if mode == "tool":
+                final_answer_tool = convert_to_openai_tool(self.structured_output)
+                final_answer_tool["function"].update(
+                    name=FINAL_ANSWER_TOOL_NAME, description=FINAL_ANSWER_TOOL_DESCRIPTION
+                )
+                tool_schemas.append(final_answer_tool)
+            self._tool_schemas[cache_key] = tool_schemas
+        return tool_schemas
+
+    def _get_llm_with_tools(self) -> Runnable:
+        # The LLM is bound per instance, as `get_llm` may depend on the instance,
+        # but binding the cached tool schemas is cheap:
+        if self._llm_with_tools is None:
+            llm = self.get_llm()
+            mode = self._get_structured_output_mode()
+            tools = self._get_tool_schemas(mode)
+            if mode == "tool":
+                self._llm_with_tools = llm.bind_tools(tools, tool_choice="any")
+            elif mode == "native" and tools:
+                self._llm_with_tools = llm.bind_tools(tools, response_format=self.structured_output)
+            elif mode == "native":
+                self._llm_with_tools = llm.bind(response_format=self.structured_output)
+            else:
+                self._llm_with_tools = llm.bind_tools(tools) if tools else llm
+        return self._llm_with_tools
+
+    def _get_llm_resilience(self) -> dict[str, Any]:
+        return {
+            "timeout": self.llm_timeout,
+            "retry": self.llm_retry,
+            "circuit_breaker": self.llm_circuit_breaker,
+        }
+
+    def _get_run_cancel_token(
+        self, cancel_token: CancelToken | None, run: Any | None
+    ) -> CancelToken | None:
+        # `run_timeout` adds a deadline. Runs aren't cancellable through their `Run` by default,
+        # as the `RunCancelToken` polls the database: pass it as `cancel_token` to opt in.
+        if self.run_timeout is not None:
+            cancel_token = DeadlineCancelToken(self.run_timeout, cancel_token)
+        return cancel_token
+
+    def _get_method_tool_timeout(self, method: Callable) -> float | None:
+        timeout = getattr(method, "_tool_timeout", None)
+        return timeout if timeout is not None else self.tool_timeout
+
+    def _get_tool_timeouts(self) -> dict[str, float | None]:
+        timeouts = {name: self.tool_timeout for name in self._get_tools_by_name()}
+        for method, tool in self._method_tool_templates:
+            # Tools with retries or a circuit breaker time out each attempt instead,
+            # in `call_with_resilience`, so the backoff isn't counted:
+            has_resilience = (
+                getattr(method, "_tool_retry", None) is not None
+                or getattr(method, "_tool_circuit_breaker", None) is not None
+            )
+            timeouts[tool.name] = None if has_resilience else self._get_method_tool_timeout(method)
+        return timeouts
+
+    def _get_tools_by_name(self) -> dict[str, BaseTool]:
+        if self._tools_by_name is None:
+            self._tools_by_name = {tool.name: tool for tool in self.get_tools()}
+        return self._tools_by_name
+
+    def _get_tool_node(self) -> ToolNode:
+        # Building a ToolNode introspects the tools, so it's shared by the assistant class
+        # and tool set, like the compiled graph. It's built with the method tool templates,
+        # not bound to any instance, and `_run_tool_call` runs the tools of the run assistant:
+        cache_key = self._get_graph_cache_key()
+        tool_node = self._tool_nodes.get(cache_key)
+        if tool_node is None:
+            templates = {tool.name: tool for _, tool in self._method_tool_templates}
+            tool_node = self._tool_nodes[cache_key] = ToolNode(
+                tools=[templates.get(tool.name, tool) for tool in self.get_tools()],
+                wrap_tool_call=_run_tool_call,
+                awrap_tool_call=_arun_tool_call,
+            )
+        return tool_node
+
+    def _get_graph_cache_key(self) -> tuple:
+        return (self.__class__, tuple(tool.name for tool in self.get_tools()))
+
+    @classmethod
+    def _build_graph(cls) -> Runnable[dict, dict]:
+        workflow = StateGraph(AgentState)
+
+        # Each node has a sync and an async implementation, so the same compiled graph
+        # runs natively with `invoke` and with `ainvoke` / `astream`:
+        workflow.add_node("setup", RunnableLambda(_setup_node, afunc=_asetup_node))
+        workflow.add_node("history", RunnableLambda(_history_node, afunc=_ahistory_node))
+        workflow.add_node("retriever", RunnableLambda(_retriever_node, afunc=_aretriever_node))
+        workflow.add_node("prompt", RunnableLambda(_prompt_node, afunc=_aprompt_node))
+        workflow.add_node("agent", RunnableLambda(_agent_node, afunc=_aagent_node))
+        workflow.add_node("tools", RunnableLambda(_tools_node, afunc=_atools_node))
+        workflow.add_node(
+            "respond", RunnableLambda(_record_response_node, afunc=_arecord_response_node)
+        )
+
+        # Async runs fan out "setup", "history", and "retriever" (when it doesn't need
+        # the history), so their async calls overlap. Sync runs chain them in the calling thread,
+        # as LangGraph runs concurrent sync nodes in other threads, with other DB connections.
+        # Either way, "prompt" waits for the three of them:
+        workflow.add_conditional_edges(
+            START,
+            RunnableLambda(_route_start, afunc=_aroute_start),
+            ["setup", "history", "retriever"],
+        )
+        workflow.add_conditional_edges(
+            "setup",
+            RunnableLambda(_route_after_setup, afunc=_aroute_after_setup),
+            ["history"],
+        )
+        workflow.add_conditional_edges(
+            "history",
+            RunnableLambda(_route_after_history, afunc=_aroute_after_history),
+            ["retriever"],
+        )
+        workflow.add_edge(["setup", "history", "retriever"], "prompt")
+        workflow.add_edge("prompt", "agent")
+        workflow.add_conditional_edges(
+            "agent",
+            _tool_selector,
+            {
+                "call_tool": "tools",
+                "continue": "respond",
+            },
         )
+        workflow.add_edge("tools", "agent")
+        workflow.add_edge("respond", END)
+
+        return workflow.compile()
 
     @with_cast_id
     def as_graph(
@@ -505,6 +1220,19 @@ class AIAssistant(abc.ABC):  # noqa: F821
         Prefer to override the other methods to customize the graph for the assistant.
         Only override this method if you need to customize the graph at a lower level.
 
+        In async runs, the "setup" (instructions), "history", and "retriever" nodes start
+        concurrently, except when the retriever needs the history to rewrite the question.
+        Their async calls overlap, like the retriever requests, but their Django ORM calls
+        run one after the other in the Django sync thread.
+        They join in the "prompt" node, which builds the messages sent to the LLM.
+
+        The graph is compiled once per assistant class and tool set, and shared by all
+        instances, like its tool node and the tool schemas bound to the LLM.
+        The assistant instance and the thread are passed to the graph nodes
+        through the `configurable` section of the graph config.
+        When there's a thread and `get_checkpointer` returns a saver, the graph uses it
+        with the thread ID as the LangGraph `thread_id`.
+
         If both arguments are `None`, an in-memory chat message history is used.
 
         Args:
@@ -516,118 +1244,20 @@ class AIAssistant(abc.ABC):  # noqa: F821
         """
         from django_ai_assistant.models import Thread
 
-        llm = self.get_llm()
-        tools = self.get_tools()
-        llm_with_tools = llm.bind_tools(tools) if tools else llm
         if thread is None and thread_id is not None:
             thread = Thread.objects.get(id=thread_id)
 
-        class AgentState(TypedDict):
-            messages: Annotated[list[AnyMessage], add_messages]
-            input: str | None  # noqa: A003
-            output: Any
-
-        def setup(state: AgentState):
-            system_prompt = self.get_instructions()
-            return {"messages": [SystemMessage(content=system_prompt)]}
-
-        def history(state: AgentState):
-            messages = thread.get_messages(include_extra_messages=True) if thread else []
-            if state["input"]:
-                messages.append(HumanMessage(content=state["input"]))
-
-            return {"messages": messages}
-
-        def retriever(state: AgentState):
-            if not self.has_rag:
-                return
-
-            retriever = self.get_history_aware_retriever()
-            # Remove the initial instructions to prevent having two SystemMessages
-            # This is necessary for compatibility with Anthropic
-            messages_to_summarize = state["messages"][1:-1]
-            input_message = state["messages"][-1]
-            docs = retriever.invoke(
-                {"input": input_message.content, "history": messages_to_summarize}
-            )
-
-            document_separator = self.get_document_separator()
-            document_prompt = self.get_document_prompt()
-
-            formatted_docs = document_separator.join(
-                format_document(doc, document_prompt) for doc in docs
-            )
-
-            system_message = state["messages"][0]
-            system_message.content += (
-                f"\n\n---START OF CONTEXT---\n{formatted_docs}---END OF CONTEXT---\n\n"
-            )
-
-        def agent(state: AgentState):
-            response = llm_with_tools.invoke(state["messages"])
-
-            return {"messages": [response]}
-
-        def tool_selector(state: AgentState):
-            last_message = state["messages"][-1]
-
-            if isinstance(last_message, AIMessage) and last_message.tool_calls:
-                return "call_tool"
-
-            return "continue"
-
-        def record_response(state: AgentState):
-            # Structured output must happen in the end, to avoid disabling tool calling.
-            # Tool calling + structured output is not supported by OpenAI:
-            if self.structured_output:
-                messages = state["messages"]
-
-                # Change the original system prompt:
-                if isinstance(messages[0], SystemMessage):
-                    messages[0].content += "\nUse the chat history to produce a JSON output."
-
-                # Add a final message asking for JSON generation / structured output:
-                json_request_message = HumanMessage(
-                    content="Use the chat history to produce a JSON output."
-                )
-                messages.append(json_request_message)
-
-                llm_with_structured_output = self.get_structured_output_llm()
-                response = llm_with_structured_output.invoke(messages)
-            else:
-                response = state["messages"][-1].content
-
-            if thread:
-                # Save all messages, except the initial system message:
-                thread_messages = [m for m in state["messages"] if not isinstance(m, SystemMessage)]
-                save_django_messages(cast(list[BaseMessage], thread_messages), thread=thread)
-            return {"output": response}
-
-        workflow = StateGraph(AgentState)
-
-        workflow.add_node("setup", setup)
-        workflow.add_node("history", history)
-        workflow.add_node("retriever", retriever)
-        workflow.add_node("agent", agent)
-        workflow.add_node("tools", ToolNode(tools=tools))
-        workflow.add_node("respond", record_response)
-
-        workflow.set_entry_point("setup")
-        workflow.add_edge("setup", "history")
-        workflow.add_edge("history", "retriever")
-        workflow.add_edge("retriever", "agent")
-        workflow.add_conditional_edges(
-            "agent",
-            tool_selector,
-            {
-                "call_tool": "tools",
-                "continue": "respond",
-            },
-        )
-        workflow.add_edge("tools", "agent")
-        workflow.add_edge("respond", END)
+        cache_key = self._get_graph_cache_key()
+        graph = self._compiled_graphs.get(cache_key)
+        if graph is None:
+            graph = self._compiled_graphs[cache_key] = self._build_graph()
 
-        return workflow.compile()
+        configurable = {"assistant": self, "thread": thread}
+        checkpointer = self.get_checkpointer() if thread is not None else None
+        if checkpointer is not None:
+            graph = graph.copy(update={"checkpointer": checkpointer})
+            configurable["thread_id"] = str(thread.id)
+        return graph.with_config(configurable=configurable)
 
     @overload
     def invoke(
@@ -658,6 +1288,8 @@ class AIAssistant(abc.ABC):  # noqa: F821
         thread_id: Any | None = None,
         thread: Any | None = None,
         mode: Literal["invoke", "astream"] = "invoke",
+        run: Any | None = None,
+        cancel_token: CancelToken | None = None,
         **kwargs: Any,
     ) -> dict | AsyncIterator[dict]:
         """Invoke the assistant LangChain graph with the given arguments and keyword arguments.\n
@@ -666,6 +1298,12 @@ class AIAssistant(abc.ABC):  # noqa: F821
 
         If thread_id and thread are `None`, an in-memory chat message history is used.
 
+        When there's a thread, the execution is recorded in a `Run`, see `track_runs`.
+
+        When the run is cancelled, `AIRunCancelledError` is raised, and the new messages
+        completed so far are saved in the thread. Tool calls without results are left out,
+        so the thread stays valid for the next run.
+
         Args:
             *args: Positional arguments to pass to the graph.
                 To add a new message, use a dict like `{"input": "user message"}`.
@@ -673,18 +1311,225 @@ class AIAssistant(abc.ABC):  # noqa: F821
             thread_id (Any | None): The thread ID for the chat message history.
             thread (Any | None): The thread object for the chat message history.
             mode (invoke | astream): call named graph method
+            run (Run | None): An existing run to record the execution in, like a queued run.
+                If `None`, a new run is created when there's a thread and `track_runs=True`.
+            cancel_token (CancelToken | None): Token to cancel the run.
+                Pass a `RunCancelToken` of the run so it can be cancelled with
+                the `cancel_run` use case, like runs executed in the background do.
             **kwargs: Keyword arguments to pass to the graph.
 
         Returns:
             dict: The output of the assistant graph,
                 structured like `{"output": "assistant response", "history": ...}`.
         """
-        graph = self.as_graph(thread_id=thread_id, thread=thread)
-        config = kwargs.pop("config", {})
-        config["max_concurrency"] = config.pop("max_concurrency", self.tool_max_concurrency)
+        from django_ai_assistant.models import Thread
+
         if mode not in ("invoke", "astream"):
             raise NotImplementedError(f"mode={mode!r}")
-        return getattr(graph, mode)(*args, config=config, **kwargs)
+        if thread is None and thread_id is not None:
+            thread = Thread.objects.get(id=thread_id)
+
+        graph = self.as_graph(thread=thread)
+        config = kwargs.pop("config", {})
+        if mode == "astream":
+            # Async tool calls are limited by `_atools_node`, not by the graph `max_concurrency`,
+            # which would also run the setup, history, and retriever nodes one by one:
+            return self._astream_with_run(
+                graph, args, config, kwargs, thread=thread, run=run, cancel_token=cancel_token
+            )
+
+        config["max_concurrency"] = config.pop("max_concurrency", self.tool_max_concurrency)
+
+        run = self._start_run(thread, args, run)
+        cancel_token = self._get_run_cancel_token(cancel_token, run)
+        if run is None:
+            return self._invoke_graph(graph, args, config, kwargs, thread, cancel_token)
+
+        tracker = _add_callback_handler(config, RunTrackingCallbackHandler())
+        try:
+            output = self._invoke_graph(graph, args, config, kwargs, thread, cancel_token)
+        except BaseException as e:
+            _set_run_result(run, tracker, error=e)
+            run.save(update_fields=run.RESULT_FIELDS)
+            raise
+        _set_run_result(run, tracker)
+        run.save(update_fields=run.RESULT_FIELDS)
+        return output
+
+    def _prune_checkpoints(self, thread: Any | None):
+        # Pruned once per run, instead of after each checkpoint saved by the graph steps:
+        checkpointer = self.get_checkpointer() if thread is not None else None
+        if isinstance(checkpointer, DjangoCheckpointSaver):
+            checkpointer.prune(str(thread.id))
+
+    async def _aprune_checkpoints(self, thread: Any | None):
+        checkpointer = self.get_checkpointer() if thread is not None else None
+        if isinstance(checkpointer, DjangoCheckpointSaver):
+            await checkpointer.aprune(str(thread.id))
+
+    def _invoke_graph(
+        self,
+        graph: Runnable[dict, dict],
+        args: tuple[Any, ...],
+        config: RunnableConfig,
+        kwargs: dict[str, Any],
+        thread: Any | None,
+        cancel_token: CancelToken | None,
+    ) -> dict:
+        if cancel_token is None:
+            output = graph.invoke(*args, config=config, **kwargs)
+            self._prune_checkpoints(thread)
+            return output
+
+        _add_callback_handler(config, CancellationCallbackHandler(cancel_token))
+        # Stream the state values instead of invoking, to save the partial messages when cancelled:
+        state = None
+        try:
+            for chunk in graph.stream(*args, config=config, stream_mode="values", **kwargs):
+                state = chunk
+        except AIRunCancelledError:
+            if thread is not None and state is not None:
+                _save_partial_messages(state, thread)
+            raise
+        self._prune_checkpoints(thread)
+        return cast(dict, state)
+
+    async def _ainvoke_graph(
+        self,
+        graph: Runnable[dict, dict],
+        args: tuple[Any, ...],
+        config: RunnableConfig,
+        kwargs: dict[str, Any],
+        thread: Any | None,
+        cancel_token: CancelToken | None,
+    ) -> dict:
+        if cancel_token is None:
+            output = await graph.ainvoke(*args, config=config, **kwargs)
+            await self._aprune_checkpoints(thread)
+            return output
+
+        _add_callback_handler(config, AsyncCancellationCallbackHandler(cancel_token))
+        state = None
+        stream = graph.astream(*args, config=config, stream_mode="values", **kwargs)
+        try:
+            async for chunk in aiter_until_cancelled(stream, cancel_token):
+                state = chunk
+        except AIRunCancelledError:
+            if thread is not None and state is not None:
+                await _asave_partial_messages(state, thread)
+            raise
+        await self._aprune_checkpoints(thread)
+        return cast(dict, state)
+
+    async def _astream_graph(
+        self,
+        graph: Runnable[dict, dict],
+        args: tuple[Any, ...],
+        config: RunnableConfig,
+        kwargs: dict[str, Any],
+        thread: Any | None,
+        cancel_token: CancelToken | None,
+    ) -> AsyncIterator[Any]:
+        if cancel_token is None:
+            async for chunk in graph.astream(*args, config=config, **kwargs):
+                yield chunk
+            await self._aprune_checkpoints(thread)
+            return
+
+        _add_callback_handler(config, AsyncCancellationCallbackHandler(cancel_token))
+        # Also stream the state values, to save the partial messages when cancelled:
+        stream_mode = kwargs.pop("stream_mode", "values")
+        stream_modes = [stream_mode] if isinstance(stream_mode, str) else list(stream_mode)
+        state = None
+        stream = graph.astream(
+            *args,
+            config=config,
+            stream_mode=list(dict.fromkeys([*stream_modes, "values"])),
+            **kwargs,
+        )
+        try:
+            async for mode, chunk in aiter_until_cancelled(stream, cancel_token):
+                if mode == "values":
+                    state = chunk
+                if mode in stream_modes:
+                    yield chunk if isinstance(stream_mode, str) else (mode, chunk)
+        except AIRunCancelledError:
+            if thread is not None and state is not None:
+                await _asave_partial_messages(state, thread)
+            raise
+        await self._aprune_checkpoints(thread)
+
+    async def _astream_with_run(
+        self,
+        graph: Runnable[dict, dict],
+        args: tuple[Any, ...],
+        config: RunnableConfig,
+        kwargs: dict[str, Any],
+        thread: Any | None,
+        run: Any | None,
+        cancel_token: CancelToken | None,
+    ) -> AsyncIterator[Any]:
+        run = await self._astart_run(thread, args, run)
+        cancel_token = self._get_run_cancel_token(cancel_token, run)
+        if run is None:
+            async for chunk in self._astream_graph(
+                graph, args, config, kwargs, thread, cancel_token
+            ):
+                yield chunk
+            return
+
+        tracker = _add_callback_handler(config, RunTrackingCallbackHandler())
+        try:
+            async for chunk in self._astream_graph(
+                graph, args, config, kwargs, thread, cancel_token
+            ):
+                yield chunk
+        except BaseException as e:
+            _set_run_result(run, tracker, error=e)
+            await run.asave(update_fields=run.RESULT_FIELDS)
+            raise
+        _set_run_result(run, tracker)
+        await run.asave(update_fields=run.RESULT_FIELDS)
+
+    def _get_new_run(self, thread: Any, args: tuple[Any, ...]) -> Any:
+        from django_ai_assistant.models import Run
+
+        message = args[0].get("input", "") if args and isinstance(args[0], dict) else ""
+        user = self._user if getattr(self._user, "pk", None) is not None else None
+        return Run(
+            thread=thread,
+            assistant_id=self.id,
+            created_by=user,
+            input=message if isinstance(message, str) else str(message),
+            status=Run.Status.RUNNING,
+            started_at=timezone.now(),
+        )
+
+    def _start_run(self, thread: Any | None, args: tuple[Any, ...], run: Any | None) -> Any | None:
+        if run is None:
+            if thread is None or not self.track_runs:
+                return None
+            run = self._get_new_run(thread, args)
+            run.save()
+        elif run.status != run.Status.RUNNING:
+            run.status = run.Status.RUNNING
+            run.started_at = timezone.now()
+            run.save(update_fields=["status", "started_at"])
+        return run
+
+    async def _astart_run(
+        self, thread: Any | None, args: tuple[Any, ...], run: Any | None
+    ) -> Any | None:
+        if run is None:
+            if thread is None or not self.track_runs:
+                return None
+            run = self._get_new_run(thread, args)
+            await run.asave()
+        elif run.status != run.Status.RUNNING:
+            run.status = run.Status.RUNNING
+            run.started_at = timezone.now()
+            await run.asave(update_fields=["status", "started_at"])
+        return run
 
     @with_cast_id
     def run(self, message: str, thread_id: Any | None = None, **kwargs: Any) -> Any:
@@ -708,6 +1553,83 @@ class AIAssistant(abc.ABC):  # noqa: F821
             **kwargs,
         )["output"]
 
+    @with_cast_id
+    async def ainvoke(
+        self,
+        *args: Any,
+        thread_id: Any | None = None,
+        thread: Any | None = None,
+        run: Any | None = None,
+        cancel_token: CancelToken | None = None,
+        **kwargs: Any,
+    ) -> dict:
+        """Async version of `invoke`.\n
+        The graph nodes run natively in async mode: LLMs and retrievers are called with
+        `ainvoke`, and the thread messages are loaded and saved with Django async queries.
+
+        If thread_id and thread are `None`, an in-memory chat message history is used.
+
+        Args:
+            *args: Positional arguments to pass to the graph.
+                To add a new message, use a dict like `{"input": "user message"}`.
+            thread_id (Any | None): The thread ID for the chat message history.
+            thread (Any | None): The thread object for the chat message history.
+            run (Run | None): An existing run to record the execution in, like a queued run.
+                If `None`, a new run is created when there's a thread and `track_runs=True`.
+            cancel_token (CancelToken | None): Token to cancel the run.
+                Cancelling aborts the in-flight LLM and tool calls.
+                Pass a `RunCancelToken` of the run so it can be cancelled with `cancel_run`.
+            **kwargs: Keyword arguments to pass to the graph.
+
+        Returns:
+            dict: The output of the assistant graph,
+                structured like `{"output": "assistant response", "history": ...}`.
+        """
+        from django_ai_assistant.models import Thread
+
+        if thread is None and thread_id is not None:
+            thread = await Thread.objects.aget(id=thread_id)
+
+        graph = self.as_graph(thread=thread)
+        config = kwargs.pop("config", {})
+        run = await self._astart_run(thread, args, run)
+        cancel_token = self._get_run_cancel_token(cancel_token, run)
+        if run is None:
+            return await self._ainvoke_graph(graph, args, config, kwargs, thread, cancel_token)
+
+        tracker = _add_callback_handler(config, RunTrackingCallbackHandler())
+        try:
+            output = await self._ainvoke_graph(graph, args, config, kwargs, thread, cancel_token)
+        except BaseException as e:
+            _set_run_result(run, tracker, error=e)
+            await run.asave(update_fields=run.RESULT_FIELDS)
+            raise
+        _set_run_result(run, tracker)
+        await run.asave(update_fields=run.RESULT_FIELDS)
+        return output
+
+    @with_cast_id
+    async def arun(self, message: str, thread_id: Any | None = None, **kwargs: Any) -> Any:
+        """Async version of `run`.\n
+
+        Args:
+            message (str): The user message to pass to the assistant.
+            thread_id (Any | None): The thread ID for the chat message history.
+                If `None`, an in-memory chat message history is used.
+            **kwargs: Additional keyword arguments to pass to the graph.
+
+        Returns:
+            Any: The assistant response to the user message.
+        """
+        output = await self.ainvoke(
+            {
+                "input": message,
+            },
+            thread_id=thread_id,
+            **kwargs,
+        )
+        return output["output"]
+
     @with_cast_id
     async def astream(
         self, message: str, thread: Any | None = None, **kwargs: Any
@@ -736,6 +1658,132 @@ class AIAssistant(abc.ABC):  # noqa: F821
             if metadata.get("langgraph_node") == "agent" and (content := output.content):
                 yield content
 
+    @with_cast_id
+    async def astream_events(
+        self, message: str, thread: Any | None = None, **kwargs: Any
+    ) -> AsyncIterator[dict[str, Any]]:
+        """Async-stream the assistant run events with the given message and thread.\n
+        Yields dicts like `{"event": "token", "data": {...}}`, with the following events:
+
+        * `token`: a content chunk of the LLM response, with `content`
+        * `tool_call_start`: a tool call requested by the LLM, with `id`, `name`, and `args`
+        * `tool_call_end`: a tool call result, with `id`, `name`, and `content`
+        * `message`: the final AI message, with `id`, `type`, and `content`.
+          When a thread is used, `id` is the ID of the saved message.
+
+        Args:
+            message (str): The user message to pass to the assistant.
+            thread (Any | None): The thread object for the chat message history.
+                If `None`, an in-memory chat message history is used.
+            **kwargs: Additional keyword arguments to pass to the graph.
+
+        Yields:
+            dict[str, Any]: The assistant run events.
+        """
+        last_ai_message = None
+        async for stream_mode, chunk in self.invoke(
+            {
+                "input": message,
+            },
+            thread=thread,
+            mode="astream",
+            stream_mode=["messages", "updates"],
+            **kwargs,
+        ):
+            if stream_mode == "messages":
+                output, metadata = chunk
+                if metadata.get("langgraph_node") == "agent" and (content := output.content):
+                    yield {"event": "token", "data": {"content": content}}
+                continue
+
+            for node, update in chunk.items():
+                if not update:
+                    continue
+                if node == "agent":
+                    last_ai_message = update["messages"][-1]
+                    for tool_call in last_ai_message.tool_calls:
+                        yield {
+                            "event": "tool_call_start",
+                            "data": {
+                                "id": tool_call["id"],
+                                "name": tool_call["name"],
+                                "args": tool_call["args"],
+                            },
+                        }
+                elif node == "tools":
+                    for tool_message in update["messages"]:
+                        yield {
+                            "event": "tool_call_end",
+                            "data": {
+                                "id": tool_message.tool_call_id,
+                                "name": tool_message.name,
+                                "content": tool_message.content,
+                            },
+                        }
+
+        if last_ai_message is not None:
+            # The message ID was changed in place to the Django ID when saved:
+            yield {
+                "event": "message",
+                "data": {
+                    "id": last_ai_message.id,
+                    "type": last_ai_message.type,
+                    "content": last_ai_message.content,
+                },
+            }
+
+    @with_cast_id
+    async def astream_structured(
+        self, message: str, thread: Any | None = None, **kwargs: Any
+    ) -> AsyncIterator[Any]:
+        """Async-stream the structured output of the assistant with the given message and thread,
+        as partial objects incrementally parsed while the LLM generates them.\n
+        Each item is a progressively more complete version of the structured output, as JSON data,
+        like `{"nearby_attractions": [{"name": "Central Park"}]}`.
+        The last item is the complete structured output: for Pydantic models, its `model_dump`.
+        The partial strings and objects of the other items may be incomplete.\n
+        Streams the LLM call that produces the structured output, according to
+        `structured_output_mode`. Only yields the complete structured output
+        if the LLM doesn't support streaming.
+
+        Args:
+            message (str): The user message to pass to the assistant.
+            thread (Any | None): The thread object for the chat message history.
+                If `None`, an in-memory chat message history is used.
+            **kwargs: Additional keyword arguments to pass to the graph.
+
+        Yields:
+            Any: The partial structured outputs, then the complete one.
+        """
+        if not self.structured_output:
+            raise ValueError("structured_output is not defined")
+
+        parser = _PartialStructuredOutputParser(self)
+        state = None
+        async for stream_mode, chunk in self.invoke(
+            {
+                "input": message,
+            },
+            thread=thread,
+            mode="astream",
+            stream_mode=["messages", "values"],
+            **kwargs,
+        ):
+            if stream_mode == "values":
+                state = chunk
+                continue
+
+            output, metadata = chunk
+            partial = parser.parse(output, metadata.get("langgraph_node"))
+            if partial is not None:
+                yield partial
+
+        output = (state or {}).get("output")
+        if isinstance(output, BaseModel):
+            output = output.model_dump(mode="json")
+        if output is not None and output != parser.last_output:
+            yield output
+
     def _run_as_tool(self, message: str, **kwargs: Any) -> Any:
         return self.run(message, thread_id=None, **kwargs)
 
@@ -754,3 +1802,673 @@ class AIAssistant(abc.ABC):  # noqa: F821
             name=self.id,
             description=description,
         )
+
+
+CallbackHandlerT = TypeVar("CallbackHandlerT", bound=BaseCallbackHandler)
+
+
+def _add_callback_handler(config: RunnableConfig, handler: CallbackHandlerT) -> CallbackHandlerT:
+    callbacks = config.get("callbacks")
+    if isinstance(callbacks, BaseCallbackManager):
+        callbacks = callbacks.copy()
+        callbacks.add_handler(handler)
+        config["callbacks"] = callbacks
+    else:
+        config["callbacks"] = [*(callbacks or []), handler]
+    return handler
+
+
+# Errors raised when a run is stopped before finishing, by a cancel token or by its caller:
+CANCELLATION_ERRORS = (AIRunCancelledError, asyncio.CancelledError, GeneratorExit)
+
+
+def _set_run_result(
+    run: Any, tracker: RunTrackingCallbackHandler, error: BaseException | None = None
+):
+    if error is None:
+        run.status = run.Status.SUCCEEDED
+        output = (tracker.output or {}).get("output")
+        run.output = output.model_dump(mode="json") if isinstance(output, BaseModel) else output
+    elif isinstance(error, CANCELLATION_ERRORS) and not isinstance(error, AIRunTimeoutError):
+        run.status = run.Status.CANCELLED
+    else:
+        run.status = run.Status.FAILED
+        run.error = str(error) or error.__class__.__name__
+    run.node_timings = tracker.node_timings
+    run.tool_calls = tracker.tool_calls
+    run.token_usage = dict(tracker.token_usage) if tracker.token_usage else None
+    run.finished_at = timezone.now()
+
+
+def _get_partial_messages(state: AgentState) -> list[BaseMessage]:
+    # Keep the new messages up to the last one that leaves no tool call without a result,
+    # as LLMs reject histories with unanswered tool calls:
+    messages = _get_new_messages(state)
+    pending_tool_call_ids: set[str | None] = set()
+    consistent_count = 0
+    for count, message in enumerate(messages, start=1):
+        if isinstance(message, AIMessage):
+            pending_tool_call_ids.update(tool_call["id"] for tool_call in message.tool_calls)
+        elif isinstance(message, ToolMessage):
+            pending_tool_call_ids.discard(message.tool_call_id)
+        if not pending_tool_call_ids:
+            consistent_count = count
+    return messages[:consistent_count]
+
+
+def _get_saved_message_pks(messages: list[BaseMessage]) -> list[Any]:
+    # Saved messages have their ID changed in place to the Django ID.
+    # Other IDs, like LangChain UUIDs, may not even be valid primary keys:
+    from django_ai_assistant.models import Message as DjangoMessage
+
+    pk_field = DjangoMessage._meta.pk
+    pks = []
+    for message in messages:
+        try:
+            pk = pk_field.to_python(message.id)
+        except ValidationError:
+            continue
+        if pk is not None:
+            pks.append(pk)
+    return pks
+
+
+def _save_partial_messages(state: AgentState, thread: Any):
+    messages = _get_partial_messages(state)
+    if pks := _get_saved_message_pks(messages):
+        saved_ids = {
+            str(pk) for pk in thread.messages.filter(id__in=pks).values_list("id", flat=True)
+        }
+        messages = [m for m in messages if m.id not in saved_ids]
+    if messages:
+        save_django_messages(messages, thread=thread)
+
+
+async def _asave_partial_messages(state: AgentState, thread: Any):
+    messages = _get_partial_messages(state)
+    if pks := _get_saved_message_pks(messages):
+        saved_ids = {
+            str(pk) async for pk in thread.messages.filter(id__in=pks).values_list("id", flat=True)
+        }
+        messages = [m for m in messages if m.id not in saved_ids]
+    if messages:
+        await asave_django_messages(messages, thread=thread)
+
+
+def _get_assistant(config: RunnableConfig) -> AIAssistant:
+    return config["configurable"]["assistant"]
+
+
+def _get_thread(config: RunnableConfig) -> Any | None:
+    return config["configurable"].get("thread")
+
+
+# Fixed ID, so the system message restored from a checkpoint is replaced instead of duplicated:
+SYSTEM_MESSAGE_ID = "system"
+
+
+def _route_start(state: AgentState, config: RunnableConfig) -> list[str]:
+    return ["setup"]
+
+
+async def _aroute_start(state: AgentState, config: RunnableConfig) -> list[str]:
+    if _retriever_needs_history(state, config):
+        return ["setup", "history"]
+    return ["setup", "history", "retriever"]
+
+
+def _route_after_setup(state: AgentState, config: RunnableConfig) -> list[str]:
+    return ["history"]
+
+
+async def _aroute_after_setup(state: AgentState, config: RunnableConfig) -> list[str]:
+    return []
+
+
+def _route_after_history(state: AgentState, config: RunnableConfig) -> list[str]:
+    return ["retriever"]
+
+
+async def _aroute_after_history(state: AgentState, config: RunnableConfig) -> list[str]:
+    return ["retriever"] if _retriever_needs_history(state, config) else []
+
+
+def _retriever_needs_history(state: AgentState, config: RunnableConfig) -> bool:
+    assistant = _get_assistant(config)
+    if not assistant.has_rag:
+        return False
+    # Without input, the question is the last thread message:
+    if not state.get("input"):
+        return True
+    return _get_thread(config) is not None and assistant.contextualize_policy != "never"
+
+
+def _setup_node(state: AgentState, config: RunnableConfig):
+    return {"instructions": _get_assistant(config).get_instructions()}
+
+
+async def _asetup_node(state: AgentState, config: RunnableConfig):
+    return {"instructions": await _get_assistant(config).aget_instructions()}
+
+
+def _history_node(state: AgentState, config: RunnableConfig):
+    assistant = _get_assistant(config)
+    thread = _get_thread(config)
+    if not thread:
+        return _history_update([])
+
+    summary = assistant.get_history_summary(thread)
+    restored_messages = state["messages"][1:]
+    if restored_messages:
+        latest_messages = thread.get_messages(include_extra_messages=True, last_n=1)
+        if _is_checkpoint_up_to_date(restored_messages, latest_messages):
+            messages = assistant._drop_summarized_messages(thread, restored_messages)
+            messages = assistant._trim_history_messages(messages)
+            return _history_update(messages, replace=True, summary=summary)
+
+    messages = assistant.get_history_messages(thread)
+    return _history_update(messages, replace=bool(restored_messages), summary=summary)
+
+
+async def _ahistory_node(state: AgentState, config: RunnableConfig):
+    assistant = _get_assistant(config)
+    thread = _get_thread(config)
+    if not thread:
+        return _history_update([])
+
+    summary = assistant.get_history_summary(thread)
+    restored_messages = state["messages"][1:]
+    if restored_messages:
+        latest_messages = await thread.aget_messages(include_extra_messages=True, last_n=1)
+        if _is_checkpoint_up_to_date(restored_messages, latest_messages):
+            messages = assistant._drop_summarized_messages(thread, restored_messages)
+            messages = assistant._trim_history_messages(messages)
+            return _history_update(messages, replace=True, summary=summary)
+
+    messages = await assistant.aget_history_messages(thread)
+    return _history_update(messages, replace=bool(restored_messages), summary=summary)
+
+
+def _is_checkpoint_up_to_date(
+    restored_messages: list[AnyMessage], latest_messages: list[BaseMessage]
+) -> bool:
+    # Messages restored from a checkpoint have the Django IDs they were saved with.
+    # If the latest thread message is a different one, the thread changed outside of the graph,
+    # e.g. a message was deleted, so the history is loaded from the thread again:
+    latest_id = latest_messages[-1].id if latest_messages else None
+    return restored_messages[-1].id == latest_id
+
+
+def _history_update(messages: list, replace: bool = False, summary: str = ""):
+    return {"history": {"messages": messages, "replace": replace, "summary": summary}}
+
+
+def _prompt_node(state: AgentState):
+    history = cast(dict, state["history"])
+    messages = history["messages"]
+    # Track the messages already saved in the thread, to only save the new ones in the end:
+    history_message_ids = [m.id for m in messages]
+    if state["input"]:
+        messages = [*messages, HumanMessage(content=state["input"])]
+
+    system_prompt = cast(str, state["instructions"])
+    if history["summary"]:
+        system_prompt += AIAssistant.HISTORY_SUMMARY_TEMPLATE.format(summary=history["summary"])
+    if state.get("context") is not None:
+        system_prompt += f"\n\n---START OF CONTEXT---\n{state['context']}---END OF CONTEXT---\n\n"
+    # Fixed ID, so the system message restored from a checkpoint is replaced:
+    messages = [SystemMessage(content=system_prompt, id=SYSTEM_MESSAGE_ID), *messages]
+    if history["replace"]:
+        # Replace the messages restored from the checkpoint:
+        messages = [RemoveMessage(id=REMOVE_ALL_MESSAGES), *messages]
+
+    # Clear the intermediate values, so they aren't stored in checkpoints:
+    return {
+        "messages": messages,
+        "history_message_ids": history_message_ids,
+        "instructions": None,
+        "history": None,
+        "context": None,
+    }
+
+
+async def _aprompt_node(state: AgentState):
+    return _prompt_node(state)
+
+
+CONTEXTUALIZE_SHORT_INPUT_WORDS = 4
+"""Questions with up to this many words are rewritten by the default `needs_contextualization`."""
+
+CONTEXTUALIZE_REFERRING_WORDS = frozenset(
+    [
+        "it", "its", "it's", "this", "that", "these", "those", "they", "them", "their",
+        "he", "him", "his", "she", "her", "there", "then", "same", "above", "previous",
+        "former", "latter", "else", "another", "other", "also", "too", "one", "ones",
+    ]
+)  # fmt: skip
+"""Words that make the default `needs_contextualization` rewrite the question."""
+
+
+def get_contextualize_cache() -> BaseCache | None:
+    """Get the Django cache configured by `AI_ASSISTANT_CONTEXTUALIZE_CACHE`, if any.
+
+    Returns:
+        BaseCache | None: The cache, or None if caching question rewrites is disabled.
+    """
+    alias = app_settings.get_setting("CONTEXTUALIZE_CACHE")
+    return caches[alias] if alias else None
+
+
+def _make_contextualize_key(assistant_id: str, x: dict) -> str:
+    content = f"{get_buffer_string(x['history'])}\n{x['input']}"
+    digest = hashlib.sha256(content.encode()).hexdigest()
+    return f"django_ai_assistant:contextualize:{assistant_id}:{digest}"
+
+
+def _merge_retrieved_documents(results: dict) -> list:
+    documents = list(results["contextualized"])
+    documents.extend(doc for doc in results["raw"] if doc not in documents)
+    return documents
+
+
+def _retriever_node(state: AgentState, config: RunnableConfig):
+    assistant = _get_assistant(config)
+    if not assistant.has_rag:
+        return {"context": None}
+
+    retriever = assistant.get_history_aware_retriever()
+    docs = retriever.invoke(_get_retriever_input(state))
+    return {"context": _format_documents(assistant, docs)}
+
+
+async def _aretriever_node(state: AgentState, config: RunnableConfig):
+    assistant = _get_assistant(config)
+    if not assistant.has_rag:
+        return {"context": None}
+
+    # Building the retriever may use the Django ORM, e.g. to load the documents:
+    retriever = await sync_to_async(assistant.get_history_aware_retriever)()
+    docs = await retriever.ainvoke(_get_retriever_input(state))
+    return {"context": _format_documents(assistant, docs)}
+
+
+def _get_retriever_input(state: AgentState) -> dict:
+    # When the retriever runs concurrently with "history", the history isn't loaded yet,
+    # but it's only needed to rewrite the input, see `_retriever_needs_history`:
+    history = state.get("history")
+    messages = list(history["messages"]) if history else []
+    if state["input"]:
+        return {"input": state["input"], "history": messages}
+    return {"input": messages[-1].content, "history": messages[:-1]}
+
+
+def _format_documents(assistant: AIAssistant, docs: list) -> str:
+    document_separator = assistant.get_document_separator()
+    document_prompt = assistant.get_document_prompt()
+
+    return document_separator.join(format_document(doc, document_prompt) for doc in docs)
+
+
+def _agent_node(state: AgentState, config: RunnableConfig):
+    assistant = _get_assistant(config)
+    llm = assistant._get_llm_with_tools()
+    response = call_with_resilience(
+        partial(llm.invoke, state["messages"]), **assistant._get_llm_resilience()
+    )
+
+    return {"messages": [response]}
+
+
+async def _aagent_node(state: AgentState, config: RunnableConfig):
+    assistant = _get_assistant(config)
+    llm = assistant._get_llm_with_tools()
+    response = await acall_with_resilience(
+        partial(llm.ainvoke, state["messages"]), **assistant._get_llm_resilience()
+    )
+
+    return {"messages": [response]}
+
+
+def _tools_node(state: AgentState, config: RunnableConfig):
+    # The ToolNode runs the tool calls in a thread pool limited by `max_concurrency`:
+    return _get_assistant(config)._get_tool_node().invoke(state, config)
+
+
+async def _atools_node(state: AgentState, config: RunnableConfig):
+    # The ToolNode runs the tool calls concurrently with `asyncio.gather`,
+    # limited by this semaphore, which `_arun_tool_call` acquires:
+    max_concurrency = config.get("max_concurrency") or _get_assistant(config).tool_max_concurrency
+    token = _tool_semaphore.set(asyncio.Semaphore(max_concurrency))
+    try:
+        return await _get_assistant(config)._get_tool_node().ainvoke(state, config)
+    finally:
+        _tool_semaphore.reset(token)
+
+
+def _make_resilient_func(
+    func: Callable, resilience: dict[str, Any], get_timeout: Callable[[], float | None]
+) -> Callable:
+    def resilient_func(**kwargs: Any) -> Any:
+        return call_with_resilience(partial(func, **kwargs), timeout=get_timeout(), **resilience)
+
+    return resilient_func
+
+
+def _make_resilient_coroutine(
+    coroutine: Callable, resilience: dict[str, Any], get_timeout: Callable[[], float | None]
+) -> Callable:
+    async def resilient_coroutine(**kwargs: Any) -> Any:
+        return await acall_with_resilience(
+            partial(coroutine, **kwargs), timeout=get_timeout(), **resilience
+        )
+
+    return resilient_coroutine
+
+
+def _make_sync_tool_func(coroutine: Callable) -> Callable:
+    # A plain function, as LangGraph inspects the type hints of the tool functions:
+    def sync_func(**kwargs: Any) -> Any:
+        return async_to_sync(coroutine)(**kwargs)
+
+    return sync_func
+
+
+_tool_semaphore: ContextVar[asyncio.Semaphore] = ContextVar("tool_semaphore")
+
+
+def _tool_error_message(request: ToolCallRequest, error: Exception) -> ToolMessage:
+    return ToolMessage(
+        content=f"Error: {error}",
+        name=request.tool_call["name"],
+        tool_call_id=request.tool_call["id"],
+        status="error",
+    )
+
+
+def _bind_tool_call_request(request: ToolCallRequest) -> tuple[ToolCallRequest, float | None]:
+    # The ToolNode is shared by the assistant class, so run the tool of the run assistant:
+    assistant = _get_assistant(request.runtime.config)
+    name = request.tool_call["name"]
+    tool = assistant._get_tools_by_name().get(name)
+    if tool is not None:
+        request = request.override(tool=tool)
+    return request, assistant._get_tool_timeouts().get(name)
+
+
+def _run_tool_call(
+    request: ToolCallRequest,
+    execute: Callable[[ToolCallRequest], ToolMessage | Command],
+) -> ToolMessage | Command:
+    request, timeout = _bind_tool_call_request(request)
+    # Timeouts and open circuits are returned to the LLM, which can answer without the tool:
+    try:
+        return call_with_timeout(partial(execute, request), timeout)
+    except (TimeoutError, AICircuitOpenError) as e:
+        return _tool_error_message(request, e)
+
+
+async def _arun_tool_call(
+    request: ToolCallRequest,
+    execute: Callable[[ToolCallRequest], Awaitable[ToolMessage | Command]],
+) -> ToolMessage | Command:
+    request, timeout = _bind_tool_call_request(request)
+    semaphore = _tool_semaphore.get(None)
+    async with semaphore if semaphore is not None else nullcontext():
+        try:
+            return await acall_with_timeout(partial(execute, request), timeout)
+        except (TimeoutError, AICircuitOpenError) as e:
+            return _tool_error_message(request, e)
+
+
+def _tool_selector(state: AgentState, config: RunnableConfig):
+    last_message = state["messages"][-1]
+
+    if isinstance(last_message, AIMessage) and last_message.tool_calls:
+        if _get_final_answer_tool_call(_get_assistant(config), last_message) is not None:
+            return "continue"
+        return "call_tool"
+
+    return "continue"
+
+
+FINAL_ANSWER_TOOL_NAME = "final_answer"
+FINAL_ANSWER_TOOL_DESCRIPTION = (
+    "Respond to the user with the final answer. "
+    "Call this tool once you have all the information to answer."
+)
+
+
+def _get_final_answer_tool_call(assistant: AIAssistant, message: AIMessage) -> dict | None:
+    if assistant._get_structured_output_mode() != "tool":
+        return None
+    return next((tc for tc in message.tool_calls if tc["name"] == FINAL_ANSWER_TOOL_NAME), None)
+
+
+def _get_direct_structured_output(
+    assistant: AIAssistant, state: AgentState
+) -> tuple[Any | None, AIMessage | None]:
+    # Get the structured output from the final agent step, without another LLM call.
+    # Also returns the final message to replace in the state, if it must be replaced.
+    message = state["messages"][-1]
+    mode = assistant._get_structured_output_mode()
+    if not isinstance(message, AIMessage) or mode == "extra_call":
+        return None, None
+
+    replacement = None
+    try:
+        if mode == "tool":
+            tool_call = _get_final_answer_tool_call(assistant, message)
+            if tool_call is None:
+                return None, None
+            # Without the tool call, which has no result, so the thread stays valid:
+            replacement = AIMessage(content=json.dumps(tool_call["args"]), id=message.id)
+            value = tool_call["args"]
+        else:
+            value = message.additional_kwargs.get("parsed") or json.loads(str(message.content))
+        schema = assistant.structured_output
+        if is_basemodel_subclass(schema):
+            value = (
+                schema.model_validate(value)
+                if issubclass(schema, BaseModel)
+                else schema.parse_obj(value)
+            )
+    except (ValueError, TypeError):
+        logger.warning(
+            "Invalid structured output from the agent of %s, using an extra LLM call",
+            assistant.id,
+            exc_info=True,
+        )
+        return None, replacement
+    return value, replacement
+
+
+def _record_response_node(state: AgentState, config: RunnableConfig):
+    assistant = _get_assistant(config)
+    thread = _get_thread(config)
+
+    replacements: list[AnyMessage] = []
+    extra_messages: list[BaseMessage] = []
+    if assistant.structured_output:
+        response, final_message = _get_direct_structured_output(assistant, state)
+        if final_message is not None:
+            replacements.append(final_message)
+        if response is None:
+            messages = _get_structured_output_messages(state, final_message)
+            response = assistant.get_structured_output_llm().invoke(messages)
+            # The JSON request is kept in the state and saved in the thread, like the answer:
+            extra_messages.append(messages[-1])
+    else:
+        response = state["messages"][-1].content
+
+    update: dict[str, Any] = {"output": response}
+    if replacements or extra_messages:
+        update["messages"] = [*replacements, *extra_messages]
+    if thread:
+        new_messages = [*_get_new_messages(state, replacements), *extra_messages]
+        # The replaced messages get other IDs when saved, so remove them by their current IDs:
+        removals = [RemoveMessage(id=cast(str, m.id)) for m in replacements]
+        save_django_messages(new_messages, thread=thread)
+        # Update the state with the messages saved with Django IDs, for the checkpoint:
+        update["messages"] = [*removals, *new_messages]
+        if assistant.history_summary_max_tokens:
+            _update_thread_summary(assistant, thread)
+    return update
+
+
+async def _arecord_response_node(state: AgentState, config: RunnableConfig):
+    assistant = _get_assistant(config)
+    thread = _get_thread(config)
+
+    replacements: list[AnyMessage] = []
+    extra_messages: list[BaseMessage] = []
+    if assistant.structured_output:
+        response, final_message = _get_direct_structured_output(assistant, state)
+        if final_message is not None:
+            replacements.append(final_message)
+        if response is None:
+            messages = _get_structured_output_messages(state, final_message)
+            response = await assistant.get_structured_output_llm().ainvoke(messages)
+            # The JSON request is kept in the state and saved in the thread, like the answer:
+            extra_messages.append(messages[-1])
+    else:
+        response = state["messages"][-1].content
+
+    update: dict[str, Any] = {"output": response}
+    if replacements or extra_messages:
+        update["messages"] = [*replacements, *extra_messages]
+    if thread:
+        new_messages = [*_get_new_messages(state, replacements), *extra_messages]
+        # The replaced messages get other IDs when saved, so remove them by their current IDs:
+        removals = [RemoveMessage(id=cast(str, m.id)) for m in replacements]
+        await asave_django_messages(new_messages, thread=thread)
+        # Update the state with the messages saved with Django IDs, for the checkpoint:
+        update["messages"] = [*removals, *new_messages]
+        if assistant.history_summary_max_tokens:
+            await _aupdate_thread_summary(assistant, thread)
+    return update
+
+
+_summary_executor = ThreadPoolExecutor(thread_name_prefix="django_ai_assistant_summary")
+
+
+def _update_thread_summary(assistant: AIAssistant, thread: Any):
+    if not assistant.history_summary_in_background:
+        assistant.update_thread_summary(thread)
+        return
+
+    # Only summarize once the new messages are committed, so the background thread sees them:
+    transaction.on_commit(
+        lambda: _summary_executor.submit(_update_thread_summary_in_background, assistant, thread)
+    )
+
+
+async def _aupdate_thread_summary(assistant: AIAssistant, thread: Any):
+    if not assistant.history_summary_in_background:
+        await assistant.aupdate_thread_summary(thread)
+        return
+
+    _summary_executor.submit(_update_thread_summary_in_background, assistant, thread)
+
+
+def _update_thread_summary_in_background(assistant: AIAssistant, thread: Any):
+    try:
+        assistant.update_thread_summary(thread)
+    except Exception:
+        logger.exception("Failed to update the summary of thread %s", thread.id)
+    finally:
+        connections.close_all()
+
+
+class _PartialStructuredOutputParser:
+    # Parses the JSON of the structured output from the streamed LLM message chunks.
+    # The structured output is the content of the "respond" node LLM call (the extra call),
+    # or, for the final agent step, its final answer tool call or its native JSON content.
+
+    def __init__(self, assistant: AIAssistant):
+        self.mode = assistant._get_structured_output_mode()
+        self.buffers: dict[tuple[str | None, Any], str] = {}
+        self.tool_names: dict[tuple[str | None, Any], str | None] = {}
+        self.last_output: Any = None
+
+    def parse(self, message: BaseMessage, node: str | None) -> Any | None:
+        if not isinstance(message, AIMessage):
+            return None
+        if node == "respond" or (node == "agent" and self.mode == "native"):
+            text = self._add_text((message.id, None), message.text, message)
+        elif node == "agent" and self.mode == "tool":
+            text = self._add_final_answer_args(message)
+        else:
+            return None
+        if not text:
+            return None
+
+        try:
+            output = parse_partial_json(text)
+        except ValueError:
+            return None
+        if not isinstance(output, dict) or output == self.last_output:
+            return None
+        self.last_output = output
+        return output
+
+    def _add_text(self, key: tuple[str | None, Any], text: str, message: BaseMessage) -> str:
+        # Chunks are parts of the message, other messages are complete:
+        if isinstance(message, AIMessageChunk):
+            text = self.buffers.get(key, "") + text
+        self.buffers[key] = text
+        return text
+
+    def _add_final_answer_args(self, message: AIMessage) -> str | None:
+        if not isinstance(message, AIMessageChunk):
+            tool_call = next(
+                (tc for tc in message.tool_calls if tc["name"] == FINAL_ANSWER_TOOL_NAME), None
+            )
+            return json.dumps(tool_call["args"]) if tool_call is not None else None
+
+        text = None
+        for tool_call_chunk in message.tool_call_chunks:
+            key = (message.id, tool_call_chunk["index"])
+            # Only the first chunk of each tool call has its name:
+            if tool_call_chunk["name"]:
+                self.tool_names[key] = tool_call_chunk["name"]
+            if self.tool_names.get(key) == FINAL_ANSWER_TOOL_NAME:
+                text = self._add_text(key, tool_call_chunk["args"] or "", message)
+        return text
+
+
+def _get_structured_output_messages(
+    state: AgentState, final_message: AIMessage | None = None
+) -> list[AnyMessage]:
+    # Structured output must happen in the end, to avoid disabling tool calling.
+    # Tool calling + structured output is not supported by OpenAI.
+    # Copy the messages, so the changed system prompt isn't kept in the state.
+    # The JSON request is the last message:
+    messages = list(state["messages"])
+    if final_message is not None:
+        messages[-1] = final_message
+
+    # Change the original system prompt:
+    if isinstance(messages[0], SystemMessage):
+        messages[0] = SystemMessage(
+            content=f"{messages[0].content}\nUse the chat history to produce a JSON output.",
+            id=messages[0].id,
+        )
+
+    # Add a final message asking for JSON generation / structured output:
+    json_request_message = HumanMessage(content="Use the chat history to produce a JSON output.")
+    messages.append(json_request_message)
+    return messages
+
+
+def _get_new_messages(
+    state: AgentState, replacements: list[AnyMessage] | None = None
+) -> list[BaseMessage]:
+    # Save all new messages, except the initial system message:
+    history_message_ids = set(state.get("history_message_ids") or [])
+    replacements_by_id = {m.id: m for m in replacements or []}
+    new_messages = [
+        replacements_by_id.get(m.id, m)
+        for m in state["messages"]
+        if not isinstance(m, SystemMessage) and m.id not in history_message_ids
+    ]
+    return cast(list[BaseMessage], new_messages)
@@ -0,0 +1,174 @@
+import asyncio
+import threading
+import time
+from typing import Any, AsyncIterator, TypeVar
+
+from django_ai_assistant.exceptions import AIRunCancelledError, AIRunTimeoutError
+
+
+T = TypeVar("T")
+
+
+class CancelToken:
+    """Token to cancel an assistant run, passed as `cancel_token` to `AIAssistant.invoke`
+    and its variants. Call `cancel` from anywhere, like another thread, to stop the run.\n
+    Sync runs stop before the next graph node, LLM call, or tool call.
+    Async runs also abort the in-flight LLM and tool calls.
+    Either way, the run raises `AIRunCancelledError`."""
+
+    check_interval: float = 0.1
+    """Seconds between checks of the token while an async run awaits."""
+
+    def __init__(self):
+        self._cancelled = threading.Event()
+
+    def cancel(self):
+        """Cancel the run."""
+        self._cancelled.set()
+
+    def is_cancelled(self) -> bool:
+        """Whether the run was cancelled."""
+        return self._cancelled.is_set()
+
+    async def ais_cancelled(self) -> bool:
+        """Async version of `is_cancelled`."""
+        return self.is_cancelled()
+
+    def get_error(self) -> AIRunCancelledError:
+        """Get the error that stops the run once cancelled."""
+        return AIRunCancelledError("The run was cancelled")
+
+
+class DeadlineCancelToken(CancelToken):
+    """Cancel token that is also cancelled once `timeout` seconds have passed since its creation.
+    Used for runs of assistants with a `run_timeout`.
+    When the deadline passes, the run raises `AIRunTimeoutError`.
+
+    Args:
+        timeout (float): Seconds until the deadline.
+        cancel_token (CancelToken | None): Token that cancels the run before the deadline,
+            like the `RunCancelToken` of the run.
+    """
+
+    def __init__(self, timeout: float, cancel_token: CancelToken | None = None):
+        super().__init__()
+        self.timeout = timeout
+        self.deadline = time.monotonic() + timeout
+        self.cancel_token = cancel_token
+
+    @property
+    def check_interval(self) -> float:  # type: ignore[override]
+        interval = self.cancel_token.check_interval if self.cancel_token else super().check_interval
+        return max(min(interval, self.deadline - time.monotonic()), 0.01)
+
+    def is_expired(self) -> bool:
+        """Whether the deadline passed."""
+        return time.monotonic() >= self.deadline
+
+    def is_cancelled(self) -> bool:
+        if self.cancel_token is not None and self.cancel_token.is_cancelled():
+            return True
+        return super().is_cancelled() or self.is_expired()
+
+    async def ais_cancelled(self) -> bool:
+        if self.cancel_token is not None and await self.cancel_token.ais_cancelled():
+            return True
+        return super().is_cancelled() or self.is_expired()
+
+    def get_error(self) -> AIRunCancelledError:
+        if self.is_expired() and not super().is_cancelled():
+            return AIRunTimeoutError(f"The run timed out after {self.timeout} seconds")
+        return super().get_error()
+
+
+class RunCancelToken(CancelToken):
+    """Cancel token of a `Run`, shared across processes through the `Run.cancel_requested_at`
+    flag set by the `cancel_run` use case, like from the `DELETE runs/{run_id}/` API view.\n
+    Used by default for recorded runs. To keep the overhead low, the flag is read from
+    the database at most once every `check_interval` seconds.
+
+    Args:
+        run_id (Any): The ID of the run.
+        check_interval (float | None): Seconds between database checks. Defaults to `1.0`.
+    """
+
+    check_interval: float = 1.0
+
+    def __init__(self, run_id: Any, check_interval: float | None = None):
+        super().__init__()
+        self.run_id = run_id
+        if check_interval is not None:
+            self.check_interval = check_interval
+        self._checked_at = time.monotonic()
+
+    def _should_check(self) -> bool:
+        now = time.monotonic()
+        if now - self._checked_at < self.check_interval:
+            return False
+        self._checked_at = now
+        return True
+
+    def _get_cancelled_queryset(self):
+        from django_ai_assistant.models import Run
+
+        return Run.objects.filter(id=self.run_id, cancel_requested_at__isnull=False)
+
+    def is_cancelled(self) -> bool:
+        if (
+            not super().is_cancelled()
+            and self._should_check()
+            and self._get_cancelled_queryset().exists()
+        ):
+            self.cancel()
+        return super().is_cancelled()
+
+    async def ais_cancelled(self) -> bool:
+        if (
+            not super().is_cancelled()
+            and self._should_check()
+            and await self._get_cancelled_queryset().aexists()
+        ):
+            self.cancel()
+        return super().is_cancelled()
+
+
+async def _await_cancellation(cancel_token: CancelToken):
+    while not await cancel_token.ais_cancelled():
+        await asyncio.sleep(cancel_token.check_interval)
+
+
+async def aiter_until_cancelled(
+    iterator: AsyncIterator[T], cancel_token: CancelToken
+) -> AsyncIterator[T]:
+    """Iterate over an async iterator, like a LangGraph stream, until the token is cancelled.
+    When it is, the pending step of the iterator is cancelled, aborting any in-flight call.
+
+    Args:
+        iterator (AsyncIterator[T]): The async iterator.
+        cancel_token (CancelToken): The cancel token.
+
+    Yields:
+        T: The iterator items.
+
+    Raises:
+        AIRunCancelledError: If the token is cancelled before the iterator is exhausted.
+    """
+    cancellation = asyncio.ensure_future(_await_cancellation(cancel_token))
+    try:
+        while True:
+            next_item = asyncio.ensure_future(anext(iterator))
+            await asyncio.wait({next_item, cancellation}, return_when=asyncio.FIRST_COMPLETED)
+            if not next_item.done():
+                next_item.cancel()
+                await asyncio.gather(next_item, return_exceptions=True)
+                raise cancel_token.get_error()
+            try:
+                item = next_item.result()
+            except StopAsyncIteration:
+                return
+            yield item
+    finally:
+        cancellation.cancel()
+        aclose = getattr(iterator, "aclose", None)
+        if aclose is not None:
+            await aclose()
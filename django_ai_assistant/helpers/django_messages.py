@@ -2,11 +2,17 @@ from typing import TYPE_CHECKING
 
 from django.db import connections, transaction
 
+from asgiref.sync import sync_to_async
 from langchain_core.messages import (
     BaseMessage,
     message_to_dict,
 )
 
+from django_ai_assistant.helpers.messages_cache import (
+    abump_thread_messages_version,
+    bump_thread_messages_version,
+)
+
 
 if TYPE_CHECKING:
     from django_ai_assistant.models import Message as DjangoMessage
@@ -16,7 +22,9 @@ if TYPE_CHECKING:
 @transaction.atomic
 def save_django_messages(messages: list[BaseMessage], thread: "Thread") -> list["DjangoMessage"]:
     """
-    Save a list of messages to the Django database.
+    Save a list of new messages to the Django database, appending them to the thread.
+    The existing thread messages are not read, so only messages that aren't saved yet
+    should be passed.
     Note: Changes the message objects in place by changing each message.id to the Django ID.
 
     Args:
@@ -26,38 +34,85 @@ def save_django_messages(messages: list[BaseMessage], thread: "Thread") -> list[
 
     from django_ai_assistant.models import Message as DjangoMessage
 
-    existing_message_ids = [
-        str(i)
-        for i in DjangoMessage.objects.filter(thread=thread)
-        .order_by("created_at")
-        .values_list("id", flat=True)
-    ]
+    created_messages = _make_django_messages(messages, thread)
 
-    messages_to_create = [m for m in messages if m.id not in existing_message_ids]
+    # When primary keys are assigned before the insert, like with UUID primary keys,
+    # the langchain message IDs are known upfront and each row is written only once:
+    has_pks_before_insert = _has_pks_before_insert(created_messages)
+    if has_pks_before_insert:
+        _set_message_ids(messages, created_messages)
 
-    # Insert in bulk only if primary keys are then assigned by the DB.
+    # Insert in bulk only if primary keys are known or then assigned by the DB.
     # Please check https://docs.djangoproject.com/en/4.0/ref/models/querysets/#django.db.models.query.QuerySet.bulk_create
     # for more context on why this is required
-    can_bulk_insert = connections[
-        DjangoMessage.objects.db
-    ].features.can_return_rows_from_bulk_insert
-    if can_bulk_insert:
-        created_messages = DjangoMessage.objects.bulk_create(
-            [DjangoMessage(thread=thread, message={}) for _ in messages_to_create],
-        )
+    if has_pks_before_insert or _can_return_rows_from_bulk_insert():
+        created_messages = DjangoMessage.objects.bulk_create(created_messages)
     else:
-        for message in (
-            created_messages := [
-                DjangoMessage(thread=thread, message={}) for _ in messages_to_create
-            ]
-        ):
+        for message in created_messages:
             message.save()
 
-    # Update langchain message IDs with Django message IDs
-    for idx, created_message in enumerate(created_messages):
-        message_with_id = messages_to_create[idx]
-        message_with_id.id = str(created_message.id)
-        created_message.message = message_to_dict(message_with_id)
+    if not has_pks_before_insert:
+        _set_message_ids(messages, created_messages)
+        DjangoMessage.objects.bulk_update(created_messages, ["message"])
+    bump_thread_messages_version(thread.id)
+    return created_messages
+
+
+async def asave_django_messages(
+    messages: list[BaseMessage], thread: "Thread"
+) -> list["DjangoMessage"]:
+    """
+    Async version of `save_django_messages`.
+    When primary keys are assigned before the insert, like with UUID primary keys,
+    messages are saved with a single async bulk insert. Otherwise, the Django IDs
+    are only known after the insert, so they're saved in a thread with `save_django_messages`,
+    where the insert and the update of the stored IDs run in a single transaction,
+    as Django doesn't support transactions in async code.
+    Note: Changes the message objects in place by changing each message.id to the Django ID.
+
+    Args:
+        messages (list[BaseMessage]): The list of messages to save.
+        thread (Thread): The thread to save the messages to.
+    """
+
+    from django_ai_assistant.models import Message as DjangoMessage
 
-    DjangoMessage.objects.bulk_update(created_messages, ["message"])
+    created_messages = _make_django_messages(messages, thread)
+    if not _has_pks_before_insert(created_messages):
+        return await sync_to_async(save_django_messages)(messages, thread)
+
+    _set_message_ids(messages, created_messages)
+    created_messages = await DjangoMessage.objects.abulk_create(created_messages)
+    await abump_thread_messages_version(thread.id)
     return created_messages
+
+
+def _make_django_messages(messages: list[BaseMessage], thread: "Thread") -> list["DjangoMessage"]:
+    from django_ai_assistant.models import Message as DjangoMessage
+
+    return [
+        DjangoMessage(
+            thread=thread,
+            message=message_to_dict(message),
+            **DjangoMessage.get_message_fields(message),
+        )
+        for message in messages
+    ]
+
+
+def _has_pks_before_insert(created_messages: list["DjangoMessage"]) -> bool:
+    # Like with UUID primary keys:
+    return all(m.pk is not None for m in created_messages)
+
+
+def _can_return_rows_from_bulk_insert() -> bool:
+    from django_ai_assistant.models import Message as DjangoMessage
+
+    return connections[DjangoMessage.objects.db].features.can_return_rows_from_bulk_insert
+
+
+def _set_message_ids(messages: list[BaseMessage], created_messages: list["DjangoMessage"]):
+    # Update langchain message IDs with Django message IDs, also in the stored messages:
+    for message, created_message in zip(messages, created_messages, strict=True):
+        message.id = str(created_message.pk)
+        created_message.message["data"]["id"] = message.id
@@ -0,0 +1,77 @@
+import json
+import threading
+from collections import OrderedDict
+from typing import Any
+
+from langchain_core.language_models import BaseChatModel
+
+from django_ai_assistant.conf import app_settings
+
+
+MAX_SHARED_LLMS = 32
+"""Max number of shared LLM instances, the least recently used ones are dropped first."""
+
+_llm_registry: OrderedDict[tuple, BaseChatModel] = OrderedDict()
+_llm_registry_lock = threading.Lock()
+
+
+def _make_llm_key(llm_class: type, provider: str, kwargs: dict[str, Any]) -> tuple | None:
+    try:
+        kwargs_key = json.dumps(kwargs, sort_keys=True)
+    except (TypeError, ValueError):
+        # Kwargs like clients or callbacks have no stable key, so the LLM isn't shared:
+        return None
+    return (llm_class, provider, kwargs_key)
+
+
+def _make_llm(llm_class: type[BaseChatModel], provider: str, kwargs: dict[str, Any]):
+    client_kwargs = app_settings.call_fn(
+        "LLM_CLIENT_KWARGS_FN",
+        provider=provider,
+        **kwargs,
+    )
+    return llm_class(**kwargs, **client_kwargs)
+
+
+def get_shared_llm(llm_class: type[BaseChatModel], provider: str, **kwargs: Any) -> BaseChatModel:
+    """Get a process-wide shared LLM instance for the given class, provider and kwargs.\n
+    LLM instances hold HTTP clients with their own connection pools,
+    so reusing them across assistants and requests keeps connections alive
+    and avoids repeated TLS handshakes.\n
+    The first time a key is requested, `AI_ASSISTANT_LLM_CLIENT_KWARGS_FN` is called to get
+    extra constructor kwargs for the provider, e.g. to configure the connection pool size.\n
+    Up to `MAX_SHARED_LLMS` instances are kept. If the kwargs aren't JSON-serializable,
+    a new LLM instance is returned every time, without sharing it.
+
+    Args:
+        llm_class (type[BaseChatModel]): The LangChain chat model class to instantiate.
+        provider (str): The provider name, like `"openai"`.
+        **kwargs: Keyword arguments to pass to the LLM constructor,
+            like `model`, `temperature`, and `model_kwargs`.
+    Returns:
+        BaseChatModel: The shared LLM instance.
+    """
+    key = _make_llm_key(llm_class, provider, kwargs)
+    if key is None:
+        return _make_llm(llm_class, provider, kwargs)
+
+    with _llm_registry_lock:
+        llm = _llm_registry.get(key)
+        if llm is None:
+            llm = _llm_registry[key] = _make_llm(llm_class, provider, kwargs)
+            if len(_llm_registry) > MAX_SHARED_LLMS:
+                _llm_registry.popitem(last=False)
+        else:
+            _llm_registry.move_to_end(key)
+    return llm
+
+
+def clear_llm_registry() -> None:
+    """Clear the registry of shared LLM instances."""
+
+    with _llm_registry_lock:
+        _llm_registry.clear()
+
+
+def no_client_kwargs(**kwargs) -> dict[str, Any]:
+    return {}
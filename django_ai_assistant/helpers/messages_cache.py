@@ -0,0 +1,203 @@
+import bisect
+import uuid
+from datetime import timedelta
+from typing import TYPE_CHECKING, Any, Sequence, cast
+
+from django.core.cache import BaseCache, caches
+from django.db import transaction
+
+from langchain_core.messages import BaseMessage, messages_from_dict
+
+from django_ai_assistant.conf import app_settings
+
+
+if TYPE_CHECKING:
+    from django_ai_assistant.models import Thread
+
+
+KEY_PREFIX = "django_ai_assistant:thread_messages"
+
+RELOAD_MARGIN = timedelta(seconds=60)
+"""How far before the newest cached message the messages are reloaded when the cache is outdated.
+Covers messages committed by concurrent transactions after newer ones were cached."""
+
+MAX_CACHED_MESSAGES = 100
+"""Max number of the most recent messages of each thread kept in the cache, including non-chat ones.
+Reads that need older messages, like the full history of a longer thread, query the database."""
+
+
+def get_messages_cache() -> BaseCache | None:
+    """Get the Django cache configured by `AI_ASSISTANT_MESSAGES_CACHE`, if any.
+
+    Returns:
+        BaseCache | None: The cache, or None if the messages cache is disabled.
+    """
+    alias = app_settings.get_setting("MESSAGES_CACHE")
+    return caches[alias] if alias else None
+
+
+def _make_keys(thread_id: Any) -> tuple[str, str]:
+    return f"{KEY_PREFIX}:{thread_id}", f"{KEY_PREFIX}:{thread_id}:version"
+
+
+def get_cached_thread_messages(
+    thread: "Thread", cache: BaseCache
+) -> tuple[list[BaseMessage], bool]:
+    """
+    Get the most recent messages from the thread, up to `MAX_CACHED_MESSAGES`,
+    including non-chat messages, using the messages cache.\n
+    The cache entry stores the deserialized messages and is tagged with the thread version,
+    which is changed whenever messages are saved. When the version matches, no query is made.
+    Otherwise, only the messages created since `RELOAD_MARGIN` before the newest cached one
+    are reloaded, so messages committed late by concurrent transactions aren't skipped.
+
+    Args:
+        thread (Thread): The thread to get the messages from.
+        cache (BaseCache): The messages cache.
+
+    Returns:
+        tuple[list[BaseMessage], bool]: List of messages, oldest first,
+            and whether it has all the thread messages.
+    """
+
+    entry_key, version_key = _make_keys(thread.id)
+    values = cache.get_many([entry_key, version_key])
+    version = values.get(version_key)
+    if version is None:
+        cache.add(version_key, uuid.uuid4().hex)
+        version = cache.get(version_key)
+
+    entry = values.get(entry_key)
+    if entry is not None and entry["version"] == version:
+        return entry["messages"], entry.get("complete", False)
+
+    rows = list(_get_new_rows_queryset(thread, entry))
+    entry = _update_entry(entry, rows, version)
+    cache.set(entry_key, entry)
+    return entry["messages"], entry["complete"]
+
+
+async def aget_cached_thread_messages(
+    thread: "Thread", cache: BaseCache
+) -> tuple[list[BaseMessage], bool]:
+    """
+    Async version of `get_cached_thread_messages`.
+
+    Args:
+        thread (Thread): The thread to get the messages from.
+        cache (BaseCache): The messages cache.
+
+    Returns:
+        tuple[list[BaseMessage], bool]: List of messages, oldest first,
+            and whether it has all the thread messages.
+    """
+
+    entry_key, version_key = _make_keys(thread.id)
+    values = await cache.aget_many([entry_key, version_key])
+    version = values.get(version_key)
+    if version is None:
+        await cache.aadd(version_key, uuid.uuid4().hex)
+        version = await cache.aget(version_key)
+
+    entry = values.get(entry_key)
+    if entry is not None and entry["version"] == version:
+        return entry["messages"], entry.get("complete", False)
+
+    rows = [row async for row in _get_new_rows_queryset(thread, entry)]
+    entry = _update_entry(entry, rows, version)
+    await cache.aset(entry_key, entry)
+    return entry["messages"], entry["complete"]
+
+
+def _get_reload_from(entry: dict | None):
+    # Entries without `created_at`, like the ones cached by previous versions, are reloaded:
+    if entry is None or not entry.get("created_at"):
+        return None
+    return entry["created_at"][-1] - RELOAD_MARGIN
+
+
+def _get_new_rows_queryset(thread: "Thread", entry: dict | None):
+    queryset = thread.get_messages_queryset(include_extra_messages=True)
+    reload_from = _get_reload_from(entry)
+    if reload_from is not None:
+        queryset = queryset.filter(created_at__gte=reload_from)
+    # Newest first, so at most `MAX_CACHED_MESSAGES` rows are loaded:
+    return queryset.reverse().values_list("created_at", "message")[:MAX_CACHED_MESSAGES]
+
+
+def _update_entry(entry: dict | None, rows: list[tuple], version: str | None) -> dict:
+    rows.reverse()
+    reload_from = _get_reload_from(entry)
+    # With `MAX_CACHED_MESSAGES` rows, older ones may be missing, so the entry starts over:
+    is_truncated = len(rows) >= MAX_CACHED_MESSAGES
+    if entry is None or reload_from is None or is_truncated:
+        messages, created_at, is_complete = [], [], not is_truncated
+    else:
+        # The reloaded rows replace the cached messages created since `reload_from`:
+        kept = bisect.bisect_left(entry["created_at"], reload_from)
+        messages, created_at = entry["messages"][:kept], entry["created_at"][:kept]
+        is_complete = entry.get("complete", False)
+
+    message_dicts = [message for _, message in rows]
+    messages.extend(messages_from_dict(cast(Sequence[dict[str, Any]], message_dicts)))
+    created_at.extend(row_created_at for row_created_at, _ in rows)
+    if len(messages) > MAX_CACHED_MESSAGES:
+        messages, created_at = messages[-MAX_CACHED_MESSAGES:], created_at[-MAX_CACHED_MESSAGES:]
+        is_complete = False
+    return {
+        "version": version,
+        "created_at": created_at,
+        "messages": messages,
+        "complete": is_complete,
+    }
+
+
+def bump_thread_messages_version(thread_id: Any):
+    """
+    Mark the cached messages of the thread as outdated after new messages are saved,
+    so the next read loads the new messages. Runs after the current transaction commits.
+    Does nothing if the messages cache is disabled.
+
+    Args:
+        thread_id (Any): The ID of the thread.
+    """
+
+    cache = get_messages_cache()
+    if cache is None:
+        return
+
+    _, version_key = _make_keys(thread_id)
+    transaction.on_commit(lambda: cache.set(version_key, uuid.uuid4().hex))
+
+
+async def abump_thread_messages_version(thread_id: Any):
+    """
+    Async version of `bump_thread_messages_version`, for messages saved outside a transaction.
+
+    Args:
+        thread_id (Any): The ID of the thread.
+    """
+
+    cache = get_messages_cache()
+    if cache is None:
+        return
+
+    _, version_key = _make_keys(thread_id)
+    await cache.aset(version_key, uuid.uuid4().hex)
+
+
+def invalidate_thread_messages(thread_id: Any):
+    """
+    Remove the cached messages of the thread, for changes other than new messages,
+    like deleted messages. Runs after the current transaction commits.
+    Does nothing if the messages cache is disabled.
+
+    Args:
+        thread_id (Any): The ID of the thread.
+    """
+
+    cache = get_messages_cache()
+    if cache is None:
+        return
+
+    transaction.on_commit(lambda: cache.delete_many(_make_keys(thread_id)))
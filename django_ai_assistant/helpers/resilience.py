@@ -0,0 +1,331 @@
+import asyncio
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FuturesTimeoutError
+from contextvars import copy_context
+from typing import Awaitable, Callable, TypeVar
+
+from django.core.cache import BaseCache, caches
+from django.db import connections
+
+from django_ai_assistant.conf import app_settings
+from django_ai_assistant.exceptions import AICircuitOpenError
+
+
+T = TypeVar("T")
+
+KEY_PREFIX = "django_ai_assistant:circuit_breaker"
+
+RETRYABLE_STATUS_CODES = frozenset({408, 409, 429, 500, 502, 503, 504, 529})
+"""HTTP status codes of transient errors, like rate limits and overloaded servers."""
+
+
+def is_retryable_error(error: BaseException) -> bool:
+    """Whether the error is transient, so the call may succeed if retried.\n
+    Timeouts, connection errors, and HTTP errors with a `RETRYABLE_STATUS_CODES` status,
+    like the ones raised by the OpenAI and Anthropic clients, or by `requests`, are retryable.
+
+    Args:
+        error (BaseException): The error raised by the call.
+
+    Returns:
+        bool: Whether the error is retryable.
+    """
+    if isinstance(error, TimeoutError | ConnectionError):
+        return True
+    response = getattr(error, "response", None)
+    status_code = getattr(error, "status_code", getattr(response, "status_code", None))
+    if status_code is not None:
+        return status_code in RETRYABLE_STATUS_CODES
+    # Client libraries have their own timeout and connection errors,
+    # like `openai.APITimeoutError` or `requests.ConnectionError`:
+    return any(
+        cls.__name__.endswith(("TimeoutError", "Timeout", "ConnectionError", "ConnectError"))
+        for cls in type(error).__mro__
+    )
+
+
+class RetryPolicy:
+    """Policy to retry a failed LLM or tool call, with exponential backoff and jitter.\n
+    The delay before retry `n` is a random number of seconds between 0 and
+    `min(max_backoff, backoff * 2 ** (n - 1))`, so concurrent callers don't retry in sync.
+
+    Args:
+        attempts (int): Max number of attempts, including the first call. Defaults to 3.
+        backoff (float): Max seconds to wait before the first retry. Defaults to 0.5.
+        max_backoff (float): Max seconds to wait before any retry. Defaults to 10.
+        jitter (bool): Whether to randomize the delays. Defaults to `True`.
+        retry_if (Callable[[BaseException], bool]): Whether an error is retryable.
+            Defaults to `is_retryable_error`.
+    """
+
+    def __init__(
+        self,
+        attempts: int = 3,
+        *,
+        backoff: float = 0.5,
+        max_backoff: float = 10,
+        jitter: bool = True,
+        retry_if: Callable[[BaseException], bool] = is_retryable_error,
+    ):
+        self.attempts = attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.jitter = jitter
+        self.retry_if = retry_if
+
+    def get_delay(self, attempt: int) -> float:
+        """Get the seconds to wait after the given failed attempt.
+
+        Args:
+            attempt (int): The number of the failed attempt, starting at 1.
+
+        Returns:
+            float: The seconds to wait before the next attempt.
+        """
+        delay = min(self.max_backoff, self.backoff * 2 ** (attempt - 1))
+        return random.uniform(0, delay) if self.jitter else delay  # noqa: S311
+
+
+class CircuitBreaker:
+    """Circuit breaker of a dependency, like an external API, which fails fast while it's down.\n
+    After `failure_threshold` retryable failures within `failure_window` seconds, the circuit opens,
+    and calls raise `AICircuitOpenError` without calling the dependency for `reset_timeout` seconds.
+    Then, the circuit is half-open: a single call, the probe, goes through, while the others
+    still fail fast. If the probe succeeds, the circuit closes, and if it fails, it opens again.\n
+    The state is stored in the Django cache set by `AI_ASSISTANT_CIRCUIT_BREAKER_CACHE`,
+    so with a shared cache, like Redis, it's shared by all workers.
+    Use the same `name` in all the assistants and tools that call the same dependency.
+
+    Args:
+        name (str): Name of the dependency, like `"weatherapi"`.
+        failure_threshold (int): Failures that open the circuit. Defaults to 5.
+        failure_window (float): Seconds to count the failures over. Defaults to 60.
+        reset_timeout (float): Seconds the circuit stays open. Defaults to 30.
+        cache_alias (str | None): Alias from `CACHES` of the cache to store the state in.
+            Defaults to the `AI_ASSISTANT_CIRCUIT_BREAKER_CACHE` setting.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        *,
+        failure_threshold: int = 5,
+        failure_window: float = 60,
+        reset_timeout: float = 30,
+        cache_alias: str | None = None,
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.failure_window = failure_window
+        self.reset_timeout = reset_timeout
+        self.cache_alias = cache_alias
+
+    def get_cache(self) -> BaseCache:
+        """Get the Django cache set by `cache_alias` or `AI_ASSISTANT_CIRCUIT_BREAKER_CACHE`.
+
+        Returns:
+            BaseCache: The cache that stores the circuit state.
+        """
+        return caches[self.cache_alias or app_settings.get_setting("CIRCUIT_BREAKER_CACHE")]
+
+    def _make_keys(self) -> tuple[str, str, str, str]:
+        prefix = f"{KEY_PREFIX}:{self.name}"
+        return f"{prefix}:failures", f"{prefix}:open", f"{prefix}:half_open", f"{prefix}:probe"
+
+    def _get_open_error(self) -> AICircuitOpenError:
+        return AICircuitOpenError(f"The circuit breaker '{self.name}' is open")
+
+    def before_call(self) -> bool:
+        """Check the circuit before a call.\n
+        When the circuit is half-open, only the caller that gets the probe goes through.
+
+        Returns:
+            bool: Whether there are recent failures, which a success should reset.
+
+        Raises:
+            AICircuitOpenError: If the circuit is open, or half-open and another call is probing.
+        """
+        cache = self.get_cache()
+        failures_key, open_key, half_open_key, probe_key = self._make_keys()
+        values = cache.get_many([failures_key, open_key, half_open_key])
+        if open_key in values:
+            raise self._get_open_error()
+        if half_open_key in values:
+            # A single call at a time tests whether the dependency recovered:
+            if not cache.add(probe_key, True, timeout=self.reset_timeout):
+                raise self._get_open_error()
+            return True
+        return bool(values.get(failures_key))
+
+    async def abefore_call(self) -> bool:
+        """Async version of `before_call`."""
+        cache = self.get_cache()
+        failures_key, open_key, half_open_key, probe_key = self._make_keys()
+        values = await cache.aget_many([failures_key, open_key, half_open_key])
+        if open_key in values:
+            raise self._get_open_error()
+        if half_open_key in values:
+            if not await cache.aadd(probe_key, True, timeout=self.reset_timeout):
+                raise self._get_open_error()
+            return True
+        return bool(values.get(failures_key))
+
+    def record_success(self):
+        """Close the circuit, resetting the failures."""
+        failures_key, _open_key, half_open_key, probe_key = self._make_keys()
+        self.get_cache().delete_many([failures_key, half_open_key, probe_key])
+
+    async def arecord_success(self):
+        """Async version of `record_success`."""
+        failures_key, _open_key, half_open_key, probe_key = self._make_keys()
+        await self.get_cache().adelete_many([failures_key, half_open_key, probe_key])
+
+    def record_failure(self):
+        """Count a failure, opening the circuit when it reaches `failure_threshold`,
+        or when the probe of the half-open circuit fails."""
+        cache = self.get_cache()
+        failures_key, open_key, half_open_key, probe_key = self._make_keys()
+        cache.add(failures_key, 0, timeout=self.failure_window)
+        try:
+            failures = cache.incr(failures_key)
+        except ValueError:
+            # The failures expired after `add`:
+            failures = 1
+            cache.set(failures_key, failures, timeout=self.failure_window)
+        if failures >= self.failure_threshold or cache.get(half_open_key):
+            # The circuit is half-open after `open_key` expires, until a probe succeeds:
+            cache.set(open_key, True, timeout=self.reset_timeout)
+            cache.set(half_open_key, True, timeout=None)
+            cache.delete(probe_key)
+
+    async def arecord_failure(self):
+        """Async version of `record_failure`."""
+        cache = self.get_cache()
+        failures_key, open_key, half_open_key, probe_key = self._make_keys()
+        await cache.aadd(failures_key, 0, timeout=self.failure_window)
+        try:
+            failures = await cache.aincr(failures_key)
+        except ValueError:
+            failures = 1
+            await cache.aset(failures_key, failures, timeout=self.failure_window)
+        if failures >= self.failure_threshold or await cache.aget(half_open_key):
+            await cache.aset(open_key, True, timeout=self.reset_timeout)
+            await cache.aset(half_open_key, True, timeout=None)
+            await cache.adelete(probe_key)
+
+
+_timeout_executor = ThreadPoolExecutor(thread_name_prefix="django_ai_assistant_timeout")
+
+
+def _call_in_timeout_thread(fn: Callable[[], T]) -> T:
+    try:
+        return fn()
+    finally:
+        # Like Django does at the end of each request, to not leak the thread connections:
+        connections.close_all()
+
+
+def call_with_timeout(fn: Callable[[], T], timeout: float | None) -> T:
+    """Call the function, raising `TimeoutError` if it doesn't return in time.\n
+    The function runs in a thread of a shared pool, with its own database connections,
+    which are closed when it returns. After the timeout, it keeps running and holding
+    its thread until it returns, but its result is discarded. If the pool is busy,
+    the call waits for a thread, and it's skipped if the timeout passes first.\n
+    As the function doesn't use the caller's database connections, it doesn't see
+    the uncommitted changes of the caller's transaction.
+
+    Args:
+        fn (Callable[[], T]): The function to call.
+        timeout (float | None): Seconds to wait for the function, or `None` to wait forever.
+
+    Returns:
+        T: The result of the function.
+    """
+    if timeout is None:
+        return fn()
+
+    future = _timeout_executor.submit(copy_context().run, _call_in_timeout_thread, fn)
+    try:
+        return future.result(timeout=timeout)
+    except FuturesTimeoutError:
+        future.cancel()
+        raise TimeoutError(f"The call timed out after {timeout} seconds") from None
+
+
+async def acall_with_timeout(fn: Callable[[], Awaitable[T]], timeout: float | None) -> T:
+    """Async version of `call_with_timeout`, which cancels the call on timeout."""
+    try:
+        return await asyncio.wait_for(fn(), timeout=timeout)
+    except asyncio.TimeoutError:
+        raise TimeoutError(f"The call timed out after {timeout} seconds") from None
+
+
+def call_with_resilience(
+    fn: Callable[[], T],
+    *,
+    timeout: float | None = None,
+    retry: RetryPolicy | None = None,
+    circuit_breaker: CircuitBreaker | None = None,
+) -> T:
+    """Call the function with a timeout for each attempt, retries, and a circuit breaker.
+
+    Args:
+        fn (Callable[[], T]): The function to call.
+        timeout (float | None): Seconds to wait for each attempt. Defaults to `None` (no timeout).
+        retry (RetryPolicy | None): Policy to retry failed attempts. Defaults to `None` (no retries).
+        circuit_breaker (CircuitBreaker | None): Circuit breaker of the called dependency.
+
+    Returns:
+        T: The result of the function.
+
+    Raises:
+        AICircuitOpenError: If the circuit breaker is open.
+    """
+    policy = retry if retry is not None else RetryPolicy(attempts=1)
+    for attempt in range(1, policy.attempts + 1):
+        has_failures = circuit_breaker.before_call() if circuit_breaker is not None else False
+        try:
+            result = call_with_timeout(fn, timeout)
+        except Exception as e:
+            retryable = policy.retry_if(e)
+            if circuit_breaker is not None and retryable:
+                circuit_breaker.record_failure()
+            if not retryable or attempt == policy.attempts:
+                raise
+            time.sleep(policy.get_delay(attempt))
+        else:
+            if circuit_breaker is not None and has_failures:
+                circuit_breaker.record_success()
+            return result
+    raise AssertionError("unreachable")
+
+
+async def acall_with_resilience(
+    fn: Callable[[], Awaitable[T]],
+    *,
+    timeout: float | None = None,
+    retry: RetryPolicy | None = None,
+    circuit_breaker: CircuitBreaker | None = None,
+) -> T:
+    """Async version of `call_with_resilience`."""
+    policy = retry if retry is not None else RetryPolicy(attempts=1)
+    for attempt in range(1, policy.attempts + 1):
+        has_failures = (
+            await circuit_breaker.abefore_call() if circuit_breaker is not None else False
+        )
+        try:
+            result = await acall_with_timeout(fn, timeout)
+        except Exception as e:
+            retryable = policy.retry_if(e)
+            if circuit_breaker is not None and retryable:
+                await circuit_breaker.arecord_failure()
+            if not retryable or attempt == policy.attempts:
+                raise
+            await asyncio.sleep(policy.get_delay(attempt))
+        else:
+            if circuit_breaker is not None and has_failures:
+                await circuit_breaker.arecord_success()
+            return result
+    raise AssertionError("unreachable")
@@ -0,0 +1,343 @@
+import random
+import re
+import time
+from contextlib import contextmanager
+from typing import Any, ClassVar, Iterator
+
+from django.core.cache import BaseCache, caches
+from django.db import models, transaction
+from django.db.models.signals import post_delete, post_save
+
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+from django_ai_assistant.conf import app_settings
+from django_ai_assistant.exceptions import AIAssistantMisconfiguredError
+
+
+KEY_PREFIX = "django_ai_assistant:retriever_index"
+
+
+class RetrieverIndex:
+    """Index of the documents of a Django model, used to build a RAG retriever
+    without loading and splitting all the rows on every message.\n
+    The documents of each row are stored in their own key of the Django cache set by
+    `AI_ASSISTANT_RETRIEVER_INDEX_CACHE`, built once and then updated row by row,
+    after the transaction commits, whenever a row of `model` is saved or deleted.
+    The list of indexed rows is changed under a cache lock, and each change increments
+    the index version, so concurrent updates from other processes aren't lost.
+    The cache must be shared by all workers, like Redis or the file-based cache,
+    otherwise other workers don't see the updates. A system check warns about per-process caches.\n
+    Each process builds the retriever once from the stored documents and reuses it
+    until the index changes. Checking for changes costs a single cache read.
+    Each change also stores the primary keys of its rows under its version, so a process
+    whose retriever is behind reads only the changed rows and passes them to `update_retriever`.
+    This needs a cache with an atomic `incr`, like Redis or Memcached, so each change gets
+    its own version. Otherwise, concurrent changes may build the retrievers again.\n
+    Subclass it, set `id` and `model`, and implement `get_documents` and `build_retriever`.
+    Then return `MyIndex().get_retriever()` from `AIAssistant.get_retriever`.\n
+    Rows saved with `QuerySet.update` or `bulk_create` don't send signals,
+    so call `update` with their primary keys, or `rebuild`, after changing rows that way.
+    """
+
+    id: ClassVar[str]  # noqa: A003
+    """Unique identifier of the index, like `"django_docs"`."""
+    model: ClassVar[type[models.Model]]
+    """The Django model whose rows are indexed."""
+
+    _registry: ClassVar[dict[str, type["RetrieverIndex"]]] = {}
+    """Registry of all RetrieverIndex subclasses by their id.\n
+    Automatically populated when a subclass is declared."""
+
+    LOCK_TIMEOUT: ClassVar[float] = 30
+    """Max seconds a process holds the lock to change the list of indexed rows."""
+
+    CHANGES_TIMEOUT: ClassVar[float] = 60 * 60
+    """Seconds the primary keys of each change are kept, to update the retrievers built before it.
+    Retrievers older than that are built again from all the stored documents."""
+
+    MAX_CHANGES: ClassVar[int] = 1000
+    """Max number of changes applied to a retriever. Older retrievers are built again."""
+
+    _retrievers: ClassVar[dict[str, tuple[int, BaseRetriever, dict[Any, list[Document]]]]] = {}
+    """Retrievers built by this process, with the index version they were built from
+    and their documents by row primary key, by index id."""
+
+    def __init_subclass__(cls, **kwargs: Any):
+        super().__init_subclass__(**kwargs)
+
+        if getattr(cls, "id", None) is None:
+            raise AIAssistantMisconfiguredError(f"Index id is not defined at {cls.__name__}")
+        if not re.match(r"^[a-zA-Z0-9_-]+$", cls.id):
+            raise AIAssistantMisconfiguredError(
+                f"Index id '{cls.id}' does not match the pattern '^[a-zA-Z0-9_-]+$' "
+                f"at {cls.__name__}"
+            )
+        if getattr(cls, "model", None) is None:
+            raise AIAssistantMisconfiguredError(f"Index model is not defined at {cls.__name__}")
+
+        cls._registry[cls.id] = cls
+        # A single receiver per model, which updates all the indexes of the model:
+        dispatch_uid = f"{KEY_PREFIX}:{cls.model._meta.label}"
+        post_save.connect(_update_index, sender=cls.model, dispatch_uid=dispatch_uid)
+        post_delete.connect(_update_index, sender=cls.model, dispatch_uid=dispatch_uid)
+
+    @classmethod
+    def get_cls_registry(cls) -> dict[str, type["RetrieverIndex"]]:
+        """Get the registry of RetrieverIndex classes.
+
+        Returns:
+            dict[str, type[RetrieverIndex]]: A dictionary mapping index ids to their classes.
+        """
+        return cls._registry
+
+    def get_queryset(self) -> models.QuerySet:
+        """Get the rows to index. By default, all rows of `model`.\n
+        Override this method to index only some rows, or to use `select_related`.
+
+        Returns:
+            QuerySet: The rows to index.
+        """
+        return self.model._default_manager.all()
+
+    def get_documents(self, instance: models.Model) -> list[Document]:
+        """Get the documents of a row, like the chunks of its text.\n
+        Must be implemented by subclasses.
+
+        Args:
+            instance (Model): The row to get the documents from.
+
+        Returns:
+            list[Document]: The documents of the row.
+        """
+        raise NotImplementedError(
+            f"Override the get_documents with your implementation at {self.__class__.__name__}"
+        )
+
+    def build_retriever(self, documents: list[Document]) -> BaseRetriever:
+        """Build the retriever from all the documents of the index.\n
+        Must be implemented by subclasses.
+
+        Args:
+            documents (list[Document]): The documents of all rows.
+
+        Returns:
+            BaseRetriever: The retriever.
+        """
+        raise NotImplementedError(
+            f"Override the build_retriever with your implementation at {self.__class__.__name__}"
+        )
+
+    def update_retriever(
+        self,
+        retriever: BaseRetriever,
+        documents: list[Document],
+        added: list[Document],
+        removed: list[Document],
+    ) -> BaseRetriever:
+        """Update the retriever with the documents of the rows changed since it was built.\n
+        By default, builds the retriever again from all the documents with `build_retriever`,
+        without reading the unchanged rows from the cache.
+        Override this method to add and remove the documents in place, like in a vector store.
+        Documents without an `id` get one from their row primary key and position.
+
+        Args:
+            retriever (BaseRetriever): The retriever built before the changes.
+            documents (list[Document]): The documents of all rows, after the changes.
+            added (list[Document]): The documents of the saved rows.
+            removed (list[Document]): The previous documents of the saved and deleted rows.
+
+        Returns:
+            BaseRetriever: The updated retriever.
+        """
+        return self.build_retriever(documents)
+
+    def get_cache(self) -> BaseCache:
+        """Get the Django cache configured by `AI_ASSISTANT_RETRIEVER_INDEX_CACHE`.
+
+        Returns:
+            BaseCache: The cache that stores the index.
+        """
+        return caches[app_settings.get_setting("RETRIEVER_INDEX_CACHE")]
+
+    def _make_key(self, name: str) -> str:
+        return f"{KEY_PREFIX}:{self.id}:{name}"
+
+    def _make_row_key(self, pk: Any) -> str:
+        return self._make_key(f"row:{pk}")
+
+    def _make_changes_key(self, version: int) -> str:
+        return self._make_key(f"changes:{version}")
+
+    @contextmanager
+    def _lock(self, cache: BaseCache) -> Iterator[None]:
+        lock_key = self._make_key("lock")
+        # The lock expires after `LOCK_TIMEOUT`, in case its process dies:
+        while not cache.add(lock_key, True, timeout=self.LOCK_TIMEOUT):
+            time.sleep(0.05)
+        try:
+            yield
+        finally:
+            cache.delete(lock_key)
+
+    def _get_documents(self, instance: models.Model) -> list[Document]:
+        documents = self.get_documents(instance)
+        for i, document in enumerate(documents):
+            # Stable IDs, so `update_retriever` can remove the previous documents of the row:
+            if document.id is None:
+                document.id = f"{instance.pk}:{i}"
+        return documents
+
+    def _bump_version(self, cache: BaseCache) -> int:
+        version_key = self._make_key("version")
+        # A random start, so a version evicted from the cache isn't reused:
+        cache.add(version_key, random.getrandbits(48), timeout=None)  # noqa: S311
+        try:
+            return cache.incr(version_key)
+        except ValueError:
+            version = random.getrandbits(48)  # noqa: S311
+            cache.set(version_key, version, timeout=None)
+            return version
+
+    def get_retriever(self) -> BaseRetriever:
+        """Get the retriever of the index, building the index first if it isn't stored yet.\n
+        The retriever is built again only when the index changed since the last call.
+
+        Returns:
+            BaseRetriever: The retriever.
+        """
+        cache = self.get_cache()
+        version = cache.get(self._make_key("version"))
+        built = self._retrievers.get(self.id)
+        if built is not None and version is not None:
+            if built[0] == version:
+                return built[1]
+            updated = self._get_updated_retriever(cache, built, version)
+            if updated is not None:
+                self._retrievers[self.id] = updated
+                return updated[1]
+
+        documents = self._get_stored_documents(cache) if version is not None else None
+        if documents is None:
+            entry = self.rebuild()
+            version, documents = entry["version"], entry["documents"]
+        retriever = self.build_retriever([doc for docs in documents.values() for doc in docs])
+        self._retrievers[self.id] = (version, retriever, documents)
+        return retriever
+
+    def _get_updated_retriever(
+        self,
+        cache: BaseCache,
+        built: tuple[int, BaseRetriever, dict[Any, list[Document]]],
+        version: int,
+    ) -> tuple[int, BaseRetriever, dict[Any, list[Document]]] | None:
+        built_version, retriever, documents = built
+        if not 0 < version - built_version <= self.MAX_CHANGES:
+            return None
+        changes_keys = [self._make_changes_key(v) for v in range(built_version + 1, version + 1)]
+        changes = cache.get_many(changes_keys)
+        if len(changes) != len(changes_keys):
+            # Some changes expired, or were made by `rebuild`:
+            return None
+
+        changed_pks = {pk for pks in changes.values() for pk in pks}
+        pks_key = self._make_key("pks")
+        row_keys = {pk: self._make_row_key(pk) for pk in changed_pks}
+        values = cache.get_many([pks_key, *row_keys.values()])
+        if pks_key not in values:
+            return None
+        indexed_pks = set(values[pks_key])
+        if any(pk in indexed_pks and row_key not in values for pk, row_key in row_keys.items()):
+            # Some rows were evicted from the cache:
+            return None
+
+        documents = dict(documents)
+        removed = [doc for pk in changed_pks for doc in documents.pop(pk, [])]
+        added = []
+        for pk, row_key in row_keys.items():
+            if pk in indexed_pks:
+                documents[pk] = values[row_key]
+                added.extend(values[row_key])
+        retriever = self.update_retriever(
+            retriever, [doc for docs in documents.values() for doc in docs], added, removed
+        )
+        return version, retriever, documents
+
+    def _get_stored_documents(self, cache: BaseCache) -> dict[Any, list[Document]] | None:
+        pks = cache.get(self._make_key("pks"))
+        if pks is None:
+            return None
+        row_keys = {pk: self._make_row_key(pk) for pk in pks}
+        rows = cache.get_many(list(row_keys.values()))
+        if len(rows) != len(row_keys):
+            # Some rows were evicted from the cache:
+            return None
+        return {pk: rows[row_key] for pk, row_key in row_keys.items()}
+
+    def rebuild(self) -> dict:
+        """Build the whole index again from `get_queryset`, and store it.
+
+        Returns:
+            dict: The stored index, with its `version` and the `documents` by row primary key.
+        """
+        documents = {instance.pk: self._get_documents(instance) for instance in self.get_queryset()}
+        cache = self.get_cache()
+        pks_key = self._make_key("pks")
+        with self._lock(cache):
+            old_pks = cache.get(pks_key) or []
+            cache.set_many(
+                {self._make_row_key(pk): docs for pk, docs in documents.items()}, timeout=None
+            )
+            cache.delete_many([self._make_row_key(pk) for pk in old_pks if pk not in documents])
+            cache.set(pks_key, list(documents), timeout=None)
+            version = self._bump_version(cache)
+        return {"version": version, "documents": documents}
+
+    def update(self, pks: list[Any]):
+        """Update the documents of the given rows in the stored index,
+        adding the new rows and removing the deleted ones.
+        Only the keys of the given rows are written, and the list of indexed rows
+        is changed under a cache lock, only if rows were added or removed.
+        Does nothing if the index isn't stored yet, as it's built on the next `get_retriever`.
+
+        Args:
+            pks (list[Any]): The primary keys of the changed rows.
+        """
+        cache = self.get_cache()
+        pks_key = self._make_key("pks")
+        indexed_pks = cache.get(pks_key)
+        if indexed_pks is None:
+            return
+
+        documents = {
+            instance.pk: self._get_documents(instance)
+            for instance in self.get_queryset().filter(pk__in=pks)
+        }
+        deleted_pks = {pk for pk in pks if pk not in documents}
+        cache.set_many(
+            {self._make_row_key(pk): docs for pk, docs in documents.items()}, timeout=None
+        )
+        cache.delete_many([self._make_row_key(pk) for pk in deleted_pks])
+
+        if not set(documents).issubset(indexed_pks) or not deleted_pks.isdisjoint(indexed_pks):
+            with self._lock(cache):
+                # Read again, as other processes may have changed it:
+                indexed_pks = cache.get(pks_key) or []
+                new_pks = [pk for pk in documents if pk not in set(indexed_pks)]
+                indexed_pks = [pk for pk in indexed_pks if pk not in deleted_pks]
+                indexed_pks.extend(new_pks)
+                cache.set(pks_key, indexed_pks, timeout=None)
+        version = self._bump_version(cache)
+
+        changes_key = self._make_changes_key(version)
+        if not cache.add(changes_key, list(pks), timeout=self.CHANGES_TIMEOUT):
+            # Another update got the same version, with a cache without an atomic `incr`,
+            # so remove the changes to build the retrievers again from all the documents:
+            cache.delete(changes_key)
+
+
+def _update_index(sender: type[models.Model], instance: models.Model, **kwargs: Any):
+    pk = instance.pk
+    for index_cls in RetrieverIndex.get_cls_registry().values():
+        if index_cls.model is sender:
+            transaction.on_commit(lambda index_cls=index_cls: index_cls().update([pk]))
@@ -0,0 +1,162 @@
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator
+
+from django.db import connections, transaction
+from django.utils import timezone
+
+from django_ai_assistant.conf import app_settings
+from django_ai_assistant.exceptions import AIAssistantNotDefinedError, AIRunCancelledError
+from django_ai_assistant.helpers.assistants import AIAssistant
+from django_ai_assistant.helpers.cancellation import RunCancelToken
+from django_ai_assistant.models import Run
+
+
+logger = logging.getLogger(__name__)
+
+_run_executor = ThreadPoolExecutor(thread_name_prefix="django_ai_assistant_run")
+
+
+def enqueue_run(run: Run):
+    """Enqueue the run with the `AI_ASSISTANT_ENQUEUE_RUN_FN` execution backend,
+    after the current transaction commits, so the backend always finds the run.
+
+    Args:
+        run (Run): The queued run.
+    """
+    transaction.on_commit(lambda: app_settings.call_fn("ENQUEUE_RUN_FN", run=run))
+
+
+def enqueue_run_in_thread_pool(run: Run, **kwargs):
+    """Execution backend that executes the run in a thread pool of the current process.
+    This is the default backend. Runs are lost if the process exits before they finish."""
+    _run_executor.submit(_execute_run_in_thread, run.id)
+
+
+def enqueue_run_inline(run: Run, **kwargs):
+    """Execution backend that executes the run right away, blocking the caller
+    until the run finishes. Useful for tests and local development."""
+    execute_run(run.id)
+
+
+def enqueue_run_in_database(run: Run, **kwargs):
+    """Execution backend that leaves the run queued in the database, to be executed by
+    the workers of the `ai_assistant_worker` management command. The workers claim runs
+    with `SELECT ... FOR UPDATE SKIP LOCKED`, so any number of them can run in parallel."""
+
+
+def enqueue_run_with_django_tasks(run: Run, **kwargs):
+    """Execution backend that enqueues the run as a task of the Django tasks framework,
+    to be executed by the worker of the configured `TASKS` backend. Requires Django 6.0+."""
+    from django_ai_assistant.tasks import execute_run_task
+
+    execute_run_task.enqueue(str(run.id))
+
+
+def _execute_run_in_thread(run_id: Any):
+    try:
+        execute_run(run_id)
+    finally:
+        connections.close_all()
+
+
+def claim_next_run() -> Run | None:
+    """Claim the oldest queued run, marking it as running.
+    Runs locked by other workers are skipped instead of waited for.
+
+    Returns:
+        Run | None: The claimed run, or None if there are no queued runs.
+    """
+    with transaction.atomic():
+        run_id = (
+            Run.objects.select_for_update(skip_locked=True)
+            .filter(status=Run.Status.QUEUED)
+            .order_by("created_at", "id")
+            .values_list("id", flat=True)
+            .first()
+        )
+        if run_id is None or not _claim_run(run_id):
+            return None
+    return Run.objects.select_related("created_by").get(id=run_id)
+
+
+def _claim_run(run_id: Any) -> bool:
+    # Conditional update, so a run is claimed once even without row locks, like on SQLite:
+    return bool(
+        Run.objects.filter(id=run_id, status=Run.Status.QUEUED).update(
+            status=Run.Status.RUNNING, started_at=timezone.now()
+        )
+    )
+
+
+def execute_run(run_id: Any) -> Run | None:
+    """Claim the queued run and execute it, saving its output or error.
+    Execution backends call this, directly or from their workers.
+
+    Args:
+        run_id (Any): The ID of the run.
+
+    Returns:
+        Run | None: The finished run, or None if the run was already claimed by someone else.
+    """
+    if not _claim_run(run_id):
+        return None
+    run = Run.objects.select_related("created_by").get(id=run_id)
+    return process_run(run)
+
+
+def process_run(run: Run) -> Run:
+    """Run the assistant of a claimed run. The assistant records the run result,
+    see `AIAssistant.track_runs`. Errors are logged and saved in the run instead of raised.
+    The run can be cancelled with the `cancel_run` use case while it runs.
+
+    Args:
+        run (Run): The claimed run, with status running.
+
+    Returns:
+        Run: The finished run.
+    """
+    try:
+        if run.assistant_id not in AIAssistant.get_cls_registry():
+            raise AIAssistantNotDefinedError(f"Assistant with id={run.assistant_id} not found")
+        assistant_cls = AIAssistant.get_cls(run.assistant_id)
+        assistant = assistant_cls(user=run.created_by)
+        assistant.invoke(
+            {"input": run.input},
+            thread_id=run.thread_id,
+            run=run,
+            cancel_token=RunCancelToken(run.id),
+        )
+    except AIRunCancelledError:
+        logger.info("Run %s was cancelled", run.id)
+    except Exception as e:
+        logger.exception("Failed to execute run %s", run.id)
+        # The assistant didn't get to start the run, so record the error here:
+        if not run.is_finished:
+            run.status = Run.Status.FAILED
+            run.error = str(e) or e.__class__.__name__
+            run.finished_at = timezone.now()
+            run.save(update_fields=["status", "error", "finished_at"])
+    return run
+
+
+async def astream_run(run: Run, poll_interval: float = 0.5) -> AsyncIterator[Run]:
+    """Poll the run until it finishes, yielding it whenever its status changes.
+
+    Args:
+        run (Run): The run to follow.
+        poll_interval (float): Seconds to wait between polls.
+
+    Returns:
+        AsyncIterator[Run]: The run, first as it is now, then after each status change.
+            The last one is finished.
+    """
+    yield run
+    status = run.status
+    while not run.is_finished:
+        await asyncio.sleep(poll_interval)
+        run = await Run.objects.aget(id=run.id)
+        if run.status != status:
+            status = run.status
+            yield run
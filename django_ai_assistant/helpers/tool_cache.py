@@ -0,0 +1,247 @@
+import asyncio
+import hashlib
+import json
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, ClassVar
+
+from django.core.cache import BaseCache, caches
+
+from django_ai_assistant.conf import app_settings
+
+
+KEY_PREFIX = "django_ai_assistant:tool_cache"
+
+
+class ToolCache:
+    """Cache of the results of an idempotent `@method_tool`, like one that calls a slow external API.\n
+    Pass it to the decorator, like `@method_tool(cache=ToolCache(timeout=600))`,
+    or pass the timeout only, like `@method_tool(cache=600)`.\n
+    Results are stored in the Django cache set by `AI_ASSISTANT_TOOL_CACHE`, by default,
+    keyed by the assistant id, the tool name, and the validated tool arguments,
+    so they're shared by all users and threads. Exceptions are never cached.\n
+    Concurrent calls with the same key share a single execution: in the same process,
+    they wait for the result of the first call, and in other processes, they wait for it
+    to be stored in the cache, up to `lock_timeout` seconds.
+    """
+
+    POLL_INTERVAL: ClassVar[float] = 0.1
+    """Seconds between cache reads while another process runs the same call."""
+
+    _in_flight: ClassVar[dict[str, Future]] = {}
+    """Futures of the calls running in this process, by cache key."""
+    _in_flight_lock: ClassVar[threading.Lock] = threading.Lock()
+
+    def __init__(
+        self,
+        timeout: float | None = 300,
+        *,
+        key_fn: Callable[[dict[str, Any]], Any] | None = None,
+        per_user: bool = False,
+        cache_alias: str | None = None,
+        lock_timeout: float = 30,
+    ):
+        """Initialize the tool cache.
+
+        Args:
+            timeout (float | None): Seconds to keep each result, or `None` to keep it forever.
+                Defaults to 300.
+            key_fn (Callable[[dict[str, Any]], Any] | None): Function that receives the validated
+                tool arguments and returns the JSON-serializable part of the key, like to ignore
+                arguments or to round coordinates. Defaults to all the arguments.
+            per_user (bool): If `True`, the assistant `_user` is part of the key,
+                for tools whose results depend on the user. Defaults to `False`.
+            cache_alias (str | None): Alias from `CACHES` of the cache to store results in.
+                Defaults to the `AI_ASSISTANT_TOOL_CACHE` setting.
+            lock_timeout (float): Max seconds to wait for a call with the same key running
+                in another process, before running the tool anyway. Defaults to 30.
+        """
+        self.timeout = timeout
+        self.key_fn = key_fn
+        self.per_user = per_user
+        self.cache_alias = cache_alias
+        self.lock_timeout = lock_timeout
+
+    def get_cache(self) -> BaseCache:
+        """Get the Django cache set by `cache_alias` or `AI_ASSISTANT_TOOL_CACHE`.
+
+        Returns:
+            BaseCache: The cache that stores the tool results.
+        """
+        return caches[self.cache_alias or app_settings.get_setting("TOOL_CACHE")]
+
+    def make_key(self, assistant: Any, tool_name: str, args: dict[str, Any]) -> str:
+        """Make the cache key of a tool call.
+
+        Args:
+            assistant (AIAssistant): The assistant the tool belongs to.
+            tool_name (str): The name of the tool.
+            args (dict[str, Any]): The validated tool arguments.
+
+        Returns:
+            str: The cache key.
+        """
+        key_data = self.key_fn(args) if self.key_fn else args
+        if self.per_user:
+            user = assistant._user
+            key_data = [key_data, user.pk if user is not None else None]
+        digest = hashlib.sha256(
+            json.dumps(key_data, sort_keys=True, default=str).encode()
+        ).hexdigest()
+        return f"{KEY_PREFIX}:{assistant.id}:{tool_name}:{digest}"
+
+    def wrap(self, assistant: Any, tool_name: str, func: Callable) -> Callable:
+        """Wrap the tool function of an assistant instance to cache its results.
+
+        Args:
+            assistant (AIAssistant): The assistant the tool belongs to.
+            tool_name (str): The name of the tool.
+            func (Callable): The tool method, bound to the assistant.
+
+        Returns:
+            Callable: The function that returns cached results.
+        """
+
+        def cached_func(**kwargs: Any) -> Any:
+            return self.call(self.make_key(assistant, tool_name, kwargs), lambda: func(**kwargs))
+
+        return cached_func
+
+    def awrap(self, assistant: Any, tool_name: str, coroutine: Callable) -> Callable:
+        """Async version of `wrap`, for `async def` tool methods.
+
+        Args:
+            assistant (AIAssistant): The assistant the tool belongs to.
+            tool_name (str): The name of the tool.
+            coroutine (Callable): The async tool method, bound to the assistant.
+
+        Returns:
+            Callable: The async function that returns cached results.
+        """
+
+        async def cached_coroutine(**kwargs: Any) -> Any:
+            key = self.make_key(assistant, tool_name, kwargs)
+            return await self.acall(key, lambda: coroutine(**kwargs))
+
+        return cached_coroutine
+
+    def call(self, key: str, fn: Callable[[], Any]) -> Any:
+        """Get the result stored with the key, or call `fn` once to get it and store it.
+
+        Args:
+            key (str): The cache key of the call.
+            fn (Callable[[], Any]): The function that returns the result.
+
+        Returns:
+            Any: The cached or new result.
+        """
+        cache = self.get_cache()
+        # Results are wrapped in a tuple to cache `None` too:
+        cached = cache.get(key)
+        if cached is not None:
+            return cached[0]
+
+        with self._in_flight_lock:
+            future = self._in_flight.get(key)
+            is_leader = future is None
+            if is_leader:
+                future = Future()
+                self._in_flight[key] = future
+        if not is_leader:
+            return future.result()
+
+        try:
+            result = self._call_with_lock(cache, key, fn)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._in_flight_lock:
+                del self._in_flight[key]
+
+    async def acall(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Async version of `call`, which awaits `fn` once to get the result.
+
+        Args:
+            key (str): The cache key of the call.
+            fn (Callable[[], Awaitable[Any]]): The async function that returns the result.
+
+        Returns:
+            Any: The cached or new result.
+        """
+        cache = self.get_cache()
+        cached = await cache.aget(key)
+        if cached is not None:
+            return cached[0]
+
+        with self._in_flight_lock:
+            future = self._in_flight.get(key)
+            is_leader = future is None
+            if is_leader:
+                future = Future()
+                self._in_flight[key] = future
+        if not is_leader:
+            # Shielded, so cancelling a waiting call doesn't cancel the shared one:
+            return await asyncio.shield(asyncio.wrap_future(future))
+
+        try:
+            result = await self._acall_with_lock(cache, key, fn)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._in_flight_lock:
+                del self._in_flight[key]
+
+    def _call_with_lock(self, cache: BaseCache, key: str, fn: Callable[[], Any]) -> Any:
+        lock_key = f"{key}:lock"
+        has_lock = cache.add(lock_key, True, timeout=self.lock_timeout)
+        if not has_lock:
+            # Another process is running the same call, wait for its result:
+            deadline = time.monotonic() + self.lock_timeout
+            while time.monotonic() < deadline:
+                time.sleep(self.POLL_INTERVAL)
+                cached = cache.get(key)
+                if cached is not None:
+                    return cached[0]
+                if cache.get(lock_key) is None:
+                    break
+
+        try:
+            result = fn()
+            cache.set(key, (result,), timeout=self.timeout)
+            return result
+        finally:
+            if has_lock:
+                cache.delete(lock_key)
+
+    async def _acall_with_lock(
+        self, cache: BaseCache, key: str, fn: Callable[[], Awaitable[Any]]
+    ) -> Any:
+        lock_key = f"{key}:lock"
+        has_lock = await cache.aadd(lock_key, True, timeout=self.lock_timeout)
+        if not has_lock:
+            # Another process is running the same call, wait for its result:
+            deadline = time.monotonic() + self.lock_timeout
+            while time.monotonic() < deadline:
+                await asyncio.sleep(self.POLL_INTERVAL)
+                cached = await cache.aget(key)
+                if cached is not None:
+                    return cached[0]
+                if await cache.aget(lock_key) is None:
+                    break
+
+        try:
+            result = await fn()
+            await cache.aset(key, (result,), timeout=self.timeout)
+            return result
+        finally:
+            if has_lock:
+                await cache.adelete(lock_key)
@@ -1,15 +1,21 @@
-from typing import Any
+from typing import Any, AsyncIterator
 
+from django.core.exceptions import ValidationError
+from django.db.models import Q, QuerySet
 from django.http import HttpRequest
+from django.utils import timezone
 
-from langchain_core.messages import BaseMessage
+from asgiref.sync import sync_to_async
+from langchain_core.messages import BaseMessage, messages_from_dict
 
 from django_ai_assistant.exceptions import (
     AIAssistantNotDefinedError,
     AIUserNotAllowedError,
 )
 from django_ai_assistant.helpers.assistants import AIAssistant
-from django_ai_assistant.models import Message, Thread
+from django_ai_assistant.helpers.messages_cache import invalidate_thread_messages
+from django_ai_assistant.helpers.runs import enqueue_run
+from django_ai_assistant.models import Message, Run, Thread
 from django_ai_assistant.permissions import (
     can_create_message,
     can_create_thread,
@@ -18,6 +24,7 @@ from django_ai_assistant.permissions import (
     can_run_assistant,
     can_update_thread,
     can_view_thread,
+    filter_threads_queryset,
 )
 
 
@@ -138,6 +145,177 @@ def create_message(
     return assistant_message
 
 
+async def acreate_message(
+    assistant_id: str,
+    thread: Thread,
+    user: Any,
+    content: Any,
+    request: HttpRequest | None = None,
+) -> dict:
+    """Async version of `create_message`. Runs the assistant with `AIAssistant.ainvoke`.\n
+    Permission functions may use the Django ORM, so they are called in a thread.\n
+    Uses `AI_ASSISTANT_CAN_RUN_ASSISTANT_FN` permission to check if user can run the assistant.\n
+    Uses `AI_ASSISTANT_CAN_CREATE_MESSAGE_FN` permission to check if user can create a message in the thread.
+
+    Args:
+        assistant_id (str): Assistant id to use to get the AI response
+        thread (Thread): Thread where to create the message
+        user (Any): Current user
+        content (Any): Message content, usually a string
+        request (HttpRequest | None): Current request, if any
+    Returns:
+        dict: The output of the assistant,
+            structured like `{"output": "assistant response", "history": ...}`
+    Raises:
+        AIUserNotAllowedError: If user is not allowed to create messages in the thread
+    """
+    assistant_cls = await sync_to_async(get_assistant_cls)(assistant_id, user, request)
+
+    if not await sync_to_async(can_create_message)(thread=thread, user=user, request=request):
+        raise AIUserNotAllowedError("User is not allowed to create messages in this thread")
+
+    assistant = assistant_cls(user=user, request=request)
+    assistant_message = await assistant.ainvoke(
+        {"input": content},
+        thread=thread,
+    )
+    return assistant_message
+
+
+def stream_message(
+    assistant_id: str,
+    thread: Thread,
+    user: Any,
+    content: Any,
+    request: HttpRequest | None = None,
+) -> AsyncIterator[dict[str, Any]]:
+    """Create a message in a thread, and stream the events of the assistant run
+    that gets the AI response.\n
+    Permissions are checked right away, before the stream starts.\n
+    Uses `AI_ASSISTANT_CAN_RUN_ASSISTANT_FN` permission to check if user can run the assistant.\n
+    Uses `AI_ASSISTANT_CAN_CREATE_MESSAGE_FN` permission to check if user can create a message in the thread.
+
+    Args:
+        assistant_id (str): Assistant id to use to get the AI response
+        thread (Thread): Thread where to create the message
+        user (Any): Current user
+        content (Any): Message content, usually a string
+        request (HttpRequest | None): Current request, if any
+    Returns:
+        AsyncIterator[dict[str, Any]]: The assistant run events,
+            see `AIAssistant.astream_events` for the event types
+    Raises:
+        AIUserNotAllowedError: If user is not allowed to create messages in the thread
+    """
+    assistant_cls = get_assistant_cls(assistant_id, user, request)
+
+    if not can_create_message(thread=thread, user=user, request=request):
+        raise AIUserNotAllowedError("User is not allowed to create messages in this thread")
+
+    assistant = assistant_cls(user=user, request=request)
+    return assistant.astream_events(content, thread=thread)
+
+
+def create_run(
+    assistant_id: str,
+    thread: Thread,
+    user: Any,
+    content: Any,
+    request: HttpRequest | None = None,
+) -> Run:
+    """Create a run that creates a message in a thread and gets the AI response
+    in the background, with the `AI_ASSISTANT_ENQUEUE_RUN_FN` execution backend.\n
+    Permissions are checked right away, before the run is enqueued.
+    The assistant doesn't get the request, as the run may be executed in another process.\n
+    Uses `AI_ASSISTANT_CAN_RUN_ASSISTANT_FN` permission to check if user can run the assistant.\n
+    Uses `AI_ASSISTANT_CAN_CREATE_MESSAGE_FN` permission to check if user can create a message in the thread.
+
+    Args:
+        assistant_id (str): Assistant id to use to get the AI response
+        thread (Thread): Thread where to create the message
+        user (Any): Current user
+        content (Any): Message content, usually a string
+        request (HttpRequest | None): Current request, if any
+    Returns:
+        Run: The queued run
+    Raises:
+        AIUserNotAllowedError: If user is not allowed to create messages in the thread
+    """
+    get_assistant_cls(assistant_id, user, request)
+
+    if not can_create_message(thread=thread, user=user, request=request):
+        raise AIUserNotAllowedError("User is not allowed to create messages in this thread")
+
+    run = Run.objects.create(
+        thread=thread,
+        assistant_id=assistant_id,
+        created_by=user,
+        input=content,
+    )
+    enqueue_run(run)
+    return run
+
+
+def get_single_run(
+    run_id: Any,
+    user: Any,
+    request: HttpRequest | None = None,
+) -> Run:
+    """Get a single run by id.\n
+    Uses `AI_ASSISTANT_CAN_VIEW_THREAD_FN` permission to check if user can view the run thread.
+
+    Args:
+        run_id (Any): Run id to get
+        user (Any): Current user
+        request (HttpRequest | None): Current request, if any
+    Returns:
+        Run: Run model instance
+    Raises:
+        AIUserNotAllowedError: If user is not allowed to view the run thread
+    """
+    run = Run.objects.select_related("thread").get(id=run_id)
+
+    if not can_view_thread(thread=run.thread, user=user, request=request):
+        raise AIUserNotAllowedError("User is not allowed to view this run")
+
+    return run
+
+
+def cancel_run(
+    run: Run,
+    user: Any,
+    request: HttpRequest | None = None,
+) -> Run:
+    """Cancel a run. Queued runs are cancelled right away, and never executed.
+    Running runs are flagged to be cancelled, and stop when their `RunCancelToken` sees the flag,
+    even in other processes. Runs executed in the background, like the ones created by
+    `create_run`, have one. Other runs only have one if it's passed to the assistant.
+    Finished runs are left unchanged.\n
+    Uses `AI_ASSISTANT_CAN_CREATE_MESSAGE_FN` permission to check if user can cancel the run.
+
+    Args:
+        run (Run): Run to cancel
+        user (Any): Current user
+        request (HttpRequest | None): Current request, if any
+    Returns:
+        Run: The updated run
+    Raises:
+        AIUserNotAllowedError: If user is not allowed to cancel the run
+    """
+    if not can_create_message(thread=run.thread, user=user, request=request):
+        raise AIUserNotAllowedError("User is not allowed to cancel this run")
+
+    now = timezone.now()
+    runs = Run.objects.filter(id=run.id, cancel_requested_at__isnull=True)
+    cancelled = runs.filter(status=Run.Status.QUEUED).update(
+        status=Run.Status.CANCELLED, cancel_requested_at=now, finished_at=now
+    )
+    if not cancelled:
+        runs.filter(status=Run.Status.RUNNING).update(cancel_requested_at=now)
+    run.refresh_from_db()
+    return run
+
+
 def create_thread(
     name: str,
     user: Any,
@@ -194,16 +372,24 @@ def get_threads(
     user: Any,
     assistant_id: str | None = None,
     request: HttpRequest | None = None,
+    before: Any | None = None,
+    limit: int | None = None,
 ) -> list[Thread]:
-    """Get all threads for the user.\n
-    Uses `AI_ASSISTANT_CAN_VIEW_THREAD_FN` permission to check the threads the user can see,
-    and returns only the ones the user can see.
+    """Get all threads for the user, newest first.\n
+    Uses `AI_ASSISTANT_FILTER_THREADS_QS_FN` to filter the threads the user can see in the
+    database. The default implementation only falls back to checking each thread with
+    `AI_ASSISTANT_CAN_VIEW_THREAD_FN` when that permission is customized.\n
+    Threads can be paginated by passing the last thread ID of the previous page as `before`.
 
     Args:
         user (Any): Current user
         assistant_id (str | None): Assistant ID to filter threads by.
             If empty or None, all threads for the user are returned.
         request (HttpRequest | None): Current request, if any
+        before (Any | None): Only return threads older than the thread with this ID.
+            Raises `Thread.DoesNotExist` if the user can't see that thread, or the ID is malformed.
+        limit (int | None): Maximum number of threads to return.
+            If None, all threads are returned.
     Returns:
         list[Thread]: List of thread model instances
     """
@@ -212,15 +398,29 @@ def get_threads(
     if assistant_id:
         threads = threads.filter(assistant_id=assistant_id)
 
-    return list(
-        threads.filter(
-            id__in=[
-                thread.id
-                for thread in threads
-                if can_view_thread(thread=thread, user=user, request=request)
-            ]
+    threads = filter_threads_queryset(queryset=threads, user=user, request=request)
+
+    if before is not None:
+        cursor = _get_cursor(threads, before)
+        threads = threads.filter(
+            Q(created_at__lt=cursor["created_at"])
+            | Q(created_at=cursor["created_at"], id__lt=cursor["id"])
         )
-    )
+
+    threads = threads.order_by("-created_at", "-id")
+    if limit is not None:
+        threads = threads[:limit]
+    return list(threads)
+
+
+def _get_cursor(queryset: QuerySet, cursor_id: Any) -> dict[str, Any]:
+    model = queryset.model
+    try:
+        cursor_id = model._meta.pk.to_python(cursor_id)
+    except ValidationError:
+        # Like a non-numeric ID with integer primary keys:
+        raise model.DoesNotExist(f"Malformed {model.__name__} ID: {cursor_id}") from None
+    return queryset.values("created_at", "id").get(id=cursor_id)
 
 
 def update_thread(
@@ -275,22 +475,88 @@ def get_thread_messages(
     thread: Thread,
     user: Any,
     request: HttpRequest | None = None,
+    before: Any | None = None,
+    after: Any | None = None,
+    limit: int | None = None,
 ) -> list[BaseMessage]:
     """Get all messages in a thread.\n
-    Uses `AI_ASSISTANT_CAN_VIEW_THREAD_FN` permission to check if user can view the thread.
+    Uses `AI_ASSISTANT_CAN_VIEW_THREAD_FN` permission to check if user can view the thread.\n
+    Messages can be paginated with `before`, `after` and `limit`.
+    See `get_thread_message_dicts` for details.
 
     Args:
         thread (Thread): Thread model instance to get messages from
         user (Any): Current user
         request (HttpRequest | None): Current request, if any
+        before (Any | None): Only return messages older than the message with this ID
+        after (Any | None): Only return messages newer than the message with this ID
+        limit (int | None): Maximum number of messages to return
     Returns:
         list[BaseMessage]: List of message instances
     """
+    message_dicts = get_thread_message_dicts(
+        thread=thread,
+        user=user,
+        request=request,
+        before=before,
+        after=after,
+        limit=limit,
+    )
+    return messages_from_dict(message_dicts)
+
+
+def get_thread_message_dicts(
+    thread: Thread,
+    user: Any,
+    request: HttpRequest | None = None,
+    before: Any | None = None,
+    after: Any | None = None,
+    limit: int | None = None,
+) -> list[dict]:
+    """Get all messages in a thread as they are stored, serialized with `message_to_dict`.
+    Like `get_thread_messages`, but without deserializing the messages.\n
+    Non-chat messages (like tool calls) are filtered out in the database.
+    Messages are returned oldest first. When `limit` is set, the newest messages are returned,
+    unless only `after` is set, then the messages right after it are returned.
+
+    Args:
+        thread (Thread): Thread model instance to get messages from
+        user (Any): Current user
+        request (HttpRequest | None): Current request, if any
+        before (Any | None): Only return messages older than the message with this ID.
+            Raises `Message.DoesNotExist` if the message isn't in the thread, or the ID is malformed.
+        after (Any | None): Only return messages newer than the message with this ID.
+            Raises `Message.DoesNotExist` if the message isn't in the thread, or the ID is malformed.
+        limit (int | None): Maximum number of messages to return.
+            If None, all messages are returned.
+    Returns:
+        list[dict]: List of serialized messages
+    """
     # TODO: have more permissions for threads? View thread permission?
     if user != thread.created_by:
         raise AIUserNotAllowedError("User is not allowed to view messages in this thread")
 
-    return thread.get_messages(include_extra_messages=False)
+    messages = thread.get_messages_queryset(include_extra_messages=False)
+
+    if before is not None:
+        cursor = _get_cursor(thread.messages.all(), before)
+        messages = messages.filter(
+            Q(created_at__lt=cursor["created_at"])
+            | Q(created_at=cursor["created_at"], id__lt=cursor["id"])
+        )
+    if after is not None:
+        cursor = _get_cursor(thread.messages.all(), after)
+        messages = messages.filter(
+            Q(created_at__gt=cursor["created_at"])
+            | Q(created_at=cursor["created_at"], id__gt=cursor["id"])
+        )
+
+    message_dicts = messages.values_list("message", flat=True)
+    if limit is None:
+        return list(message_dicts)
+    if after is not None and before is None:
+        return list(message_dicts[:limit])
+    return list(reversed(message_dicts.reverse()[:limit]))
 
 
 def delete_message(
@@ -311,4 +577,5 @@ def delete_message(
     if not can_delete_message(message=message, user=user, request=request):
         raise AIUserNotAllowedError("User is not allowed to delete this message")
 
+    invalidate_thread_messages(message.thread_id)
     return message.delete()
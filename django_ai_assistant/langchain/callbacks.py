@@ -0,0 +1,185 @@
+import time
+from typing import TYPE_CHECKING, Any
+from uuid import UUID
+
+from django.utils import timezone
+
+from langchain_core.callbacks import AsyncCallbackHandler, BaseCallbackHandler
+from langchain_core.messages.ai import UsageMetadata, add_usage
+from langchain_core.outputs import ChatGeneration, LLMResult
+from langgraph.graph import START
+
+
+if TYPE_CHECKING:
+    from django_ai_assistant.helpers.cancellation import CancelToken
+
+
+class RunTrackingCallbackHandler(BaseCallbackHandler):
+    """LangChain callback handler that collects the graph node timings, tool calls,
+    and LLM token usage of an assistant run.\n
+    Everything is kept in memory, so the handler never writes to the database.
+    The assistant saves the collected data to the `Run` with a single update when the run ends.
+    """
+
+    run_inline = True
+
+    def __init__(self):
+        self.node_timings: list[dict[str, Any]] = []
+        """Graph nodes in the order they finished, like
+        `{"node": "agent", "started_at": "...", "duration_ms": 12.3}`.
+        Nodes that call the LLM also have the `token_usage` of their calls."""
+        self.tool_calls: list[dict[str, Any]] = []
+        """Tool calls in the order they finished, like
+        `{"id": "call_1", "name": "fetch_weather", "duration_ms": 4.5}`."""
+        self.token_usage: UsageMetadata | None = None
+        """LLM token usage summed over all LLM calls. `None` if the LLM doesn't report usage."""
+        self.output: Any | None = None
+        """Output of the graph, set when the graph finishes."""
+        self._graph_run_id: UUID | None = None
+        self._started: dict[UUID, tuple[float, dict[str, Any]]] = {}
+        self._parent_run_ids: dict[UUID, UUID | None] = {}
+
+    def _start(self, run_id: UUID, record: dict[str, Any]):
+        self._started[run_id] = (time.perf_counter(), record)
+
+    def _end(self, run_id: UUID, records: list[dict[str, Any]], error: BaseException | None):
+        started = self._started.pop(run_id, None)
+        if started is None:
+            return
+        started_at, record = started
+        record["duration_ms"] = round((time.perf_counter() - started_at) * 1000, 3)
+        if error is not None:
+            record["error"] = repr(error)
+        records.append(record)
+
+    def on_chain_start(
+        self,
+        serialized: dict[str, Any] | None,
+        inputs: Any,
+        *,
+        run_id: UUID,
+        parent_run_id: UUID | None = None,
+        metadata: dict[str, Any] | None = None,
+        **kwargs: Any,
+    ):
+        if self._graph_run_id is None:
+            self._graph_run_id = run_id
+        self._parent_run_ids[run_id] = parent_run_id
+        # Runnables inside a node inherit the node metadata, but have other names.
+        # The START node only routes the input, so it isn't timed:
+        node = (metadata or {}).get("langgraph_node")
+        if node is not None and node != START and kwargs.get("name") == node:
+            self._start(run_id, {"node": node, "started_at": timezone.now().isoformat()})
+
+    def on_chain_end(self, outputs: Any, *, run_id: UUID, **kwargs: Any):
+        if run_id == self._graph_run_id:
+            self.output = outputs
+        self._end(run_id, self.node_timings, None)
+
+    def on_chain_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any):
+        self._end(run_id, self.node_timings, error)
+
+    def on_tool_start(
+        self,
+        serialized: dict[str, Any],
+        input_str: str,
+        *,
+        run_id: UUID,
+        **kwargs: Any,
+    ):
+        name = kwargs.get("name") or serialized.get("name")
+        self._start(run_id, {"id": kwargs.get("tool_call_id"), "name": name})
+
+    def on_tool_end(self, output: Any, *, run_id: UUID, **kwargs: Any):
+        self._end(run_id, self.tool_calls, None)
+
+    def on_tool_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any):
+        self._end(run_id, self.tool_calls, error)
+
+    def _get_node_record(self, run_id: UUID | None) -> dict[str, Any] | None:
+        # The LLM may be called inside other runnables of the node, like a structured output chain:
+        while run_id is not None:
+            if run_id in self._started:
+                return self._started[run_id][1]
+            run_id = self._parent_run_ids.get(run_id)
+        return None
+
+    def on_llm_end(
+        self,
+        response: LLMResult,
+        *,
+        run_id: UUID,
+        parent_run_id: UUID | None = None,
+        **kwargs: Any,
+    ):
+        record = self._get_node_record(parent_run_id)
+        for generations in response.generations:
+            for generation in generations:
+                if not isinstance(generation, ChatGeneration):
+                    continue
+                usage = getattr(generation.message, "usage_metadata", None)
+                if usage:
+                    self.token_usage = add_usage(self.token_usage, usage)
+                    if record is not None:
+                        record["token_usage"] = add_usage(record.get("token_usage"), usage)
+
+
+class CancellationCallbackHandler(BaseCallbackHandler):
+    """LangChain callback handler that stops a sync assistant run when its cancel token
+    is cancelled, by raising `AIRunCancelledError` before each graph node, LLM call,
+    and tool call.
+
+    Args:
+        cancel_token (CancelToken): The cancel token of the run.
+    """
+
+    run_inline = True
+    raise_error = True
+
+    def __init__(self, cancel_token: "CancelToken"):
+        self.cancel_token = cancel_token
+
+    def _check_cancelled(self):
+        if self.cancel_token.is_cancelled():
+            raise self.cancel_token.get_error()
+
+    def on_chain_start(self, serialized: Any, inputs: Any, **kwargs: Any):
+        self._check_cancelled()
+
+    def on_chat_model_start(self, serialized: Any, messages: Any, **kwargs: Any):
+        self._check_cancelled()
+
+    def on_llm_start(self, serialized: Any, prompts: Any, **kwargs: Any):
+        self._check_cancelled()
+
+    def on_tool_start(self, serialized: Any, input_str: str, **kwargs: Any):
+        self._check_cancelled()
+
+
+class AsyncCancellationCallbackHandler(AsyncCallbackHandler):
+    """Async version of `CancellationCallbackHandler`, for async assistant runs.
+
+    Args:
+        cancel_token (CancelToken): The cancel token of the run.
+    """
+
+    raise_error = True
+
+    def __init__(self, cancel_token: "CancelToken"):
+        self.cancel_token = cancel_token
+
+    async def _check_cancelled(self):
+        if await self.cancel_token.ais_cancelled():
+            raise self.cancel_token.get_error()
+
+    async def on_chain_start(self, serialized: Any, inputs: Any, **kwargs: Any):
+        await self._check_cancelled()
+
+    async def on_chat_model_start(self, serialized: Any, messages: Any, **kwargs: Any):
+        await self._check_cancelled()
+
+    async def on_llm_start(self, serialized: Any, prompts: Any, **kwargs: Any):
+        await self._check_cancelled()
+
+    async def on_tool_start(self, serialized: Any, input_str: str, **kwargs: Any):
+        await self._check_cancelled()
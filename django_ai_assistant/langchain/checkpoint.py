@@ -0,0 +1,453 @@
+import random
+from typing import TYPE_CHECKING, Any, AsyncIterator, Iterator, List, Sequence, cast
+
+from django.db.models import Q, QuerySet
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    SerializerProtocol,
+    get_checkpoint_id,
+    get_serializable_checkpoint_metadata,
+)
+
+
+if TYPE_CHECKING:
+    from django_ai_assistant.models import Checkpoint as DjangoCheckpoint
+    from django_ai_assistant.models import CheckpointBlob, CheckpointWrite
+
+
+class DjangoCheckpointSaver(BaseCheckpointSaver[str]):
+    """LangGraph checkpoint saver that stores checkpoints in the Django database,
+    using the `Checkpoint`, `CheckpointBlob`, and `CheckpointWrite` models.\n
+    The LangGraph `thread_id` is the `Thread` ID, so checkpoints are deleted with the thread.
+    Both the sync and the async LangGraph methods are supported,
+    the async ones use Django async queries.\n
+    Channel values are stored once per version, so unchanged channels aren't duplicated
+    across checkpoints. Older checkpoints aren't pruned when a checkpoint is saved,
+    which would run the delete queries on every graph step. Instead, `prune` removes them,
+    keeping only the most recent `keep_last` ones. `AIAssistant` calls it once at the end of each run.
+
+    Args:
+        keep_last (int | None): Number of checkpoints to keep per thread.
+            Defaults to `1`, which is enough to resume the next run.
+            If `None`, checkpoints are never pruned.
+        serde (SerializerProtocol | None): The serializer to use for checkpoints.
+            Defaults to the LangGraph serializer.
+    """
+
+    def __init__(self, *, keep_last: int | None = 1, serde: SerializerProtocol | None = None):
+        super().__init__(serde=serde)
+        if keep_last is not None and keep_last < 1:
+            raise ValueError("keep_last must be at least 1, or None to disable pruning")
+        self.keep_last = keep_last
+
+    def get_tuple(self, config: RunnableConfig) -> CheckpointTuple | None:
+        row = self._get_checkpoint_queryset(config).first()
+        if row is None:
+            return None
+
+        checkpoint = self._loads(row.type, row.checkpoint)
+        blobs = list(self._get_blobs_queryset(row, checkpoint["channel_versions"]))
+        writes = list(self._get_writes_queryset(row))
+        return self._make_tuple(row, checkpoint, blobs, writes)
+
+    async def aget_tuple(self, config: RunnableConfig) -> CheckpointTuple | None:
+        row = await self._get_checkpoint_queryset(config).afirst()
+        if row is None:
+            return None
+
+        checkpoint = self._loads(row.type, row.checkpoint)
+        blobs = [b async for b in self._get_blobs_queryset(row, checkpoint["channel_versions"])]
+        writes = [w async for w in self._get_writes_queryset(row)]
+        return self._make_tuple(row, checkpoint, blobs, writes)
+
+    def list(  # noqa: A003
+        self,
+        config: RunnableConfig | None,
+        *,
+        filter: dict[str, Any] | None = None,  # noqa: A002
+        before: RunnableConfig | None = None,
+        limit: int | None = None,
+    ) -> Iterator[CheckpointTuple]:
+        for row in self._get_list_queryset(config, filter=filter, before=before, limit=limit):
+            checkpoint = self._loads(row.type, row.checkpoint)
+            blobs = list(self._get_blobs_queryset(row, checkpoint["channel_versions"]))
+            writes = list(self._get_writes_queryset(row))
+            yield self._make_tuple(row, checkpoint, blobs, writes)
+
+    async def alist(
+        self,
+        config: RunnableConfig | None,
+        *,
+        filter: dict[str, Any] | None = None,  # noqa: A002
+        before: RunnableConfig | None = None,
+        limit: int | None = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        queryset = self._get_list_queryset(config, filter=filter, before=before, limit=limit)
+        async for row in queryset:
+            checkpoint = self._loads(row.type, row.checkpoint)
+            blobs = [b async for b in self._get_blobs_queryset(row, checkpoint["channel_versions"])]
+            writes = [w async for w in self._get_writes_queryset(row)]
+            yield self._make_tuple(row, checkpoint, blobs, writes)
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        from django_ai_assistant.models import Checkpoint as DjangoCheckpoint
+        from django_ai_assistant.models import CheckpointBlob
+
+        row, blobs = self._make_checkpoint_rows(config, checkpoint, metadata, new_versions)
+        # Blobs are saved first, so a checkpoint is never visible without its values:
+        CheckpointBlob.objects.bulk_create(blobs, ignore_conflicts=True)
+        DjangoCheckpoint.objects.bulk_create([row], **self._checkpoint_upsert_kwargs())
+        return self._make_config(row)
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        from django_ai_assistant.models import Checkpoint as DjangoCheckpoint
+        from django_ai_assistant.models import CheckpointBlob
+
+        row, blobs = self._make_checkpoint_rows(config, checkpoint, metadata, new_versions)
+        # Blobs are saved first, so a checkpoint is never visible without its values:
+        await CheckpointBlob.objects.abulk_create(blobs, ignore_conflicts=True)
+        await DjangoCheckpoint.objects.abulk_create([row], **self._checkpoint_upsert_kwargs())
+        return self._make_config(row)
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        from django_ai_assistant.models import CheckpointWrite
+
+        rows = self._make_write_rows(config, writes, task_id, task_path)
+        CheckpointWrite.objects.bulk_create(rows, **self._writes_conflict_kwargs(rows))
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        from django_ai_assistant.models import CheckpointWrite
+
+        rows = self._make_write_rows(config, writes, task_id, task_path)
+        await CheckpointWrite.objects.abulk_create(rows, **self._writes_conflict_kwargs(rows))
+
+    def delete_thread(self, thread_id: str) -> None:
+        for queryset in self._get_thread_querysets(thread_id):
+            queryset.delete()
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        for queryset in self._get_thread_querysets(thread_id):
+            await queryset.adelete()
+
+    def get_next_version(self, current: str | None, channel: None) -> str:
+        # Same as the LangGraph InMemorySaver. Zero-padded, so versions compare as strings:
+        if current is None:
+            current_v = 0
+        elif isinstance(current, int):
+            current_v = current
+        else:
+            current_v = int(current.split(".")[0])
+        next_v = current_v + 1
+        next_h = random.random()  # noqa: S311
+        return f"{next_v:032}.{next_h:016}"
+
+    def _loads(self, type_: str, value: bytes | memoryview) -> Any:
+        return self.serde.loads_typed((type_, bytes(value)))
+
+    def _get_checkpoint_queryset(self, config: RunnableConfig) -> QuerySet["DjangoCheckpoint"]:
+        from django_ai_assistant.models import Checkpoint as DjangoCheckpoint
+
+        configurable = config["configurable"]
+        queryset = DjangoCheckpoint.objects.filter(
+            thread_id=configurable["thread_id"],
+            checkpoint_ns=configurable.get("checkpoint_ns", ""),
+        )
+        if checkpoint_id := get_checkpoint_id(config):
+            return queryset.filter(checkpoint_id=checkpoint_id)
+        return queryset.order_by("-checkpoint_id")
+
+    def _get_list_queryset(
+        self,
+        config: RunnableConfig | None,
+        *,
+        filter: dict[str, Any] | None,  # noqa: A002
+        before: RunnableConfig | None,
+        limit: int | None,
+    ) -> QuerySet["DjangoCheckpoint"]:
+        from django_ai_assistant.models import Checkpoint as DjangoCheckpoint
+
+        queryset = DjangoCheckpoint.objects.all()
+        if config:
+            configurable = config["configurable"]
+            queryset = queryset.filter(thread_id=configurable["thread_id"])
+            if (checkpoint_ns := configurable.get("checkpoint_ns")) is not None:
+                queryset = queryset.filter(checkpoint_ns=checkpoint_ns)
+            if checkpoint_id := get_checkpoint_id(config):
+                queryset = queryset.filter(checkpoint_id=checkpoint_id)
+        if before and (before_checkpoint_id := get_checkpoint_id(before)):
+            queryset = queryset.filter(checkpoint_id__lt=before_checkpoint_id)
+        for key, value in (filter or {}).items():
+            queryset = queryset.filter(**{f"metadata__{key}": value})
+
+        queryset = queryset.order_by("-checkpoint_id")
+        if limit is not None:
+            queryset = queryset[:limit]
+        return queryset
+
+    def _get_blobs_queryset(
+        self, row: "DjangoCheckpoint", channel_versions: ChannelVersions
+    ) -> QuerySet["CheckpointBlob"]:
+        from django_ai_assistant.models import CheckpointBlob
+
+        versions_filter = Q(pk__in=[])
+        for channel, version in channel_versions.items():
+            versions_filter |= Q(channel=channel, version=str(version))
+        return CheckpointBlob.objects.filter(
+            versions_filter,
+            thread_id=row.thread_id,
+            checkpoint_ns=row.checkpoint_ns,
+        )
+
+    def _get_writes_queryset(self, row: "DjangoCheckpoint") -> QuerySet["CheckpointWrite"]:
+        from django_ai_assistant.models import CheckpointWrite
+
+        return CheckpointWrite.objects.filter(
+            thread_id=row.thread_id,
+            checkpoint_ns=row.checkpoint_ns,
+            checkpoint_id=row.checkpoint_id,
+        ).order_by("task_path", "task_id", "idx")
+
+    def prune(self, thread_id: str, checkpoint_ns: str = "") -> None:
+        """Delete the checkpoints of the thread older than the most recent `keep_last` ones,
+        with their writes and the channel values no longer referenced.
+        Makes a single query when there's nothing to prune.
+        Does nothing if `keep_last` is `None`.
+
+        Args:
+            thread_id (str): The LangGraph thread ID.
+            checkpoint_ns (str): The checkpoint namespace. Defaults to the root graph one.
+        """
+        if self.keep_last is None:
+            return
+        rows = list(self._get_oldest_kept_queryset(thread_id, checkpoint_ns))
+        # Without a checkpoint older than the oldest kept one, there's nothing to delete:
+        if len(rows) < 2:
+            return
+
+        oldest_kept = self._loads(rows[0].type, rows[0].checkpoint)
+        for queryset in self._get_prune_querysets(thread_id, checkpoint_ns, oldest_kept):
+            queryset.delete()
+
+    async def aprune(self, thread_id: str, checkpoint_ns: str = "") -> None:
+        """Async version of `prune`.
+
+        Args:
+            thread_id (str): The LangGraph thread ID.
+            checkpoint_ns (str): The checkpoint namespace. Defaults to the root graph one.
+        """
+        if self.keep_last is None:
+            return
+        rows = [row async for row in self._get_oldest_kept_queryset(thread_id, checkpoint_ns)]
+        if len(rows) < 2:
+            return
+
+        oldest_kept = self._loads(rows[0].type, rows[0].checkpoint)
+        for queryset in self._get_prune_querysets(thread_id, checkpoint_ns, oldest_kept):
+            await queryset.adelete()
+
+    def _get_oldest_kept_queryset(
+        self, thread_id: str, checkpoint_ns: str
+    ) -> QuerySet["DjangoCheckpoint"]:
+        from django_ai_assistant.models import Checkpoint as DjangoCheckpoint
+
+        # The oldest kept checkpoint, followed by the newest one to prune, if any:
+        keep_last = cast(int, self.keep_last)
+        return (
+            DjangoCheckpoint.objects.filter(thread_id=thread_id, checkpoint_ns=checkpoint_ns)
+            .order_by("-checkpoint_id")
+            .only("type", "checkpoint")[keep_last - 1 : keep_last + 1]
+        )
+
+    def _get_prune_querysets(
+        self, thread_id: str, checkpoint_ns: str, oldest_kept: Checkpoint
+    ) -> List[QuerySet]:
+        from django_ai_assistant.models import Checkpoint as DjangoCheckpoint
+        from django_ai_assistant.models import CheckpointBlob, CheckpointWrite
+
+        thread_filter = {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns}
+        querysets: List[QuerySet] = [
+            DjangoCheckpoint.objects.filter(**thread_filter, checkpoint_id__lt=oldest_kept["id"]),
+            CheckpointWrite.objects.filter(**thread_filter, checkpoint_id__lt=oldest_kept["id"]),
+        ]
+
+        # Channel versions only increase, so the oldest kept checkpoint references
+        # the oldest blob versions still in use:
+        old_versions_filter = Q(pk__in=[])
+        for channel, version in oldest_kept["channel_versions"].items():
+            old_versions_filter |= Q(channel=channel, version__lt=str(version))
+        querysets.append(CheckpointBlob.objects.filter(old_versions_filter, **thread_filter))
+        return querysets
+
+    def _get_thread_querysets(self, thread_id: str) -> List[QuerySet]:
+        from django_ai_assistant.models import Checkpoint as DjangoCheckpoint
+        from django_ai_assistant.models import CheckpointBlob, CheckpointWrite
+
+        return [
+            DjangoCheckpoint.objects.filter(thread_id=thread_id),
+            CheckpointBlob.objects.filter(thread_id=thread_id),
+            CheckpointWrite.objects.filter(thread_id=thread_id),
+        ]
+
+    def _make_checkpoint_rows(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> tuple["DjangoCheckpoint", List["CheckpointBlob"]]:
+        from django_ai_assistant.models import Checkpoint as DjangoCheckpoint
+        from django_ai_assistant.models import CheckpointBlob
+
+        configurable = config["configurable"]
+        thread_id = configurable["thread_id"]
+        checkpoint_ns = configurable.get("checkpoint_ns", "")
+
+        checkpoint_without_values = checkpoint.copy()
+        values: dict[str, Any] = checkpoint_without_values.pop("channel_values")  # type: ignore[misc]
+
+        blobs = []
+        for channel, version in new_versions.items():
+            type_, blob = (
+                self.serde.dumps_typed(values[channel]) if channel in values else ("empty", b"")
+            )
+            blobs.append(
+                CheckpointBlob(
+                    thread_id=thread_id,
+                    checkpoint_ns=checkpoint_ns,
+                    channel=channel,
+                    version=str(version),
+                    type=type_,
+                    blob=blob,
+                )
+            )
+
+        type_, serialized_checkpoint = self.serde.dumps_typed(checkpoint_without_values)
+        row = DjangoCheckpoint(
+            thread_id=thread_id,
+            checkpoint_ns=checkpoint_ns,
+            checkpoint_id=checkpoint["id"],
+            parent_checkpoint_id=configurable.get("checkpoint_id") or "",
+            type=type_,
+            checkpoint=serialized_checkpoint,
+            metadata=get_serializable_checkpoint_metadata(config, metadata),
+        )
+        return row, blobs
+
+    def _make_write_rows(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        task_path: str,
+    ) -> List["CheckpointWrite"]:
+        from django_ai_assistant.models import CheckpointWrite
+
+        configurable = config["configurable"]
+        rows = []
+        for idx, (channel, value) in enumerate(writes):
+            type_, blob = self.serde.dumps_typed(value)
+            rows.append(
+                CheckpointWrite(
+                    thread_id=configurable["thread_id"],
+                    checkpoint_ns=configurable.get("checkpoint_ns", ""),
+                    checkpoint_id=configurable["checkpoint_id"],
+                    task_id=task_id,
+                    task_path=task_path,
+                    idx=WRITES_IDX_MAP.get(channel, idx),
+                    channel=channel,
+                    type=type_,
+                    blob=blob,
+                )
+            )
+        return rows
+
+    def _checkpoint_upsert_kwargs(self) -> dict[str, Any]:
+        return {
+            "update_conflicts": True,
+            "unique_fields": ["thread", "checkpoint_ns", "checkpoint_id"],
+            "update_fields": ["parent_checkpoint_id", "type", "checkpoint", "metadata"],
+        }
+
+    def _writes_conflict_kwargs(self, rows: List["CheckpointWrite"]) -> dict[str, Any]:
+        # Special writes, like errors and interrupts, replace the previous ones.
+        # Regular writes are kept as first saved, like in the other LangGraph savers:
+        if rows and all(row.idx < 0 for row in rows):
+            return {
+                "update_conflicts": True,
+                "unique_fields": ["thread", "checkpoint_ns", "checkpoint_id", "task_id", "idx"],
+                "update_fields": ["channel", "type", "blob", "task_path"],
+            }
+        return {"ignore_conflicts": True}
+
+    def _make_config(self, row: "DjangoCheckpoint") -> RunnableConfig:
+        return {
+            "configurable": {
+                "thread_id": str(row.thread_id),
+                "checkpoint_ns": row.checkpoint_ns,
+                "checkpoint_id": row.checkpoint_id,
+            }
+        }
+
+    def _make_tuple(
+        self,
+        row: "DjangoCheckpoint",
+        checkpoint: Checkpoint,
+        blobs: List["CheckpointBlob"],
+        writes: List["CheckpointWrite"],
+    ) -> CheckpointTuple:
+        channel_values = {
+            blob.channel: self._loads(blob.type, blob.blob)
+            for blob in blobs
+            if blob.type != "empty"
+        }
+        return CheckpointTuple(
+            config=self._make_config(row),
+            checkpoint={**checkpoint, "channel_values": channel_values},
+            metadata=row.metadata,
+            parent_config=(
+                {
+                    "configurable": {
+                        "thread_id": str(row.thread_id),
+                        "checkpoint_ns": row.checkpoint_ns,
+                        "checkpoint_id": row.parent_checkpoint_id,
+                    }
+                }
+                if row.parent_checkpoint_id
+                else None
+            ),
+            pending_writes=[
+                (write.task_id, write.channel, self._loads(write.type, write.blob))
+                for write in writes
+            ],
+        )
@@ -6,17 +6,30 @@ from langchain_core.tools import (  # noqa
 )
 from pydantic.v1 import BaseModel, Field  # noqa
 
+from django_ai_assistant.helpers.tool_cache import ToolCache
 
-def method_tool(*args, **kwargs):
+
+def method_tool(*args, cache=None, timeout=None, retry=None, circuit_breaker=None, **kwargs):
     # If there's one arg and no kwargs, the decorator is being using like `@method_tool`
     # instead of `@method_tool(...)`
-    if len(args) == 1 and len(kwargs) == 0:
+    has_options = any(o is not None for o in (cache, timeout, retry, circuit_breaker))
+    if len(args) == 1 and len(kwargs) == 0 and not has_options:
         decorated_method = args[0]
         decorated_method._is_tool = True
         return decorated_method
 
+    # `cache` can be a `ToolCache` or the timeout of the results, like `@method_tool(cache=600)`:
+    if cache is not None and not isinstance(cache, ToolCache):
+        cache = ToolCache(timeout=cache)
+
     def decorator(decorated_method):
         decorated_method._is_tool = True
+        decorated_method._tool_cache = cache
+        # Seconds to wait for the tool, overriding `AIAssistant.tool_timeout`:
+        decorated_method._tool_timeout = timeout
+        # `RetryPolicy` and `CircuitBreaker` of each call, see `call_with_resilience`:
+        decorated_method._tool_retry = retry
+        decorated_method._tool_circuit_breaker = circuit_breaker
         decorated_method._tool_maker_args = args
         decorated_method._tool_maker_kwargs = kwargs
         return decorated_method
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from django_ai_assistant.helpers.retrievers import RetrieverIndex
+
+
+class Command(BaseCommand):
+    help = (  # noqa: A003
+        "Build the retriever indexes again from the database, "
+        "like after changing rows with `QuerySet.update` or on deploy"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "index_ids",
+            nargs="*",
+            help="IDs of the indexes to rebuild. Defaults to all indexes",
+        )
+
+    def handle(self, *args, **options):
+        registry = RetrieverIndex.get_cls_registry()
+        index_ids = options["index_ids"] or list(registry)
+        unknown_ids = [index_id for index_id in index_ids if index_id not in registry]
+        if unknown_ids:
+            raise CommandError(f"Unknown indexes: {', '.join(unknown_ids)}")
+
+        for index_id in index_ids:
+            entry = registry[index_id]().rebuild()
+            self.stdout.write(f"Index {index_id} rebuilt with {len(entry['documents'])} rows")
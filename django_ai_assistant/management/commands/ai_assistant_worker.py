@@ -0,0 +1,39 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from django_ai_assistant.helpers.runs import claim_next_run, process_run
+
+
+class Command(BaseCommand):
+    help = (  # noqa: A003
+        "Execute the assistant runs queued in the database by the "
+        "`enqueue_run_in_database` execution backend"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=1.0,
+            help="Seconds to wait before checking for new runs when the queue is empty",
+        )
+        parser.add_argument(
+            "--burst",
+            action="store_true",
+            help="Exit when the queue is empty instead of waiting for new runs",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            close_old_connections()
+            run = claim_next_run()
+            if run is None:
+                if options["burst"]:
+                    break
+                time.sleep(options["poll_interval"])
+                continue
+
+            process_run(run)
+            self.stdout.write(f"Run {run.id} {run.status}")
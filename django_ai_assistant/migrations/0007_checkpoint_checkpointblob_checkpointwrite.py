@@ -0,0 +1,70 @@
+# Generated by Django 6.1.2 on 2026-10-17 04:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_ai_assistant', '0006_thread_assistant_id'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Checkpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('checkpoint_ns', models.CharField(blank=True, max_length=255)),
+                ('checkpoint_id', models.CharField(max_length=255)),
+                ('parent_checkpoint_id', models.CharField(blank=True, max_length=255)),
+                ('type', models.CharField(max_length=255)),
+                ('checkpoint', models.BinaryField()),
+                ('metadata', models.JSONField(default=dict)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('thread', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='checkpoints', to='django_ai_assistant.thread')),
+            ],
+            options={
+                'verbose_name': 'Checkpoint',
+                'verbose_name_plural': 'Checkpoints',
+                'constraints': [models.UniqueConstraint(fields=('thread', 'checkpoint_ns', 'checkpoint_id'), name='unique_checkpoint')],
+            },
+        ),
+        migrations.CreateModel(
+            name='CheckpointBlob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('checkpoint_ns', models.CharField(blank=True, max_length=255)),
+                ('channel', models.CharField(max_length=255)),
+                ('version', models.CharField(max_length=255)),
+                ('type', models.CharField(max_length=255)),
+                ('blob', models.BinaryField()),
+                ('thread', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='checkpoint_blobs', to='django_ai_assistant.thread')),
+            ],
+            options={
+                'verbose_name': 'Checkpoint blob',
+                'verbose_name_plural': 'Checkpoint blobs',
+                'constraints': [models.UniqueConstraint(fields=('thread', 'checkpoint_ns', 'channel', 'version'), name='unique_checkpoint_blob')],
+            },
+        ),
+        migrations.CreateModel(
+            name='CheckpointWrite',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('checkpoint_ns', models.CharField(blank=True, max_length=255)),
+                ('checkpoint_id', models.CharField(max_length=255)),
+                ('task_id', models.CharField(max_length=255)),
+                ('task_path', models.CharField(blank=True, max_length=255)),
+                ('idx', models.IntegerField()),
+                ('channel', models.CharField(max_length=255)),
+                ('type', models.CharField(max_length=255)),
+                ('blob', models.BinaryField()),
+                ('thread', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='checkpoint_writes', to='django_ai_assistant.thread')),
+            ],
+            options={
+                'verbose_name': 'Checkpoint write',
+                'verbose_name_plural': 'Checkpoint writes',
+                'constraints': [models.UniqueConstraint(fields=('thread', 'checkpoint_ns', 'checkpoint_id', 'task_id', 'idx'), name='unique_checkpoint_write')],
+            },
+        ),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 6.1.2 on 2026-10-17 04:49
+
+from django.db import migrations, models
+
+
+def get_text(content):
+    if isinstance(content, str):
+        return content
+    return "".join(
+        block if isinstance(block, str) else block.get("text", "")
+        for block in content
+        if isinstance(block, str) or block.get("type") == "text"
+    )
+
+
+def backfill_message_fields(apps, schema_editor):
+    Message = apps.get_model("django_ai_assistant", "Message")
+    batch_size = 1000
+    messages = []
+    for message in Message.objects.only("id", "message").iterator(chunk_size=batch_size):
+        data = message.message.get("data", {}) if message.message else {}
+        message.type = message.message.get("type", "") if message.message else ""
+        message.has_tool_calls = bool(data.get("tool_calls"))
+        message.content = get_text(data.get("content", ""))
+        messages.append(message)
+        if len(messages) >= batch_size:
+            Message.objects.bulk_update(messages, ["type", "has_tool_calls", "content"])
+            messages = []
+    if messages:
+        Message.objects.bulk_update(messages, ["type", "has_tool_calls", "content"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_ai_assistant', '0007_checkpoint_checkpointblob_checkpointwrite'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='message',
+            name='content',
+            field=models.TextField(blank=True),
+        ),
+        migrations.AddField(
+            model_name='message',
+            name='has_tool_calls',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='message',
+            name='type',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(models.F('thread'), models.F('type'), models.F('has_tool_calls'), name='message_thread_type'),
+        ),
+        migrations.RunPython(backfill_message_fields, migrations.RunPython.noop),
+    ]
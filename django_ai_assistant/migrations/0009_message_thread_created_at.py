@@ -0,0 +1,17 @@
+# Generated by Django 6.1.2 on 2026-10-17 04:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_ai_assistant', '0008_message_type_has_tool_calls_content'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(models.F('thread'), models.F('created_at'), models.F('id'), name='message_thread_created_at'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 6.1.2 on 2026-10-17 04:56
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_ai_assistant', '0009_message_thread_created_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='thread',
+            name='summarized_until',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='django_ai_assistant.message'),
+        ),
+        migrations.AddField(
+            model_name='thread',
+            name='summary',
+            field=models.TextField(blank=True),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 6.1.2 on 2026-10-17 05:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_ai_assistant', '0011_run'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='run',
+            name='node_timings',
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.AddField(
+            model_name='run',
+            name='token_usage',
+            field=models.JSONField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='run',
+            name='tool_calls',
+            field=models.JSONField(blank=True, default=list),
+        ),
+    ]
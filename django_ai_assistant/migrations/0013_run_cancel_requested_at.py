@@ -0,0 +1,23 @@
+# Generated by Django 6.1.2 on 2026-10-17 05:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_ai_assistant', '0012_run_node_timings_tool_calls_token_usage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='run',
+            name='cancel_requested_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='run',
+            name='status',
+            field=models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('succeeded', 'Succeeded'), ('failed', 'Failed'), ('cancelled', 'Cancelled')], default='queued', max_length=16),
+        ),
+    ]
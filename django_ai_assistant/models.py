@@ -2,18 +2,39 @@ import json
 from typing import Any, Sequence, cast
 
 from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
-from django.db.models import F, Index, Manager
-
-from langchain_core.messages import (
-    AIMessage,
-    BaseMessage,
-    ChatMessage,
-    HumanMessage,
-    messages_from_dict,
+from django.db.models import F, Index, Manager, Q, QuerySet
+
+from langchain_core.messages import BaseMessage, messages_from_dict
+
+from django_ai_assistant.helpers.messages_cache import (
+    aget_cached_thread_messages,
+    get_cached_thread_messages,
+    get_messages_cache,
 )
 
 
+HUMAN_MESSAGE_TYPES = ("human", "HumanMessageChunk", "chat", "ChatMessageChunk")
+AI_MESSAGE_TYPES = ("ai", "AIMessageChunk")
+
+# Chat messages are the ones shown to users: human messages and AI messages without tool calls.
+# Filtered with the denormalized columns of `Message`, so non-chat messages aren't loaded at all.
+CHAT_MESSAGES_FILTER = Q(type__in=HUMAN_MESSAGE_TYPES) | Q(
+    type__in=AI_MESSAGE_TYPES, has_tool_calls=False
+)
+
+
+def _get_text(content: str | list) -> str:
+    if isinstance(content, str):
+        return content
+    return "".join(
+        block if isinstance(block, str) else block.get("text", "")
+        for block in content
+        if isinstance(block, str) or block.get("type") == "text"
+    )
+
+
 class Thread(models.Model):
     """Thread model. A thread is a collection of messages between a user and the AI assistant.
     Also called conversation or session."""
@@ -31,6 +52,19 @@ class Thread(models.Model):
     """User who created the thread. Can be null. Set to null/None when user is deleted."""
     assistant_id = models.CharField(max_length=255, blank=True)
     """Associated assistant ID. Can be empty."""
+    summary = models.TextField(blank=True)
+    """Rolling summary of the thread messages up to `summarized_until`. Can be empty.
+    Maintained by assistants with `history_summary_max_tokens` set."""
+    summarized_until = models.ForeignKey(
+        "Message",
+        on_delete=models.SET_NULL,
+        related_name="+",
+        null=True,
+        blank=True,
+    )
+    """Newest message included in `summary`. Can be null.
+    Set to null/None when the message is deleted, which discards the summary."""
+    summarized_until_id: Any
     created_at = models.DateTimeField(auto_now_add=True)
     """Date and time when the thread was created.
     Automatically set when the thread is created."""
@@ -52,33 +86,122 @@ class Thread(models.Model):
         """Return the string representation of the thread like '<Thread name>'"""
         return f"<Thread {self.name}>"
 
-    def get_messages(self, include_extra_messages: bool = False) -> list[BaseMessage]:
+    def get_messages(
+        self,
+        include_extra_messages: bool = False,
+        last_n: int | None = None,
+    ) -> list[BaseMessage]:
         """
         Get LangChain messages objects from the thread.
 
         Args:
             include_extra_messages (bool): Whether to include non-chat messages (like tool calls).
+            last_n (int | None): If set, only the most recent `last_n` messages are loaded.
+                The query is limited in the database, so the cost doesn't depend on thread length.
+
+        When `AI_ASSISTANT_MESSAGES_CACHE` is set, the most recent messages are read from that cache
+        instead, and only the messages saved since the last read are loaded from the database.
+        Requests for older messages than the cached ones query the database.
+
+        Returns:
+            list[BaseMessage]: List of messages
+        """
+
+        cache = get_messages_cache()
+        if cache is not None:
+            messages, is_complete = get_cached_thread_messages(self, cache)
+            selected_messages = self._select_cached_messages(
+                messages, last_n, include_extra_messages, is_complete
+            )
+            if selected_messages is not None:
+                return selected_messages
+
+        message_dicts = list(self._get_messages_queryset(last_n, include_extra_messages))
+        return self._messages_from_dicts(message_dicts, last_n)
+
+    async def aget_messages(
+        self,
+        include_extra_messages: bool = False,
+        last_n: int | None = None,
+    ) -> list[BaseMessage]:
+        """
+        Async version of `get_messages`, using Django async queries.
+
+        Args:
+            include_extra_messages (bool): Whether to include non-chat messages (like tool calls).
+            last_n (int | None): If set, only the most recent `last_n` messages are loaded.
 
         Returns:
             list[BaseMessage]: List of messages
         """
 
-        messages = messages_from_dict(
-            cast(
-                Sequence[dict[str, BaseMessage]],
-                Message.objects.filter(thread=self)
-                .order_by("created_at")
-                .values_list("message", flat=True),
+        cache = get_messages_cache()
+        if cache is not None:
+            messages, is_complete = await aget_cached_thread_messages(self, cache)
+            selected_messages = self._select_cached_messages(
+                messages, last_n, include_extra_messages, is_complete
             )
-        )
+            if selected_messages is not None:
+                return selected_messages
+
+        message_dicts = [
+            m async for m in self._get_messages_queryset(last_n, include_extra_messages)
+        ]
+        return self._messages_from_dicts(message_dicts, last_n)
+
+    def get_messages_queryset(self, include_extra_messages: bool = False) -> QuerySet["Message"]:
+        """
+        Get the queryset of Django `Message` objects from the thread, oldest first.
+        Non-chat messages (like tool calls) are filtered out in the database.
+
+        Args:
+            include_extra_messages (bool): Whether to include non-chat messages (like tool calls).
+
+        Returns:
+            QuerySet[Message]: Queryset of messages
+        """
+
+        queryset = Message.objects.filter(thread=self)
+        if not include_extra_messages:
+            queryset = queryset.filter(CHAT_MESSAGES_FILTER)
+        return queryset.order_by("created_at", "id")
+
+    def _get_messages_queryset(self, last_n: int | None, include_extra_messages: bool):
+        queryset = self.get_messages_queryset(include_extra_messages=include_extra_messages)
+        if last_n is not None:
+            queryset = queryset.reverse()[:last_n]
+        return queryset.values_list("message", flat=True)
+
+    def _messages_from_dicts(
+        self,
+        message_dicts: list[dict],
+        last_n: int | None,
+    ) -> list[BaseMessage]:
+        if last_n is not None:
+            message_dicts.reverse()
+
+        return messages_from_dict(cast(Sequence[dict[str, BaseMessage]], message_dicts))
+
+    def _select_cached_messages(
+        self,
+        messages: list[BaseMessage],
+        last_n: int | None,
+        include_extra_messages: bool,
+        is_complete: bool,
+    ) -> list[BaseMessage] | None:
+        # None when the cached messages don't cover the request, which then queries the database:
         if not include_extra_messages:
             messages = [
                 m
                 for m in messages
-                if isinstance(m, HumanMessage | ChatMessage)
-                or (isinstance(m, AIMessage) and not m.tool_calls)
+                if m.type in HUMAN_MESSAGE_TYPES
+                or (m.type in AI_MESSAGE_TYPES and not getattr(m, "tool_calls", None))
             ]
-        return cast(list[BaseMessage], messages)
+        if last_n is None:
+            return messages if is_complete else None
+        if len(messages) < last_n and not is_complete:
+            return None
+        return messages[-last_n:] if last_n > 0 else []
 
 
 class Message(models.Model):
@@ -93,21 +216,279 @@ class Message(models.Model):
     message = models.JSONField()
     """Message content. This is a serialized LangChain `BaseMessage` that was serialized
     with `message_to_dict` and can be deserialized with `messages_from_dict`."""
+    type = models.CharField(max_length=255, blank=True)  # noqa: A003
+    """LangChain message type, like `human` or `ai`. Denormalized from `message`."""
+    has_tool_calls = models.BooleanField(default=False)
+    """Whether the message is an AI message with tool calls. Denormalized from `message`."""
+    content = models.TextField(blank=True)
+    """Text content of the message. Denormalized from `message`."""
     created_at = models.DateTimeField(auto_now_add=True)
     """Date and time when the message was created.
     Automatically set when the message is created."""
 
+    DENORMALIZED_FIELDS = ("type", "has_tool_calls", "content")
+
     class Meta:
         verbose_name = "Message"
         verbose_name_plural = "Messages"
         ordering = ("created_at",)
-        indexes = (Index(F("created_at"), name="message_created_at"),)
+        indexes = (
+            Index(F("created_at"), name="message_created_at"),
+            # Per-thread history reads, in both directions, without a sort step:
+            Index(F("thread"), F("created_at"), F("id"), name="message_thread_created_at"),
+            Index(F("thread"), F("type"), F("has_tool_calls"), name="message_thread_type"),
+        )
 
     def __str__(self) -> str:
         """Return internal message data from `message` attribute
         as the string representation of the message."""
         return json.dumps(self.message)
 
+    def save(self, *args, **kwargs):
+        """Save the message, setting the denormalized fields from `message`, if any."""
+        if self.message:
+            self.populate_message_fields()
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and "message" in update_fields:
+            kwargs["update_fields"] = {*update_fields, *self.DENORMALIZED_FIELDS}
+        super().save(*args, **kwargs)
+
     def __repr__(self) -> str:
         """Return the string representation of the message like '<Message id at thread_id>'"""
         return f"<Message {self.id} at {self.thread_id}>"
+
+    def populate_message_fields(self):
+        """Set the denormalized `type`, `has_tool_calls` and `content` fields from `message`.
+        Called by `save`, but must be called explicitly before bulk creates and updates."""
+        data = self.message.get("data", {}) if self.message else {}
+        self.type = self.message.get("type", "") if self.message else ""
+        self.has_tool_calls = bool(data.get("tool_calls"))
+        self.content = _get_text(data.get("content", ""))
+
+    @staticmethod
+    def get_message_fields(message: BaseMessage) -> dict[str, Any]:
+        """Get the denormalized fields of a LangChain message, without serializing it."""
+        return {
+            "type": message.type,
+            "has_tool_calls": bool(getattr(message, "tool_calls", None)),
+            "content": _get_text(message.content),
+        }
+
+
+class Checkpoint(models.Model):
+    """Checkpoint model. A checkpoint is a snapshot of the LangGraph state of an assistant run
+    in a thread, used to resume the next run instead of rebuilding the state from the messages.
+    Channel values are stored separately, in `CheckpointBlob`.
+    See `django_ai_assistant.langchain.checkpoint.DjangoCheckpointSaver`."""
+
+    id: Any  # noqa: A003
+    thread = models.ForeignKey(Thread, on_delete=models.CASCADE, related_name="checkpoints")
+    """Thread to which the checkpoint belongs."""
+    checkpoint_ns = models.CharField(max_length=255, blank=True)
+    """LangGraph checkpoint namespace. Empty for the root graph."""
+    checkpoint_id = models.CharField(max_length=255)
+    """LangGraph checkpoint ID. Monotonically increasing within a thread."""
+    parent_checkpoint_id = models.CharField(max_length=255, blank=True)
+    """LangGraph ID of the previous checkpoint. Empty for the first checkpoint."""
+    type = models.CharField(max_length=255)  # noqa: A003
+    """Serialization type of `checkpoint`."""
+    checkpoint = models.BinaryField()
+    """Serialized checkpoint, without the channel values."""
+    metadata = models.JSONField(default=dict)
+    """Checkpoint metadata, like the step and the source of the checkpoint."""
+    created_at = models.DateTimeField(auto_now_add=True)
+    """Date and time when the checkpoint was created.
+    Automatically set when the checkpoint is created."""
+
+    class Meta:
+        verbose_name = "Checkpoint"
+        verbose_name_plural = "Checkpoints"
+        constraints = (
+            models.UniqueConstraint(
+                fields=("thread", "checkpoint_ns", "checkpoint_id"),
+                name="unique_checkpoint",
+            ),
+        )
+
+    def __str__(self) -> str:
+        """Return the LangGraph checkpoint ID as the string representation of the checkpoint."""
+        return self.checkpoint_id
+
+    def __repr__(self) -> str:
+        """Return the string representation of the checkpoint like '<Checkpoint id at thread_id>'"""
+        return f"<Checkpoint {self.checkpoint_id} at {self.thread_id}>"
+
+
+class CheckpointBlob(models.Model):
+    """Checkpoint blob model. Stores the value of a LangGraph channel at a given version.
+    Checkpoints reference blobs by version, so values of unchanged channels aren't duplicated."""
+
+    id: Any  # noqa: A003
+    thread = models.ForeignKey(Thread, on_delete=models.CASCADE, related_name="checkpoint_blobs")
+    """Thread to which the blob belongs."""
+    checkpoint_ns = models.CharField(max_length=255, blank=True)
+    """LangGraph checkpoint namespace. Empty for the root graph."""
+    channel = models.CharField(max_length=255)
+    """LangGraph channel name, like `messages`."""
+    version = models.CharField(max_length=255)
+    """LangGraph channel version. Monotonically increasing within a channel."""
+    type = models.CharField(max_length=255)  # noqa: A003
+    """Serialization type of `blob`. `empty` if the channel had no value."""
+    blob = models.BinaryField()
+    """Serialized channel value."""
+
+    class Meta:
+        verbose_name = "Checkpoint blob"
+        verbose_name_plural = "Checkpoint blobs"
+        constraints = (
+            models.UniqueConstraint(
+                fields=("thread", "checkpoint_ns", "channel", "version"),
+                name="unique_checkpoint_blob",
+            ),
+        )
+
+    def __str__(self) -> str:
+        """Return the channel and version as the string representation of the blob."""
+        return f"{self.channel}@{self.version}"
+
+    def __repr__(self) -> str:
+        """Return the string representation of the blob like '<CheckpointBlob channel@version>'"""
+        return f"<CheckpointBlob {self.channel}@{self.version}>"
+
+
+class CheckpointWrite(models.Model):
+    """Checkpoint write model. Stores the pending writes of a LangGraph task,
+    so an interrupted run can resume without running the completed tasks again."""
+
+    id: Any  # noqa: A003
+    thread = models.ForeignKey(Thread, on_delete=models.CASCADE, related_name="checkpoint_writes")
+    """Thread to which the write belongs."""
+    checkpoint_ns = models.CharField(max_length=255, blank=True)
+    """LangGraph checkpoint namespace. Empty for the root graph."""
+    checkpoint_id = models.CharField(max_length=255)
+    """LangGraph ID of the checkpoint to which the write belongs."""
+    task_id = models.CharField(max_length=255)
+    """LangGraph ID of the task that made the write."""
+    task_path = models.CharField(max_length=255, blank=True)
+    """LangGraph path of the task that made the write."""
+    idx = models.IntegerField()
+    """Index of the write in the task writes. Negative for special writes, like errors."""
+    channel = models.CharField(max_length=255)
+    """LangGraph channel name, like `messages`."""
+    type = models.CharField(max_length=255)  # noqa: A003
+    """Serialization type of `blob`."""
+    blob = models.BinaryField()
+    """Serialized written value."""
+
+    class Meta:
+        verbose_name = "Checkpoint write"
+        verbose_name_plural = "Checkpoint writes"
+        constraints = (
+            models.UniqueConstraint(
+                fields=("thread", "checkpoint_ns", "checkpoint_id", "task_id", "idx"),
+                name="unique_checkpoint_write",
+            ),
+        )
+
+    def __str__(self) -> str:
+        """Return the task ID and index as the string representation of the write."""
+        return f"{self.task_id}:{self.idx}"
+
+    def __repr__(self) -> str:
+        """Return the string representation of the write like '<CheckpointWrite task_id:idx>'"""
+        return f"<CheckpointWrite {self.task_id}:{self.idx}>"
+
+
+class Run(models.Model):
+    """Run model. A run is an assistant execution in a thread, with its status, timings,
+    tool calls, and token usage. Runs are recorded by `AIAssistant.invoke` and its variants
+    when `track_runs=True`, or created as queued to be executed in the background by
+    the `AI_ASSISTANT_ENQUEUE_RUN_FN` execution backend.
+    See `django_ai_assistant.helpers.runs`."""
+
+    class Status(models.TextChoices):
+        QUEUED = "queued", "Queued"
+        RUNNING = "running", "Running"
+        SUCCEEDED = "succeeded", "Succeeded"
+        FAILED = "failed", "Failed"
+        CANCELLED = "cancelled", "Cancelled"
+
+    id: Any  # noqa: A003
+    thread = models.ForeignKey(Thread, on_delete=models.CASCADE, related_name="runs")
+    """Thread in which the assistant runs."""
+    thread_id: Any
+    assistant_id = models.CharField(max_length=255)
+    """ID of the assistant to run."""
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        related_name="ai_assistant_runs",
+        null=True,
+    )
+    """User who created the run, passed to the assistant. Can be null.
+    Set to null/None when user is deleted."""
+    input = models.TextField()  # noqa: A003
+    """User message to pass to the assistant."""
+    status = models.CharField(max_length=16, choices=Status.choices, default=Status.QUEUED)
+    """Run status. Background runs start as queued, and are claimed by a single worker.
+    Runs recorded by `AIAssistant.invoke` start as running."""
+    output = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+    """Assistant response, set when the run succeeds."""
+    error = models.TextField(blank=True)
+    """Error message, set when the run fails."""
+    node_timings = models.JSONField(default=list, blank=True)
+    """Executed graph nodes, in the order they finished, like
+    `{"node": "agent", "started_at": "...", "duration_ms": 12.3}`.
+    Nodes that raised an exception also have an `error`."""
+    tool_calls = models.JSONField(default=list, blank=True)
+    """Executed tool calls, in the order they finished, like
+    `{"id": "call_1", "name": "fetch_weather", "duration_ms": 4.5}`.
+    Tool calls that raised an exception also have an `error`."""
+    token_usage = models.JSONField(null=True, blank=True)
+    """LLM token usage summed over the run LLM calls, like
+    `{"input_tokens": 10, "output_tokens": 5, "total_tokens": 15}`.
+    Null if the LLM doesn't report usage."""
+    created_at = models.DateTimeField(auto_now_add=True)
+    """Date and time when the run was created.
+    Automatically set when the run is created."""
+    started_at = models.DateTimeField(null=True, blank=True)
+    """Date and time when a worker started the run."""
+    cancel_requested_at = models.DateTimeField(null=True, blank=True)
+    """Date and time when the run cancellation was requested. Shared flag checked by
+    the `RunCancelToken` of the run, like in background runs, so they can be cancelled
+    from other processes."""
+    finished_at = models.DateTimeField(null=True, blank=True)
+    """Date and time when the run succeeded, failed, or was cancelled."""
+
+    FINISHED_STATUSES = (Status.SUCCEEDED, Status.FAILED, Status.CANCELLED)
+    RESULT_FIELDS = (
+        "status",
+        "output",
+        "error",
+        "node_timings",
+        "tool_calls",
+        "token_usage",
+        "finished_at",
+    )
+
+    class Meta:
+        verbose_name = "Run"
+        verbose_name_plural = "Runs"
+        ordering = ("-created_at",)
+        indexes = (
+            # Workers claim the oldest queued run:
+            Index(F("status"), F("created_at"), name="run_status_created_at"),
+        )
+
+    def __str__(self) -> str:
+        """Return the assistant ID and status as the string representation of the run."""
+        return f"{self.assistant_id} ({self.status})"
+
+    def __repr__(self) -> str:
+        """Return the string representation of the run like '<Run id at thread_id>'"""
+        return f"<Run {self.id} at {self.thread_id}>"
+
+    @property
+    def is_finished(self) -> bool:
+        """Whether the run succeeded, failed, or was cancelled."""
+        return self.status in self.FINISHED_STATUSES
@@ -1,8 +1,9 @@
 from typing import Any
 
+from django.db.models import QuerySet
 from django.http import HttpRequest
 
-from django_ai_assistant.conf import app_settings
+from django_ai_assistant.conf import DEFAULTS, app_settings
 from django_ai_assistant.models import Message, Thread
 
 
@@ -39,6 +40,20 @@ def can_view_thread(
     )
 
 
+def filter_threads_queryset(
+    queryset: QuerySet[Thread],
+    user: Any,
+    request: HttpRequest | None = None,
+    **kwargs,
+) -> QuerySet[Thread]:
+    return app_settings.call_fn(
+        "FILTER_THREADS_QS_FN",
+        **_get_default_kwargs(user, request),
+        queryset=queryset,
+        **kwargs,
+    )
+
+
 def can_update_thread(
     thread: Thread,
     user: Any,
@@ -134,3 +149,30 @@ def owns_thread(user: Any, thread: Thread, **kwargs) -> bool:
         return True
 
     return thread.created_by == user
+
+
+def filter_owned_threads(queryset: QuerySet[Thread], user: Any, **kwargs) -> QuerySet[Thread]:
+    if user.is_superuser:
+        return queryset
+
+    return queryset.filter(created_by=user)
+
+
+def filter_viewable_threads(
+    queryset: QuerySet[Thread],
+    user: Any,
+    request: HttpRequest | None = None,
+    **kwargs,
+) -> QuerySet[Thread]:
+    # The default view permission is expressible in SQL, so there's no need to check each thread:
+    if app_settings.get_setting("CAN_VIEW_THREAD_FN") == DEFAULTS["CAN_VIEW_THREAD_FN"]:
+        return filter_owned_threads(queryset=queryset, user=user)
+
+    # Otherwise, fallback to the per-object `AI_ASSISTANT_CAN_VIEW_THREAD_FN` check:
+    return queryset.filter(
+        id__in=[
+            thread.id
+            for thread in queryset
+            if can_view_thread(thread=thread, user=user, request=request)
+        ]
+    )
@@ -0,0 +1,18 @@
+from django.core.exceptions import ImproperlyConfigured
+
+from django_ai_assistant.helpers.runs import execute_run
+
+
+try:
+    from django.tasks import task
+except ImportError as e:  # Django < 6.0
+    raise ImproperlyConfigured(
+        "The `enqueue_run_with_django_tasks` execution backend requires Django 6.0+, "
+        "which has the Django tasks framework. Use another `AI_ASSISTANT_ENQUEUE_RUN_FN`."
+    ) from e
+
+
+@task
+def execute_run_task(run_id: str):
+    """Execute a queued run. Enqueued by the `enqueue_run_with_django_tasks` execution backend."""
+    execute_run(run_id)
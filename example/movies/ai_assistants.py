@@ -11,7 +11,7 @@ import requests
 from langchain_community.tools import BraveSearch
 from langchain_core.tools import BaseTool
 
-from django_ai_assistant import AIAssistant, method_tool
+from django_ai_assistant import AIAssistant, CircuitBreaker, RetryPolicy, method_tool
 from movies.models import MovieBacklogItem
 
 
@@ -54,6 +54,8 @@ class IMDbScraper(AIAssistant):
     name = "IMDb Scraper"
     model = "gpt-4o-mini"
     tool_max_concurrency = 4
+    # Bound the wall time of the scraper, which runs as a tool of the other assistant:
+    run_timeout = 90
 
     def get_instructions(self):
         # Warning: this will use the server's timezone
@@ -62,16 +64,23 @@ class IMDbScraper(AIAssistant):
         current_date_str = timezone.now().date().isoformat()
         return f"{self.instructions}.\n Today is: {current_date_str}."
 
-    @method_tool
+    @method_tool(
+        timeout=45,
+        retry=RetryPolicy(attempts=2),
+        circuit_breaker=CircuitBreaker("jina_reader"),
+    )
     def scrape_imdb_url(self, url: str) -> str:
         """Scrape the IMDb URL and return the content as Markdown."""
-        return requests.get(
+        response = requests.get(
             "https://r.jina.ai/" + url,
             headers={
                 "Authorization": "Bearer " + settings.JINA_API_KEY,
             },
             timeout=20,
-        ).text[:30000]
+        )
+        # Raise on server errors and rate limits, so they're retried:
+        response.raise_for_status()
+        return response.text[:30000]
 
     def get_tools(self) -> Sequence[BaseTool]:
         return [
@@ -2,10 +2,23 @@ from langchain_community.retrievers import TFIDFRetriever
 from langchain_core.retrievers import BaseRetriever
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 
-from django_ai_assistant import AIAssistant
+from django_ai_assistant import AIAssistant, RetrieverIndex
 from rag.models import DjangoDocPage
 
 
+class DjangoDocsIndex(RetrieverIndex):
+    id = "django_docs"  # noqa: A003
+    model = DjangoDocPage
+    text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
+
+    def get_documents(self, instance):
+        # Only the changed pages are split again when the docs are updated:
+        return self.text_splitter.split_documents([instance.as_langchain_document()])
+
+    def build_retriever(self, documents):
+        return TFIDFRetriever.from_documents(documents)
+
+
 class DjangoDocsAssistant(AIAssistant):
     id = "django_docs_assistant"  # noqa: A003
     name = "Django Docs Assistant"
@@ -19,9 +32,4 @@ class DjangoDocsAssistant(AIAssistant):
     has_rag = True
 
     def get_retriever(self) -> BaseRetriever:
-        # NOTE: on a production application, you should persist or cache the retriever,
-        # updating it only when documents change.
-        docs = (page.as_langchain_document() for page in DjangoDocPage.objects.all())
-        text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
-        splits = text_splitter.split_documents(docs)
-        return TFIDFRetriever.from_documents(splits)
+        return DjangoDocsIndex().get_retriever()
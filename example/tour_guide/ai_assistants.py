@@ -4,7 +4,7 @@ from django.utils import timezone
 
 from pydantic import BaseModel, Field
 
-from django_ai_assistant import AIAssistant, method_tool
+from django_ai_assistant import AIAssistant, ToolCache, method_tool
 from tour_guide.integrations import fetch_points_of_interest
 
 
@@ -30,6 +30,8 @@ class TourGuideAIAssistant(AIAssistant):
     )
     model = "gpt-4o-mini"
     structured_output = TourGuide
+    # The final agent step calls a tool with the TourGuide schema, avoiding an extra LLM call:
+    structured_output_mode = "tool"
 
     def get_instructions(self):
         # Warning: this will use the server's timezone
@@ -39,7 +41,13 @@ class TourGuideAIAssistant(AIAssistant):
 
         return f"Today is: {current_date_str}. {self.instructions}"
 
-    @method_tool
+    # Points of interest rarely change, so share the results of nearby coordinates for a day:
+    @method_tool(
+        cache=ToolCache(
+            timeout=60 * 60 * 24,
+            key_fn=lambda args: (round(args["latitude"], 3), round(args["longitude"], 3)),
+        )
+    )
     def find_nearby_attractions(self, latitude: float, longitude: float) -> str:
         """
         Find nearby attractions based on user's current location.
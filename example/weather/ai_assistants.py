@@ -24,7 +24,8 @@ class WeatherAIAssistant(AIAssistant):
         current_date_str = timezone.now().date().isoformat()
         return f"You are a weather bot. Use the provided functions to answer questions. Today is: {current_date_str}."
 
-    @method_tool
+    # The current weather of a location is shared by all users for 10 minutes:
+    @method_tool(cache=60 * 10)
     def fetch_current_weather(self, location: str) -> dict:
         """Fetch the current weather data for a location"""
 
@@ -130,4 +130,109 @@ export const $ThreadMessageIn = {
     required: ['assistant_id', 'content'],
     title: 'ThreadMessageIn',
     type: 'object'
+} as const;
+
+export const $Run = {
+    properties: {
+        output: {
+            title: 'Output'
+        },
+        node_timings: {
+            items: {
+                additionalProperties: true,
+                type: 'object'
+            },
+            title: 'Node Timings',
+            type: 'array'
+        },
+        tool_calls: {
+            items: {
+                additionalProperties: true,
+                type: 'object'
+            },
+            title: 'Tool Calls',
+            type: 'array'
+        },
+        token_usage: {
+            anyOf: [
+                {
+                    additionalProperties: true,
+                    type: 'object'
+                },
+                {
+                    type: 'null'
+                }
+            ],
+            title: 'Token Usage'
+        },
+        id: {
+            anyOf: [
+                {
+                    type: 'integer'
+                },
+                {
+                    type: 'null'
+                }
+            ],
+            title: 'ID'
+        },
+        thread: {
+            title: 'Thread',
+            type: 'integer'
+        },
+        assistant_id: {
+            maxLength: 255,
+            title: 'Assistant Id',
+            type: 'string'
+        },
+        status: {
+            default: 'queued',
+            maxLength: 16,
+            title: 'Status',
+            type: 'string'
+        },
+        error: {
+            anyOf: [
+                {
+                    type: 'string'
+                },
+                {
+                    type: 'null'
+                }
+            ],
+            title: 'Error'
+        },
+        created_at: {
+            format: 'date-time',
+            title: 'Created At',
+            type: 'string'
+        },
+        started_at: {
+            anyOf: [
+                {
+                    format: 'date-time',
+                    type: 'string'
+                },
+                {
+                    type: 'null'
+                }
+            ],
+            title: 'Started At'
+        },
+        finished_at: {
+            anyOf: [
+                {
+                    format: 'date-time',
+                    type: 'string'
+                },
+                {
+                    type: 'null'
+                }
+            ],
+            title: 'Finished At'
+        }
+    },
+    required: ['node_timings', 'tool_calls', 'thread', 'assistant_id', 'created_at'],
+    title: 'Run',
+    type: 'object'
 } as const;
\ No newline at end of file
@@ -3,7 +3,7 @@
 import type { CancelablePromise } from './core/CancelablePromise';
 import { OpenAPI } from './core/OpenAPI';
 import { request as __request } from './core/request';
-import type { AiListAssistantsResponse, AiGetAssistantData, AiGetAssistantResponse, AiListThreadsData, AiListThreadsResponse, AiCreateThreadData, AiCreateThreadResponse, AiGetThreadData, AiGetThreadResponse, AiUpdateThreadData, AiUpdateThreadResponse, AiDeleteThreadData, AiDeleteThreadResponse, AiListThreadMessagesData, AiListThreadMessagesResponse, AiCreateThreadMessageData, AiCreateThreadMessageResponse, AiDeleteThreadMessageData, AiDeleteThreadMessageResponse } from './types.gen';
+import type { AiListAssistantsResponse, AiGetAssistantData, AiGetAssistantResponse, AiListThreadsData, AiListThreadsResponse, AiCreateThreadData, AiCreateThreadResponse, AiGetThreadData, AiGetThreadResponse, AiUpdateThreadData, AiUpdateThreadResponse, AiDeleteThreadData, AiDeleteThreadResponse, AiListThreadMessagesData, AiListThreadMessagesResponse, AiCreateThreadMessageData, AiCreateThreadMessageResponse, AiStreamThreadMessageData, AiStreamThreadMessageResponse, AiCreateThreadRunData, AiCreateThreadRunResponse, AiGetRunData, AiGetRunResponse, AiCancelRunData, AiCancelRunResponse, AiStreamRunData, AiStreamRunResponse, AiDeleteThreadMessageData, AiDeleteThreadMessageResponse } from './types.gen';
 
 /**
  * List Assistants
@@ -34,6 +34,8 @@ export const aiGetAssistant = (data: AiGetAssistantData): CancelablePromise<AiGe
  * List Threads
  * @param data The data for the request.
  * @param data.assistantId
+ * @param data.before
+ * @param data.limit
  * @returns Thread OK
  * @throws ApiError
  */
@@ -41,7 +43,9 @@ export const aiListThreads = (data: AiListThreadsData = {}): CancelablePromise<A
     method: 'GET',
     url: '/threads/',
     query: {
-        assistant_id: data.assistantId
+        assistant_id: data.assistantId,
+        before: data.before,
+        limit: data.limit
     }
 }); };
 
@@ -111,6 +115,9 @@ export const aiDeleteThread = (data: AiDeleteThreadData): CancelablePromise<AiDe
  * List Thread Messages
  * @param data The data for the request.
  * @param data.threadId
+ * @param data.before
+ * @param data.after
+ * @param data.limit
  * @returns ThreadMessage OK
  * @throws ApiError
  */
@@ -119,6 +126,11 @@ export const aiListThreadMessages = (data: AiListThreadMessagesData): Cancelable
     url: '/threads/{thread_id}/messages/',
     path: {
         thread_id: data.threadId
+    },
+    query: {
+        before: data.before,
+        after: data.after,
+        limit: data.limit
     }
 }); };
 
@@ -140,6 +152,87 @@ export const aiCreateThreadMessage = (data: AiCreateThreadMessageData): Cancelab
     mediaType: 'application/json'
 }); };
 
+/**
+ * Stream Thread Message
+ * @param data The data for the request.
+ * @param data.threadId
+ * @param data.requestBody
+ * @returns unknown OK
+ * @throws ApiError
+ */
+export const aiStreamThreadMessage = (data: AiStreamThreadMessageData): CancelablePromise<AiStreamThreadMessageResponse> => { return __request(OpenAPI, {
+    method: 'POST',
+    url: '/threads/{thread_id}/messages/stream/',
+    path: {
+        thread_id: data.threadId
+    },
+    body: data.requestBody,
+    mediaType: 'application/json'
+}); };
+
+/**
+ * Create Thread Run
+ * @param data The data for the request.
+ * @param data.threadId
+ * @param data.requestBody
+ * @returns Run Accepted
+ * @throws ApiError
+ */
+export const aiCreateThreadRun = (data: AiCreateThreadRunData): CancelablePromise<AiCreateThreadRunResponse> => { return __request(OpenAPI, {
+    method: 'POST',
+    url: '/threads/{thread_id}/runs/',
+    path: {
+        thread_id: data.threadId
+    },
+    body: data.requestBody,
+    mediaType: 'application/json'
+}); };
+
+/**
+ * Get Run
+ * @param data The data for the request.
+ * @param data.runId
+ * @returns Run OK
+ * @throws ApiError
+ */
+export const aiGetRun = (data: AiGetRunData): CancelablePromise<AiGetRunResponse> => { return __request(OpenAPI, {
+    method: 'GET',
+    url: '/runs/{run_id}/',
+    path: {
+        run_id: data.runId
+    }
+}); };
+
+/**
+ * Cancel Run
+ * @param data The data for the request.
+ * @param data.runId
+ * @returns Run Accepted
+ * @throws ApiError
+ */
+export const aiCancelRun = (data: AiCancelRunData): CancelablePromise<AiCancelRunResponse> => { return __request(OpenAPI, {
+    method: 'DELETE',
+    url: '/runs/{run_id}/',
+    path: {
+        run_id: data.runId
+    }
+}); };
+
+/**
+ * Stream Run
+ * @param data The data for the request.
+ * @param data.runId
+ * @returns unknown OK
+ * @throws ApiError
+ */
+export const aiStreamRun = (data: AiStreamRunData): CancelablePromise<AiStreamRunResponse> => { return __request(OpenAPI, {
+    method: 'GET',
+    url: '/runs/{run_id}/stream/',
+    path: {
+        run_id: data.runId
+    }
+}); };
+
 /**
  * Delete Thread Message
  * @param data The data for the request.
@@ -31,6 +31,27 @@ export type ThreadMessageIn = {
     content: string;
 };
 
+export type Run = {
+    output?: unknown;
+    node_timings: Array<{
+        [key: string]: unknown;
+    }>;
+    tool_calls: Array<{
+        [key: string]: unknown;
+    }>;
+    token_usage?: {
+        [key: string]: unknown;
+    } | null;
+    id?: number | null;
+    thread: number;
+    assistant_id: string;
+    status?: string;
+    error?: string | null;
+    created_at: string;
+    started_at?: string | null;
+    finished_at?: string | null;
+};
+
 export type AiListAssistantsResponse = Array<Assistant>;
 
 export type AiGetAssistantData = {
@@ -41,6 +62,8 @@ export type AiGetAssistantResponse = Assistant;
 
 export type AiListThreadsData = {
     assistantId?: string | null;
+    before?: string | null;
+    limit?: number | null;
 };
 
 export type AiListThreadsResponse = Array<Thread>;
@@ -71,6 +94,9 @@ export type AiDeleteThreadData = {
 export type AiDeleteThreadResponse = void;
 
 export type AiListThreadMessagesData = {
+    after?: string | null;
+    before?: string | null;
+    limit?: number | null;
     threadId: unknown;
 };
 
@@ -83,6 +109,38 @@ export type AiCreateThreadMessageData = {
 
 export type AiCreateThreadMessageResponse = unknown;
 
+export type AiStreamThreadMessageData = {
+    requestBody: ThreadMessageIn;
+    threadId: unknown;
+};
+
+export type AiStreamThreadMessageResponse = unknown;
+
+export type AiCreateThreadRunData = {
+    requestBody: ThreadMessageIn;
+    threadId: unknown;
+};
+
+export type AiCreateThreadRunResponse = Run;
+
+export type AiGetRunData = {
+    runId: unknown;
+};
+
+export type AiGetRunResponse = Run;
+
+export type AiCancelRunData = {
+    runId: unknown;
+};
+
+export type AiCancelRunResponse = Run;
+
+export type AiStreamRunData = {
+    runId: unknown;
+};
+
+export type AiStreamRunResponse = unknown;
+
 export type AiDeleteThreadMessageData = {
     messageId: unknown;
     threadId: unknown;
@@ -181,6 +239,59 @@ export type $OpenApiTs = {
             };
         };
     };
+    '/threads/{thread_id}/messages/stream/': {
+        post: {
+            req: AiStreamThreadMessageData;
+            res: {
+                /**
+                 * OK
+                 */
+                200: unknown;
+            };
+        };
+    };
+    '/threads/{thread_id}/runs/': {
+        post: {
+            req: AiCreateThreadRunData;
+            res: {
+                /**
+                 * Accepted
+                 */
+                202: Run;
+            };
+        };
+    };
+    '/runs/{run_id}/': {
+        get: {
+            req: AiGetRunData;
+            res: {
+                /**
+                 * OK
+                 */
+                200: Run;
+            };
+        };
+        delete: {
+            req: AiCancelRunData;
+            res: {
+                /**
+                 * Accepted
+                 */
+                202: Run;
+            };
+        };
+    };
+    '/runs/{run_id}/stream/': {
+        get: {
+            req: AiStreamRunData;
+            res: {
+                /**
+                 * OK
+                 */
+                200: unknown;
+            };
+        };
+    };
     '/threads/{thread_id}/messages/{message_id}/': {
         delete: {
             req: AiDeleteThreadMessageData;
@@ -0,0 +1,210 @@
+# ruff: noqa: INP001
+"""
+Benchmark the per-thread ordered reads of `Message`, with and without
+the `message_thread_created_at` composite index.
+
+Fills a database with `--rows` messages spread across `--threads` threads, interleaved in time
+like real traffic, then prints the query plan and the latency of the queries issued by
+`Thread.get_messages`: the full history, the last N messages and the chat messages only.
+Rows are kept between runs, so only the missing rows are inserted.
+
+Usage, from the repository root:
+
+    python scripts/benchmark_message_queries.py --rows 10000000 --threads 100000
+    python scripts/benchmark_message_queries.py --database postgres --rows 10000000
+
+The SQLite database is stored at `--sqlite-path`. The Postgres connection uses the
+`PGHOST`, `PGPORT`, `PGUSER`, `PGPASSWORD` and `PGDATABASE` environment variables,
+and requires `psycopg` to be installed.
+
+Results with 10M messages across 100k threads (about 100 messages per thread), on a single CPU,
+median (max) over 50 threads, without -> with the index:
+
+    SQLite 3.40:     full history 4.39 (5.97) -> 2.15 (2.69) ms
+                     last 50      2.05 (3.41) -> 1.45 (1.65) ms
+                     chat only    2.60 (4.49) -> 2.87 (5.56) ms
+    PostgreSQL 16:   full history 4.16 (9.29) -> 4.01 (8.87) ms
+                     last 50      1.88 (5.08) -> 1.22 (1.76) ms
+                     chat only    3.02 (7.96) -> 2.04 (3.32) ms
+
+Without the index, SQLite searches `thread_id` and sorts with a temp B-tree, and PostgreSQL
+does a bitmap scan of `message_thread_type` and sorts. With it, both read the rows in order
+from `message_thread_created_at`, and "last N" stops after N rows (backward index scan).
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import timedelta
+from pathlib import Path
+
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import django  # noqa: E402
+from django.conf import settings  # noqa: E402
+
+
+INDEX_NAME = "message_thread_created_at"
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--database", choices=("sqlite", "postgres"), default="sqlite")
+    parser.add_argument(
+        "--sqlite-path",
+        default=str(Path(tempfile.gettempdir()) / "benchmark_messages.sqlite3"),
+    )
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument("--threads", type=int, default=100_000)
+    parser.add_argument("--batch-size", type=int, default=10_000)
+    parser.add_argument("--samples", type=int, default=50, help="Threads queried per case")
+    parser.add_argument("--last-n", type=int, default=50)
+    return parser.parse_args()
+
+
+def setup_django(args):
+    if args.database == "sqlite":
+        database = {"ENGINE": "django.db.backends.sqlite3", "NAME": args.sqlite_path}
+    else:
+        database = {
+            "ENGINE": "django.db.backends.postgresql",
+            "HOST": os.environ.get("PGHOST", "localhost"),
+            "PORT": os.environ.get("PGPORT", "5432"),
+            "USER": os.environ.get("PGUSER", "postgres"),
+            "PASSWORD": os.environ.get("PGPASSWORD", ""),
+            "NAME": os.environ.get("PGDATABASE", "benchmark_messages"),
+        }
+
+    settings.configure(
+        DATABASES={"default": database},
+        INSTALLED_APPS=[
+            "django.contrib.auth",
+            "django.contrib.contenttypes",
+            "django_ai_assistant",
+        ],
+        DEFAULT_AUTO_FIELD="django.db.models.BigAutoField",
+        USE_TZ=True,
+    )
+    django.setup()
+
+    from django.core.management import call_command
+
+    call_command("migrate", verbosity=0)
+
+
+def populate(args):
+    from django.db import transaction
+    from django.utils import timezone
+
+    from django_ai_assistant.models import Message, Thread
+
+    missing_threads = args.threads - Thread.objects.count()
+    if missing_threads > 0:
+        print(f"Creating {missing_threads} threads...")  # noqa: T201
+        Thread.objects.bulk_create(
+            (Thread(name=f"Thread {i}") for i in range(missing_threads)),
+            batch_size=args.batch_size,
+        )
+    thread_ids = list(Thread.objects.values_list("id", flat=True)[: args.threads])
+
+    # Insert increasing timestamps instead of letting `auto_now_add` set the same one:
+    Message._meta.get_field("created_at").auto_now_add = False
+    existing_rows = Message.objects.count()
+    start = timezone.now() - timedelta(seconds=args.rows)
+    for offset in range(existing_rows, args.rows, args.batch_size):
+        batch_end = min(offset + args.batch_size, args.rows)
+        with transaction.atomic():
+            Message.objects.bulk_create(
+                [
+                    Message(
+                        thread_id=random.choice(thread_ids),  # noqa: S311
+                        message={"type": "human", "data": {"content": f"Message {i}"}},
+                        type="human",
+                        content=f"Message {i}",
+                        created_at=start + timedelta(seconds=i),
+                    )
+                    for i in range(offset, batch_end)
+                ]
+            )
+        print(f"Inserted {batch_end}/{args.rows} messages", end="\r")  # noqa: T201
+    print()  # noqa: T201
+    return thread_ids
+
+
+def analyze():
+    from django.db import connection
+
+    with connection.cursor() as cursor:
+        cursor.execute("ANALYZE")
+
+
+def set_index(enabled):
+    from django.db import connection
+
+    from django_ai_assistant.models import Message
+
+    index = next(i for i in Message._meta.indexes if i.name == INDEX_NAME)
+    with connection.cursor() as cursor:
+        cursor.execute(f"DROP INDEX IF EXISTS {INDEX_NAME}")
+    if enabled:
+        with connection.schema_editor() as schema_editor:
+            schema_editor.add_index(Message, index)
+    analyze()
+
+
+def benchmark(args, thread_ids):
+    from django_ai_assistant.models import Thread
+
+    sample_threads = [Thread(id=thread_id) for thread_id in random.sample(thread_ids, args.samples)]
+    cases = {
+        "full history": lambda thread: thread._get_messages_queryset(
+            last_n=None, include_extra_messages=True
+        ),
+        f"last {args.last_n}": lambda thread: thread._get_messages_queryset(
+            last_n=args.last_n, include_extra_messages=True
+        ),
+        "chat messages": lambda thread: thread._get_messages_queryset(
+            last_n=None, include_extra_messages=False
+        ),
+    }
+
+    for name, get_queryset in cases.items():
+        print(f"\n## {name}\n")  # noqa: T201
+        print(get_queryset(sample_threads[0]).explain())  # noqa: T201
+        latencies = []
+        for thread in sample_threads:
+            started = time.perf_counter()
+            list(get_queryset(thread))
+            latencies.append((time.perf_counter() - started) * 1000)
+        print(  # noqa: T201
+            f"\nmedian {statistics.median(latencies):.2f} ms, "
+            f"max {max(latencies):.2f} ms over {len(latencies)} threads"
+        )
+
+
+def main():
+    args = parse_args()
+    setup_django(args)
+    thread_ids = populate(args)
+
+    from django.db import connection
+
+    try:
+        for enabled in (False, True):
+            set_index(enabled)
+            print(  # noqa: T201
+                f"\n# {connection.vendor}, {args.rows} messages, {args.threads} threads, "
+                f"{INDEX_NAME} {'enabled' if enabled else 'disabled'}"
+            )
+            benchmark(args, thread_ids)
+    finally:
+        set_index(True)
+
+
+if __name__ == "__main__":
+    main()
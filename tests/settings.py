@@ -116,3 +116,12 @@ AI_ASSISTANT_CAN_CREATE_MESSAGE_FN = "django_ai_assistant.permissions.owns_threa
 AI_ASSISTANT_CAN_UPDATE_MESSAGE_FN = "django_ai_assistant.permissions.owns_thread"
 AI_ASSISTANT_CAN_DELETE_MESSAGE_FN = "django_ai_assistant.permissions.owns_thread"
 AI_ASSISTANT_CAN_RUN_ASSISTANT = "django_ai_assistant.permissions.allow_all"
+AI_ASSISTANT_FILTER_THREADS_QS_FN = "django_ai_assistant.permissions.filter_viewable_threads"
+AI_ASSISTANT_LLM_CLIENT_KWARGS_FN = "django_ai_assistant.helpers.llms.no_client_kwargs"
+# Runs can't be executed in other threads with the in-memory test database:
+AI_ASSISTANT_ENQUEUE_RUN_FN = "django_ai_assistant.helpers.runs.enqueue_run_inline"
+AI_ASSISTANT_MESSAGES_CACHE = None
+AI_ASSISTANT_CONTEXTUALIZE_CACHE = None
+AI_ASSISTANT_RETRIEVER_INDEX_CACHE = "default"
+AI_ASSISTANT_TOOL_CACHE = "default"
+AI_ASSISTANT_CIRCUIT_BREAKER_CACHE = "default"
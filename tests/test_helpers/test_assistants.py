@@ -1,23 +1,41 @@
+import asyncio
+import itertools
+import json
 import sys
+import time
 from typing import List, TypedDict
 from unittest.mock import patch
 
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+import pydantic
 import pytest
 from langchain_core.documents import Document
 from langchain_core.messages import (
     AIMessage,
+    AIMessageChunk,
     HumanMessage,
     ToolMessage,
     messages_to_dict,
 )
+from langchain_core.output_parsers import JsonOutputParser
+from langchain_core.outputs import ChatGenerationChunk
 from langchain_core.retrievers import BaseRetriever
+from langchain_core.runnables import RunnableLambda
 
 from django_ai_assistant.exceptions import (
     AIAssistantMisconfiguredError,
 )
 from django_ai_assistant.helpers.assistants import AIAssistant
+from django_ai_assistant.helpers.django_messages import (
+    asave_django_messages,
+    save_django_messages,
+)
 from django_ai_assistant.langchain.tools import BaseModel, Field, method_tool
-from django_ai_assistant.models import Thread
+from django_ai_assistant.models import Run, Thread
+from tests.utils import FakeToolCallingChatModel
 
 
 @pytest.fixture(scope="module", autouse=True)
@@ -293,6 +311,685 @@ def test_AIAssistant_tool_order_same_as_declaration():
     ]
 
 
+def test_AIAssistant_method_tools_are_built_once_per_class():
+    from django_ai_assistant.helpers import assistants
+
+    with patch.object(
+        assistants, "tool_decorator", wraps=assistants.tool_decorator
+    ) as tool_decorator_spy:
+
+        class BarAssistant(AIAssistant):
+            id = "bar_assistant"  # noqa: A003
+            name = "Bar Assistant"
+            instructions = "You are a helpful assistant."
+            model = "gpt-4o"
+
+            @method_tool
+            def tool_a(self, foo: str) -> str:
+                """Tool A"""
+                return foo
+
+        assert tool_decorator_spy.call_count == 1
+
+        assistant_1 = BarAssistant()
+        assistant_2 = BarAssistant()
+
+        assert tool_decorator_spy.call_count == 1
+
+    assert assistant_1._method_tools[0] is not assistant_2._method_tools[0]
+    assert list(assistant_1._method_tools[0].args) == ["foo"]
+    assert assistant_1._method_tools[0].invoke({"foo": "AAA"}) == "AAA"
+
+    AIAssistant.clear_cls_registry()
+
+
+def test_AIAssistant_as_graph_reuses_compiled_graph():
+    class UsernameAssistant(AIAssistant):
+        id = "username_assistant"  # noqa: A003
+        name = "Username Assistant"
+        instructions = "You are a helpful assistant."
+        model = "gpt-4o"
+
+        def get_llm(self):
+            return FakeToolCallingChatModel(
+                responses=[
+                    AIMessage(
+                        content="",
+                        tool_calls=[
+                            {
+                                "name": "get_username",
+                                "args": {},
+                                "id": "call_1",
+                                "type": "tool_call",
+                            }
+                        ],
+                    ),
+                    AIMessage(content="Done."),
+                ]
+            )
+
+        @method_tool
+        def get_username(self) -> str:
+            """Return the username of the current user"""
+            return self._user
+
+    assistant_a = UsernameAssistant(user="a")
+    assistant_b = UsernameAssistant(user="b")
+    graph_a = assistant_a.as_graph()
+    graph_b = assistant_b.as_graph()
+
+    assert graph_a.builder is graph_b.builder
+    assert graph_a.config["configurable"]["assistant"] is assistant_a
+    assert graph_b.config["configurable"]["assistant"] is assistant_b
+    # The tool node and tool schemas are shared too, but each run calls its own assistant tools:
+    assert assistant_a._get_tool_node() is assistant_b._get_tool_node()
+    assert assistant_a._get_tool_schemas(None) is assistant_b._get_tool_schemas(None)
+    for assistant, username in [(assistant_a, "a"), (assistant_b, "b")]:
+        response = assistant.invoke({"input": "Who am I?"})
+        assert response["messages"][-2].content == username
+
+    AIAssistant.clear_cls_registry()
+
+
+@pytest.fixture
+def thread_with_tool_calls(db):
+    thread = Thread.objects.create(name="History Chat")
+    save_django_messages(
+        [
+            HumanMessage(content="What is the temperature today in Recife?"),
+            AIMessage(
+                content="",
+                tool_calls=[
+                    {
+                        "name": "fetch_current_temperature",
+                        "args": {"location": "Recife"},
+                        "id": "call_1",
+                        "type": "tool_call",
+                    }
+                ],
+            ),
+            ToolMessage(content="32 degrees Celsius", tool_call_id="call_1"),
+            AIMessage(content="The current temperature in Recife is 32 degrees Celsius."),
+            HumanMessage(content="What about tomorrow?"),
+            AIMessage(content="It will be 35 degrees Celsius."),
+        ],
+        thread=thread,
+    )
+    return thread
+
+
+def test_AIAssistant_get_history_messages_loads_all_by_default(thread_with_tool_calls):
+    class AllHistoryAssistant(AIAssistant):
+        id = "all_history_assistant"  # noqa: A003
+        name = "All History Assistant"
+        instructions = "You are a helpful assistant."
+        model = "gpt-4o"
+
+    messages = AllHistoryAssistant().get_history_messages(thread_with_tool_calls)
+
+    assert len(messages) == 6
+
+    # Tests using the database run first, so keep the other assistants registered:
+    AIAssistant.get_cls_registry().pop(AllHistoryAssistant.id)
+
+
+def test_AIAssistant_get_history_messages_with_max_messages(
+    thread_with_tool_calls, django_assert_num_queries
+):
+    class LastMessagesAssistant(AIAssistant):
+        id = "last_messages_assistant"  # noqa: A003
+        name = "Last Messages Assistant"
+        instructions = "You are a helpful assistant."
+        model = "gpt-4o"
+        history_max_messages = 3
+
+    assistant = LastMessagesAssistant()
+    with django_assert_num_queries(1):
+        messages = assistant.get_history_messages(thread_with_tool_calls)
+
+    assert [m.content for m in messages] == [
+        "What about tomorrow?",
+        "It will be 35 degrees Celsius.",
+    ]
+
+    AIAssistant.get_cls_registry().pop(LastMessagesAssistant.id)
+
+
+def test_AIAssistant_get_history_messages_with_max_tokens(thread_with_tool_calls):
+    class TokenBudgetAssistant(AIAssistant):
+        id = "token_budget_assistant"  # noqa: A003
+        name = "Token Budget Assistant"
+        instructions = "You are a helpful assistant."
+        model = "gpt-4o"
+        history_max_tokens = 4
+        HISTORY_WINDOW_SIZE = 2
+
+        def get_num_tokens(self, messages):
+            return len(messages)
+
+    messages = TokenBudgetAssistant().get_history_messages(thread_with_tool_calls)
+
+    assert [m.content for m in messages] == [
+        "What about tomorrow?",
+        "It will be 35 degrees Celsius.",
+    ]
+
+    AIAssistant.get_cls_registry().pop(TokenBudgetAssistant.id)
+
+
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.asyncio
+async def test_AIAssistant_aget_history_messages_with_max_tokens(thread_with_tool_calls):
+    class AsyncTokenBudgetAssistant(AIAssistant):
+        id = "async_token_budget_assistant"  # noqa: A003
+        name = "Async Token Budget Assistant"
+        instructions = "You are a helpful assistant."
+        model = "gpt-4o"
+        history_max_tokens = 4
+        HISTORY_WINDOW_SIZE = 2
+
+        def get_num_tokens(self, messages):
+            return len(messages)
+
+    messages = await AsyncTokenBudgetAssistant().aget_history_messages(thread_with_tool_calls)
+
+    assert [m.content for m in messages] == [
+        "What about tomorrow?",
+        "It will be 35 degrees Celsius.",
+    ]
+
+    AIAssistant.get_cls_registry().pop(AsyncTokenBudgetAssistant.id)
+
+
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.asyncio
+async def test_AIAssistant_arun_with_tool_calls():
+    class AsyncTemperatureAssistant(AIAssistant):
+        id = "async_temperature_assistant"  # noqa: A003
+        name = "Async Temperature Assistant"
+        instructions = "You are a temperature bot."
+        model = "gpt-4o"
+
+        def get_llm(self):
+            return FakeToolCallingChatModel(
+                responses=[
+                    AIMessage(
+                        content="",
+                        tool_calls=[
+                            {
+                                "name": "fetch_current_temperature",
+                                "args": {"location": "Recife"},
+                                "id": "call_1",
+                                "type": "tool_call",
+                            }
+                        ],
+                    ),
+                    AIMessage(content="It is 32 degrees Celsius in Recife."),
+                ]
+            )
+
+        @method_tool
+        def fetch_current_temperature(self, location: str) -> str:
+            """Fetch the current temperature data for a location"""
+            return "32 degrees Celsius"
+
+    thread = await Thread.objects.acreate(name="Recife Temperature Chat")
+    response = await AsyncTemperatureAssistant().arun(
+        "What is the temperature in Recife?", thread_id=thread.id
+    )
+
+    assert response == "It is 32 degrees Celsius in Recife."
+    stored_messages = await thread.aget_messages(include_extra_messages=True)
+    assert [m.type for m in stored_messages] == ["human", "ai", "tool", "ai"]
+    assert stored_messages[2].content == "32 degrees Celsius"
+
+    AIAssistant.get_cls_registry().pop(AsyncTemperatureAssistant.id)
+
+
+class SummarizingAssistant(AIAssistant):
+    id = "summarizing_assistant"  # noqa: A003
+    name = "Summarizing Assistant"
+    instructions = "You are a helpful assistant."
+    model = "gpt-4o"
+    history_summary_max_tokens = 4
+    history_summary_keep_tokens = 2
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.summarize_inputs = []
+
+    def get_llm(self):
+        return FakeToolCallingChatModel(
+            responses=[AIMessage(content=f"Hi {i}!") for i in range(1, 5)]
+        )
+
+    def get_num_tokens(self, messages):
+        return len(messages)
+
+    def get_summarize_chain(self):
+        def summarize(summarize_input):
+            self.summarize_inputs.append(summarize_input)
+            return f"Summary {len(self.summarize_inputs)}"
+
+        return RunnableLambda(summarize)
+
+
+def test_AIAssistant_update_thread_summary_folds_overflow(thread_with_tool_calls):
+    assistant = SummarizingAssistant()
+
+    assert assistant.update_thread_summary(thread_with_tool_calls)
+    assert not assistant.update_thread_summary(thread_with_tool_calls)
+
+    thread_with_tool_calls.refresh_from_db()
+    assert thread_with_tool_calls.summary == "Summary 1"
+    assert assistant.summarize_inputs[0]["summary"] == "(empty)"
+    assert assistant.summarize_inputs[0]["messages"].startswith(
+        "Human: What is the temperature today in Recife?"
+    )
+    assert [m.content for m in assistant.get_history_messages(thread_with_tool_calls)] == [
+        "What about tomorrow?",
+        "It will be 35 degrees Celsius.",
+    ]
+
+
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.asyncio
+async def test_AIAssistant_arun_with_history_summary():
+    thread = await Thread.objects.acreate(name="Long Chat")
+    assistant = SummarizingAssistant()
+    for i in range(1, 4):
+        await assistant.arun(f"Hello {i}", thread_id=thread.id)
+
+    response = await assistant.ainvoke({"input": "Hello 4"}, thread_id=thread.id)
+
+    assert [(m.type, m.content) for m in response["messages"]] == [
+        (
+            "system",
+            "You are a helpful assistant."
+            "\n\n---START OF CONVERSATION SUMMARY---\nSummary 1\n---END OF CONVERSATION SUMMARY---",
+        ),
+        ("human", "Hello 3"),
+        ("ai", "Hi 3!"),
+        ("human", "Hello 4"),
+        ("ai", "Hi 4!"),
+    ]
+    assert len(assistant.summarize_inputs) == 1
+    assert "Hello 2" in assistant.summarize_inputs[0]["messages"]
+    assert "Hello 3" not in assistant.summarize_inputs[0]["messages"]
+    assert len(await thread.aget_messages()) == 8
+
+
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.asyncio
+async def test_AIAssistant_arun_with_history_summary_in_background():
+    class BackgroundSummarizingAssistant(SummarizingAssistant):
+        id = "background_summarizing_assistant"  # noqa: A003
+        history_summary_in_background = True
+
+    thread = await Thread.objects.acreate(name="Long Chat")
+    assistant = BackgroundSummarizingAssistant()
+
+    with patch("django_ai_assistant.helpers.assistants._summary_executor") as summary_executor:
+        await assistant.arun("Hello", thread_id=thread.id)
+
+    summary_executor.submit.assert_called_once()
+    assert assistant.summarize_inputs == []
+
+    AIAssistant.get_cls_registry().pop(BackgroundSummarizingAssistant.id)
+
+
+class RunTrackingAssistant(AIAssistant):
+    id = "run_tracking_assistant"  # noqa: A003
+    name = "Run Tracking Assistant"
+    instructions = "You are a temperature bot."
+    model = "gpt-4o"
+
+    def get_llm(self):
+        return FakeToolCallingChatModel(
+            responses=[
+                AIMessage(
+                    content="",
+                    tool_calls=[
+                        {
+                            "name": "fetch_current_temperature",
+                            "args": {"location": "Recife"},
+                            "id": "call_1",
+                            "type": "tool_call",
+                        }
+                    ],
+                    usage_metadata={"input_tokens": 10, "output_tokens": 5, "total_tokens": 15},
+                ),
+                AIMessage(
+                    content="It is 32 degrees Celsius in Recife.",
+                    usage_metadata={"input_tokens": 20, "output_tokens": 8, "total_tokens": 28},
+                ),
+            ]
+        )
+
+    @method_tool
+    def fetch_current_temperature(self, location: str) -> str:
+        """Fetch the current temperature data for a location"""
+        return "32 degrees Celsius"
+
+
+@pytest.mark.django_db(transaction=True)
+def test_AIAssistant_invoke_records_run():
+    thread = Thread.objects.create(name="Temperature Chat")
+
+    RunTrackingAssistant().invoke({"input": "What is the temperature?"}, thread_id=thread.id)
+
+    run = Run.objects.get()
+    assert (run.thread, run.assistant_id, run.input) == (
+        thread,
+        "run_tracking_assistant",
+        "What is the temperature?",
+    )
+    assert run.status == Run.Status.SUCCEEDED
+    assert run.output == "It is 32 degrees Celsius in Recife."
+    assert run.started_at <= run.finished_at
+    assert [timing["node"] for timing in run.node_timings] == [
+        "setup",
+        "history",
+        "retriever",
+        "prompt",
+        "agent",
+        "tools",
+        "agent",
+        "respond",
+    ]
+    assert all(timing["duration_ms"] >= 0 for timing in run.node_timings)
+    assert [(call["id"], call["name"]) for call in run.tool_calls] == [
+        ("call_1", "fetch_current_temperature")
+    ]
+    assert run.token_usage == {"input_tokens": 30, "output_tokens": 13, "total_tokens": 43}
+    assert [
+        timing["token_usage"]["total_tokens"]
+        for timing in run.node_timings
+        if "token_usage" in timing
+    ] == [15, 28]
+
+
+@pytest.mark.django_db(transaction=True)
+def test_AIAssistant_invoke_records_run_in_two_writes():
+    thread = Thread.objects.create(name="Temperature Chat")
+    assistant = RunTrackingAssistant()
+
+    with patch.object(RunTrackingAssistant, "track_runs", False):
+        with CaptureQueriesContext(connection) as untracked:
+            assistant.invoke({"input": "What is the temperature?"}, thread_id=thread.id)
+    with CaptureQueriesContext(connection) as tracked:
+        assistant.invoke({"input": "What is the temperature?"}, thread_id=thread.id)
+
+    run_queries = [q["sql"] for q in tracked.captured_queries if "_run" in q["sql"]]
+    assert len(tracked) == len(untracked) + 2
+    assert [sql.split()[0] for sql in run_queries] == ["INSERT", "UPDATE"]
+    assert Run.objects.count() == 1
+
+
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.asyncio
+async def test_AIAssistant_ainvoke_records_failed_run():
+    class FailingAssistant(RunTrackingAssistant):
+        id = "failing_assistant"  # noqa: A003
+
+        def get_instructions(self):
+            raise ValueError("Instructions not available")
+
+    thread = await Thread.objects.acreate(name="Failing Chat")
+
+    with pytest.raises(ValueError):
+        await FailingAssistant().ainvoke({"input": "Hello"}, thread_id=thread.id)
+
+    run = await Run.objects.aget()
+    assert run.status == Run.Status.FAILED
+    assert run.error == "Instructions not available"
+    assert run.output is None
+    assert run.finished_at is not None
+
+    AIAssistant.get_cls_registry().pop(FailingAssistant.id)
+
+
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.asyncio
+async def test_AIAssistant_astream_events_records_run():
+    thread = await Thread.objects.acreate(name="Streaming Chat")
+
+    events = [
+        event
+        async for event in RunTrackingAssistant().astream_events(
+            "What is the temperature?", thread=thread
+        )
+    ]
+
+    run = await Run.objects.aget()
+    assert events[-1]["event"] == "message"
+    assert run.status == Run.Status.SUCCEEDED
+    assert run.output == "It is 32 degrees Celsius in Recife."
+    assert len(run.tool_calls) == 1
+
+
+def test_AIAssistant_invoke_without_thread_does_not_record_run():
+    response = RunTrackingAssistant().invoke({"input": "What is the temperature?"})
+
+    assert response["output"] == "It is 32 degrees Celsius in Recife."
+
+
+class QueryRecordingRetriever(BaseRetriever):
+    queries: List[str]
+
+    def _get_relevant_documents(self, query: str) -> List[Document]:
+        self.queries.append(query)
+        return [Document(page_content=f"About {query}"), Document(page_content="Recife")]
+
+
+class ContextualizingAssistant(AIAssistant):
+    id = "contextualizing_assistant"  # noqa: A003
+    name = "Contextualizing Assistant"
+    instructions = "You are a tour guide."
+    model = "gpt-4o"
+    has_rag = True
+    contextualize_policy = "auto"
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.retriever = QueryRecordingRetriever(queries=[])
+        self.contextualize_llm = FakeToolCallingChatModel(
+            responses=[
+                AIMessage(content="Weather in Recife tomorrow"),
+                AIMessage(content="Weather in Recife the day after tomorrow"),
+            ]
+        )
+
+    def get_retriever(self):
+        return self.retriever
+
+    def get_contextualize_llm(self):
+        return self.contextualize_llm
+
+
+CONTEXTUALIZE_HISTORY = [
+    HumanMessage(content="What is the weather in Recife?"),
+    AIMessage(content="It is sunny."),
+]
+
+
+@pytest.mark.parametrize(
+    ("policy", "input", "expected_query"),
+    [
+        ("auto", "What are the best beaches in Recife?", "What are the best beaches in Recife?"),
+        ("auto", "What about tomorrow?", "Weather in Recife tomorrow"),
+        ("auto", "Is it going to rain there this weekend?", "Weather in Recife tomorrow"),
+        ("always", "What are the best beaches in Recife?", "Weather in Recife tomorrow"),
+        ("never", "What about tomorrow?", "What about tomorrow?"),
+    ],
+)
+def test_AIAssistant_contextualize_policy(policy, input, expected_query):  # noqa: A002
+    assistant = ContextualizingAssistant()
+    assistant.contextualize_policy = policy
+
+    assistant.get_history_aware_retriever().invoke(
+        {"input": input, "history": CONTEXTUALIZE_HISTORY}
+    )
+
+    assert assistant.retriever.queries == [expected_query]
+
+
+def test_AIAssistant_contextualize_with_raw_input_merges_documents():
+    assistant = ContextualizingAssistant()
+    assistant.contextualize_with_raw_input = True
+
+    docs = assistant.get_history_aware_retriever().invoke(
+        {"input": "What about tomorrow?", "history": CONTEXTUALIZE_HISTORY}
+    )
+
+    assert sorted(assistant.retriever.queries) == [
+        "Weather in Recife tomorrow",
+        "What about tomorrow?",
+    ]
+    assert [doc.page_content for doc in docs] == [
+        "About Weather in Recife tomorrow",
+        "Recife",
+        "About What about tomorrow?",
+    ]
+
+
+@pytest.mark.asyncio
+async def test_AIAssistant_contextualize_cache_skips_repeated_rewrites(settings):
+    settings.AI_ASSISTANT_CONTEXTUALIZE_CACHE = "default"
+    cache.clear()
+    assistant = ContextualizingAssistant()
+    retriever_input = {"input": "What about tomorrow?", "history": CONTEXTUALIZE_HISTORY}
+
+    await assistant.get_history_aware_retriever().ainvoke(retriever_input)
+    await assistant.get_history_aware_retriever().ainvoke(retriever_input)
+
+    assert assistant.retriever.queries == ["Weather in Recife tomorrow"] * 2
+    cache.clear()
+
+
+class ConcurrentSetupAssistant(AIAssistant):
+    id = "concurrent_setup_assistant"  # noqa: A003
+    name = "Concurrent Setup Assistant"
+    instructions = "You are a tour guide."
+    model = "gpt-4o"
+    has_rag = True
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.retrieved = asyncio.Event()
+        self.contextualize_llm = FakeToolCallingChatModel(
+            responses=[AIMessage(content="Beaches in Recife")]
+        )
+
+    async def aget_instructions(self):
+        # Only finishes if the retriever runs concurrently:
+        await asyncio.wait_for(self.retrieved.wait(), timeout=5)
+        return self.instructions
+
+    def get_retriever(self):
+        assistant = self
+
+        class EventRetriever(QueryRecordingRetriever):
+            async def _aget_relevant_documents(self, query, **kwargs):
+                assistant.retrieved.set()
+                return self._get_relevant_documents(query)
+
+        return EventRetriever(queries=[])
+
+    def get_contextualize_llm(self):
+        return self.contextualize_llm
+
+    def get_llm(self):
+        return FakeToolCallingChatModel(responses=[AIMessage(content="Go to Boa Viagem.")])
+
+
+@pytest.mark.asyncio
+async def test_AIAssistant_ainvoke_runs_setup_and_retriever_concurrently():
+    assistant = ConcurrentSetupAssistant()
+
+    response = await assistant.ainvoke({"input": "Which beaches are in Recife?"})
+
+    assert response["output"] == "Go to Boa Viagem."
+    system_message = response["messages"][0]
+    assert system_message.content.startswith("You are a tour guide.")
+    assert "About Which beaches are in Recife?" in system_message.content
+
+
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.asyncio
+async def test_AIAssistant_ainvoke_runs_history_and_retriever_concurrently():
+    class ConcurrentHistoryAssistant(ConcurrentSetupAssistant):
+        id = "concurrent_history_assistant"  # noqa: A003
+        contextualize_policy = "never"
+        # The default `aget_instructions`, which doesn't wait for the ORM thread:
+        aget_instructions = AIAssistant.aget_instructions
+
+        async def aget_history_messages(self, thread):
+            # Only finishes if the retriever runs concurrently:
+            await asyncio.wait_for(self.retrieved.wait(), timeout=5)
+            return await super().aget_history_messages(thread)
+
+    thread = await Thread.objects.acreate(name="Beaches Chat")
+    await asave_django_messages(
+        [HumanMessage(content="Hi!"), AIMessage(content="Hello!")], thread=thread
+    )
+    assistant = ConcurrentHistoryAssistant()
+    assistant.track_runs = False
+
+    response = await assistant.ainvoke({"input": "Which beaches?"}, thread=thread)
+
+    assert response["messages"][0].content.startswith("You are a tour guide.")
+    assert "About Which beaches?" in response["messages"][0].content
+    assert [m.content for m in response["messages"][1:]] == [
+        "Hi!",
+        "Hello!",
+        "Which beaches?",
+        "Go to Boa Viagem.",
+    ]
+    AIAssistant.get_cls_registry().pop(ConcurrentHistoryAssistant.id)
+
+
+@pytest.mark.asyncio
+async def test_AIAssistant_aget_instructions_skips_thread_by_default():
+    class CustomInstructionsAssistant(ConcurrentSetupAssistant):
+        id = "custom_instructions_assistant"  # noqa: A003
+        aget_instructions = AIAssistant.aget_instructions
+
+        def get_instructions(self):
+            return "Custom"
+
+    with patch("django_ai_assistant.helpers.assistants.sync_to_async") as mock_sync_to_async:
+        assert await AIAssistant.aget_instructions(ConcurrentSetupAssistant()) == (
+            "You are a tour guide."
+        )
+        mock_sync_to_async.assert_not_called()
+    assert await CustomInstructionsAssistant().aget_instructions() == "Custom"
+    AIAssistant.get_cls_registry().pop(CustomInstructionsAssistant.id)
+
+
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.asyncio
+async def test_AIAssistant_ainvoke_retrieves_after_history_to_contextualize():
+    thread = await Thread.objects.acreate(name="Beaches Chat")
+    await asave_django_messages(
+        [HumanMessage(content="Hi!"), AIMessage(content="Hello!")], thread=thread
+    )
+    assistant = ConcurrentSetupAssistant()
+    assistant.track_runs = False
+    # The retriever waits for the history, so don't wait for it:
+    assistant.retrieved.set()
+
+    response = await assistant.ainvoke({"input": "Which beaches?"}, thread=thread)
+
+    assert "About Beaches in Recife" in response["messages"][0].content
+    assert [m.content for m in response["messages"][1:]] == [
+        "Hi!",
+        "Hello!",
+        "Which beaches?",
+        "Go to Boa Viagem.",
+    ]
+
+
 @patch("langchain_openai.ChatOpenAI")
 def test_AIAssistant_get_llm_default_temperature(mock_chat_openai):
     class DefaultTempAssistant(AIAssistant):
@@ -585,3 +1282,329 @@ def test_AIAssistant_typeddict_structured_output():
     assert result["title"] == "Shrek"
     assert result["year"] == 2001
     assert result["genres"] == ["Animation", "Comedy"]
+
+
+class Person(pydantic.BaseModel):
+    name: str
+    age: int
+
+
+class DirectStructuredOutputAssistant(AIAssistant):
+    id = "direct_structured_output_assistant"  # noqa: A003
+    name = "Direct Structured Output Assistant"
+    instructions = "You are a helpful assistant that provides information about people."
+    model = "gpt-4o"
+    structured_output = Person
+
+    def __init__(self, responses, **kwargs):
+        super().__init__(**kwargs)
+        self.responses = responses
+        self.structured_output_calls = []
+
+    def get_llm(self):
+        return FakeToolCallingChatModel(responses=self.responses)
+
+    def get_structured_output_llm(self):
+        def extra_call(messages):
+            self.structured_output_calls.append(messages)
+            return Person(name="John", age=30)
+
+        return RunnableLambda(extra_call)
+
+
+def final_answer_message(args):
+    return AIMessage(
+        content="",
+        tool_calls=[{"name": "final_answer", "args": args, "id": "call_9", "type": "tool_call"}],
+    )
+
+
+@pytest.mark.django_db(transaction=True)
+def test_AIAssistant_structured_output_tool_mode_skips_extra_call():
+    thread = Thread.objects.create(name="People Chat")
+    assistant = DirectStructuredOutputAssistant(
+        responses=[final_answer_message({"name": "John", "age": 30})]
+    )
+    assistant.structured_output_mode = "tool"
+
+    response = assistant.invoke({"input": "Tell me about John, 30."}, thread_id=thread.id)
+
+    assert response["output"] == Person(name="John", age=30)
+    assert assistant.structured_output_calls == []
+    # The final answer tool call is saved as a plain answer, without an unanswered tool call:
+    stored_messages = thread.get_messages(include_extra_messages=True)
+    assert [m.type for m in stored_messages] == ["human", "ai"]
+    assert stored_messages[1].content == '{"name": "John", "age": 30}'
+    assert not stored_messages[1].tool_calls
+    assert [m.id for m in response["messages"][1:]] == [m.id for m in stored_messages]
+
+
+@pytest.mark.asyncio
+async def test_AIAssistant_structured_output_native_mode_skips_extra_call():
+    assistant = DirectStructuredOutputAssistant(
+        responses=[AIMessage(content='{"name": "John", "age": 30}')]
+    )
+    assistant.structured_output_mode = "native"
+
+    response = await assistant.ainvoke({"input": "Tell me about John, 30."})
+
+    assert response["output"] == Person(name="John", age=30)
+    assert assistant.structured_output_calls == []
+
+
+@pytest.mark.parametrize(
+    ("mode", "final_message"),
+    [
+        ("tool", AIMessage(content="John is 30.")),
+        ("tool", final_answer_message({"name": "John"})),
+        ("native", AIMessage(content="John is 30.")),
+    ],
+)
+def test_AIAssistant_structured_output_falls_back_to_extra_call(mode, final_message):
+    assistant = DirectStructuredOutputAssistant(responses=[final_message])
+    assistant.structured_output_mode = mode
+
+    response = assistant.invoke({"input": "Tell me about John, 30."})
+
+    assert response["output"] == Person(name="John", age=30)
+    assert len(assistant.structured_output_calls) == 1
+    sent_messages = assistant.structured_output_calls[0]
+    assert not any(getattr(m, "tool_calls", None) for m in sent_messages)
+    assert sent_messages[-1].content == "Use the chat history to produce a JSON output."
+    assert [m.type for m in response["messages"][-2:]] == ["ai", "human"]
+
+
+@pytest.mark.django_db(transaction=True)
+def test_AIAssistant_structured_output_extra_call_saves_json_request():
+    thread = Thread.objects.create(name="People Chat")
+    assistant = DirectStructuredOutputAssistant(responses=[AIMessage(content="John is 30.")])
+
+    response = assistant.invoke({"input": "Tell me about John, 30."}, thread_id=thread.id)
+
+    assert response["output"] == Person(name="John", age=30)
+    stored_messages = thread.get_messages(include_extra_messages=True)
+    assert [(m.type, m.content) for m in stored_messages] == [
+        ("human", "Tell me about John, 30."),
+        ("ai", "John is 30."),
+        ("human", "Use the chat history to produce a JSON output."),
+    ]
+    assert [m.id for m in response["messages"][1:]] == [m.id for m in stored_messages]
+
+
+class StreamingFakeChatModel(FakeToolCallingChatModel):
+    chunk_size: int = 8
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        message = self.responses[self.i]
+        self.i = (self.i + 1) % len(self.responses)
+        text = message.content or (json.dumps(message.tool_calls[0]["args"]))
+        for start in range(0, len(text), self.chunk_size):
+            piece = text[start : start + self.chunk_size]
+            if message.content:
+                chunk = AIMessageChunk(content=piece)
+            else:
+                tool_call = message.tool_calls[0]
+                chunk = AIMessageChunk(
+                    content="",
+                    tool_call_chunks=[
+                        {
+                            "name": tool_call["name"] if start == 0 else None,
+                            "args": piece,
+                            "id": tool_call["id"] if start == 0 else None,
+                            "index": 0,
+                        }
+                    ],
+                )
+            if run_manager:
+                run_manager.on_llm_new_token(piece, chunk=ChatGenerationChunk(message=chunk))
+            yield ChatGenerationChunk(message=chunk)
+
+
+class Attraction(pydantic.BaseModel):
+    name: str
+
+
+class Attractions(pydantic.BaseModel):
+    nearby_attractions: List[Attraction]
+
+
+class StreamingStructuredOutputAssistant(AIAssistant):
+    id = "streaming_structured_output_assistant"  # noqa: A003
+    name = "Streaming Structured Output Assistant"
+    instructions = "You are a tour guide assistant."
+    model = "gpt-4o"
+    structured_output = Attractions
+
+    def __init__(self, response, **kwargs):
+        super().__init__(**kwargs)
+        self.response = response
+
+    def get_llm(self):
+        return StreamingFakeChatModel(responses=[self.response])
+
+    def get_structured_output_llm(self):
+        return StreamingFakeChatModel(responses=[self.response]) | JsonOutputParser()
+
+
+ATTRACTIONS_JSON = '{"nearby_attractions": [{"name": "Central Park"}, {"name": "The Met"}]}'
+
+
+@pytest.mark.parametrize(
+    ("mode", "response"),
+    [
+        ("extra_call", AIMessage(content=ATTRACTIONS_JSON)),
+        ("native", AIMessage(content=ATTRACTIONS_JSON)),
+        ("tool", final_answer_message(json.loads(ATTRACTIONS_JSON))),
+    ],
+)
+@pytest.mark.asyncio
+async def test_AIAssistant_astream_structured_yields_partial_outputs(mode, response):
+    assistant = StreamingStructuredOutputAssistant(response=response)
+    assistant.structured_output_mode = mode
+
+    outputs = [output async for output in assistant.astream_structured("What to see in NYC?")]
+
+    assert outputs[-1] == json.loads(ATTRACTIONS_JSON)
+    # Each attraction is yielded before the whole output is generated:
+    assert {"nearby_attractions": [{"name": "Central Park"}]} in outputs
+    assert len(outputs) > 3
+    assert all(isinstance(output, dict) for output in outputs)
+    assert all(a != b for a, b in itertools.pairwise(outputs))
+
+
+@pytest.mark.asyncio
+async def test_AIAssistant_astream_structured_raises_without_structured_output():
+    class NoStructuredOutputAssistant(AIAssistant):
+        id = "no_structured_output_assistant"  # noqa: A003
+        name = "No Structured Output Assistant"
+        instructions = "You are a helpful assistant."
+        model = "gpt-4o"
+
+    with pytest.raises(ValueError, match="structured_output is not defined"):
+        async for _ in NoStructuredOutputAssistant().astream_structured("Hello"):
+            pass
+
+    AIAssistant.get_cls_registry().pop(NoStructuredOutputAssistant.id)
+
+
+def tool_calls_message(*calls):
+    return AIMessage(
+        content="",
+        tool_calls=[
+            {"name": name, "args": args, "id": f"call_{i}", "type": "tool_call"}
+            for i, (name, args) in enumerate(calls)
+        ],
+    )
+
+
+class AsyncToolsAssistant(AIAssistant):
+    id = "async_tools_assistant"  # noqa: A003
+    name = "Async Tools Assistant"
+    instructions = "You are a weather bot."
+    model = "gpt-4o"
+
+    def __init__(self, responses, **kwargs):
+        super().__init__(**kwargs)
+        self.responses = responses
+        self.running = 0
+        self.max_running = 0
+
+    def get_llm(self):
+        return FakeToolCallingChatModel(responses=self.responses)
+
+    @method_tool
+    async def fetch_current_weather(self, location: str) -> str:
+        """Fetch the current weather data for a location"""
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        await asyncio.sleep(0.05)
+        self.running -= 1
+        return f"Sunny in {location}"
+
+    @method_tool(timeout=0.05)
+    async def fetch_forecast_weather(self, location: str) -> str:
+        """Fetch the forecast weather data for a location"""
+        await asyncio.sleep(5)
+        return f"Rainy in {location}"
+
+    @method_tool
+    def fetch_weather_alerts(self, location: str) -> str:
+        """Fetch the weather alerts for a location"""
+        time.sleep(0.5)
+        return f"No alerts in {location}"
+
+
+@pytest.mark.parametrize("tool_max_concurrency", [1, 3])
+@pytest.mark.asyncio
+async def test_AIAssistant_ainvoke_runs_async_tools_concurrently(tool_max_concurrency):
+    assistant = AsyncToolsAssistant(
+        responses=[
+            tool_calls_message(
+                *[("fetch_current_weather", {"location": loc}) for loc in ["A", "B", "C"]]
+            ),
+            AIMessage(content="It's sunny everywhere."),
+        ]
+    )
+    assistant.tool_max_concurrency = tool_max_concurrency
+
+    response = await assistant.ainvoke({"input": "What's the weather in A, B, and C?"})
+
+    assert [m.content for m in response["messages"] if m.type == "tool"] == [
+        "Sunny in A",
+        "Sunny in B",
+        "Sunny in C",
+    ]
+    assert assistant.max_running == tool_max_concurrency
+
+
+def test_AIAssistant_invoke_runs_async_tools():
+    assistant = AsyncToolsAssistant(
+        responses=[
+            tool_calls_message(("fetch_current_weather", {"location": "Recife"})),
+            AIMessage(content="It's sunny in Recife."),
+        ]
+    )
+
+    response = assistant.invoke({"input": "What's the weather in Recife?"})
+
+    assert response["messages"][-2].content == "Sunny in Recife"
+    assert response["output"] == "It's sunny in Recife."
+
+
+@pytest.mark.asyncio
+async def test_AIAssistant_ainvoke_times_out_tools():
+    assistant = AsyncToolsAssistant(
+        responses=[
+            tool_calls_message(
+                ("fetch_forecast_weather", {"location": "Recife"}),
+                ("fetch_current_weather", {"location": "Recife"}),
+            ),
+            AIMessage(content="It's sunny in Recife, the forecast is unavailable."),
+        ]
+    )
+
+    response = await asyncio.wait_for(
+        assistant.ainvoke({"input": "What's the weather in Recife?"}), timeout=2
+    )
+
+    forecast_message, weather_message = (m for m in response["messages"] if m.type == "tool")
+    assert forecast_message.content == "Error: The call timed out after 0.05 seconds"
+    assert forecast_message.status == "error"
+    assert weather_message.content == "Sunny in Recife"
+    assert response["output"] == "It's sunny in Recife, the forecast is unavailable."
+
+
+def test_AIAssistant_invoke_times_out_sync_tools():
+    assistant = AsyncToolsAssistant(
+        responses=[
+            tool_calls_message(("fetch_weather_alerts", {"location": "Recife"})),
+            AIMessage(content="The alerts are unavailable."),
+        ]
+    )
+    assistant.tool_timeout = 0.05
+
+    started_at = time.monotonic()
+    response = assistant.invoke({"input": "Are there weather alerts in Recife?"})
+
+    assert time.monotonic() - started_at < 0.4
+    assert response["messages"][-2].content == "Error: The call timed out after 0.05 seconds"
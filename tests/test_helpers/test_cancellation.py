@@ -0,0 +1,189 @@
+import asyncio
+from unittest.mock import patch
+
+from django.utils import timezone
+
+import pytest
+from langchain_core.messages import AIMessage
+from model_bakery import baker
+
+from django_ai_assistant.exceptions import AIRunCancelledError
+from django_ai_assistant.helpers.assistants import AIAssistant
+from django_ai_assistant.helpers.cancellation import CancelToken, RunCancelToken
+from django_ai_assistant.helpers.runs import process_run
+from django_ai_assistant.langchain.tools import method_tool
+from django_ai_assistant.models import Run, Thread
+from tests.utils import FakeToolCallingChatModel
+
+
+@pytest.fixture
+def cancellable_assistant_cls():
+    class CancellableAssistant(AIAssistant):
+        id = "cancellable_assistant"  # noqa: A003
+        name = "Cancellable Assistant"
+        instructions = "You are a temperature bot."
+        model = "gpt-4o"
+
+        def __init__(self, cancel_token=None, **kwargs):
+            super().__init__(**kwargs)
+            self.cancel_token = cancel_token
+
+        def get_llm(self):
+            return FakeToolCallingChatModel(
+                responses=[
+                    AIMessage(
+                        content="",
+                        tool_calls=[
+                            {
+                                "name": "fetch_current_temperature",
+                                "args": {"location": "Recife"},
+                                "id": "call_1",
+                                "type": "tool_call",
+                            }
+                        ],
+                    ),
+                    AIMessage(content="It is 32 degrees Celsius in Recife."),
+                ]
+            )
+
+        @method_tool
+        def fetch_current_temperature(self, location: str) -> str:
+            """Fetch the current temperature data for a location"""
+            # Like a user cancelling the run while the tool runs:
+            if self.cancel_token is not None:
+                self.cancel_token.cancel()
+            return "32 degrees Celsius"
+
+    yield CancellableAssistant
+
+    AIAssistant.get_cls_registry().pop(CancellableAssistant.id)
+
+
+@pytest.mark.django_db(transaction=True)
+def test_AIAssistant_invoke_stops_between_nodes_when_cancelled(cancellable_assistant_cls):
+    thread = baker.make(Thread)
+    cancel_token = CancelToken()
+    assistant = cancellable_assistant_cls(cancel_token=cancel_token)
+
+    with pytest.raises(AIRunCancelledError):
+        assistant.invoke(
+            {"input": "What is the temperature in Recife?"},
+            thread_id=thread.id,
+            cancel_token=cancel_token,
+        )
+
+    run = Run.objects.get()
+    assert run.status == Run.Status.CANCELLED
+    assert [timing["node"] for timing in run.node_timings][-1] == "tools"
+    # The completed messages are saved, including the tool call and its result:
+    assert [m.type for m in thread.get_messages(include_extra_messages=True)] == [
+        "human",
+        "ai",
+        "tool",
+    ]
+
+
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.asyncio
+async def test_AIAssistant_ainvoke_aborts_in_flight_llm_call_when_cancelled():
+    started = asyncio.Event()
+
+    class SlowChatModel(FakeToolCallingChatModel):
+        async def _agenerate(self, *args, **kwargs):
+            started.set()
+            await asyncio.sleep(60)
+            return await super()._agenerate(*args, **kwargs)
+
+    class SlowAssistant(AIAssistant):
+        id = "slow_assistant"  # noqa: A003
+        name = "Slow Assistant"
+        instructions = "You are a slow bot."
+        model = "gpt-4o"
+
+        def get_llm(self):
+            return SlowChatModel(responses=[AIMessage(content="Hi!")])
+
+    thread = await Thread.objects.acreate(name="Slow Chat")
+    cancel_token = CancelToken()
+    task = asyncio.ensure_future(
+        SlowAssistant().ainvoke({"input": "Hello"}, thread_id=thread.id, cancel_token=cancel_token)
+    )
+    await asyncio.wait_for(started.wait(), timeout=5)
+
+    cancel_token.cancel()
+
+    with pytest.raises(AIRunCancelledError):
+        await asyncio.wait_for(task, timeout=5)
+    run = await Run.objects.aget()
+    assert run.status == Run.Status.CANCELLED
+    assert [m.content for m in await thread.aget_messages()] == ["Hello"]
+
+    AIAssistant.get_cls_registry().pop(SlowAssistant.id)
+
+
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.asyncio
+async def test_AIAssistant_astream_events_stops_when_cancelled(cancellable_assistant_cls):
+    thread = await Thread.objects.acreate(name="Streaming Chat")
+    cancel_token = CancelToken()
+    assistant = cancellable_assistant_cls(cancel_token=cancel_token)
+    events = []
+
+    with pytest.raises(AIRunCancelledError):
+        async for event in assistant.astream_events(
+            "What is the temperature in Recife?", thread=thread, cancel_token=cancel_token
+        ):
+            events.append(event["event"])
+
+    assert events == ["tool_call_start", "tool_call_end"]
+    stored_messages = await thread.aget_messages(include_extra_messages=True)
+    assert [m.type for m in stored_messages] == ["human", "ai", "tool"]
+
+
+@pytest.mark.django_db()
+def test_RunCancelToken_reads_shared_flag():
+    run = baker.make(Run, status=Run.Status.RUNNING)
+    cancel_token = RunCancelToken(run.id, check_interval=0)
+
+    assert not cancel_token.is_cancelled()
+
+    Run.objects.filter(id=run.id).update(cancel_requested_at=timezone.now())
+
+    assert cancel_token.is_cancelled()
+
+
+@pytest.mark.django_db()
+def test_RunCancelToken_throttles_checks(django_assert_num_queries):
+    run = baker.make(Run, status=Run.Status.RUNNING, cancel_requested_at=timezone.now())
+    cancel_token = RunCancelToken(run.id, check_interval=60)
+
+    with django_assert_num_queries(0):
+        assert not cancel_token.is_cancelled()
+
+
+@pytest.mark.django_db()
+def test_AIAssistant_invoke_doesnt_poll_run_by_default(cancellable_assistant_cls):
+    thread = baker.make(Thread)
+    assistant = cancellable_assistant_cls()
+
+    with patch.object(RunCancelToken, "is_cancelled") as mock_is_cancelled:
+        assistant.invoke({"input": "What is the temperature in Recife?"}, thread_id=thread.id)
+
+    mock_is_cancelled.assert_not_called()
+    assert Run.objects.get().status == Run.Status.SUCCEEDED
+
+
+@pytest.mark.django_db()
+def test_process_run_can_be_cancelled_with_cancel_run(cancellable_assistant_cls):
+    thread = baker.make(Thread)
+    run = baker.make(Run, thread=thread, assistant_id="cancellable_assistant", input="Recife?")
+
+    # Like `cancel_run` called while the run is running:
+    with patch.object(RunCancelToken, "check_interval", 0):
+        with patch.object(
+            RunCancelToken, "_get_cancelled_queryset", return_value=Run.objects.all()
+        ):
+            process_run(run)
+
+    run.refresh_from_db()
+    assert run.status == Run.Status.CANCELLED
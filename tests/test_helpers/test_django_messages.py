@@ -1,14 +1,19 @@
+from itertools import count
 from unittest.mock import patch
 
 from django.contrib.auth.models import User
 from django.db import connection, connections
 from django.db.backends.sqlite3.features import DatabaseFeatures
+from django.test.utils import CaptureQueriesContext
 
 import pytest
-from langchain_core.messages import HumanMessage
+from langchain_core.messages import AIMessage, HumanMessage
 from model_bakery import baker
 
-from django_ai_assistant.helpers.django_messages import save_django_messages
+from django_ai_assistant.helpers.django_messages import (
+    asave_django_messages,
+    save_django_messages,
+)
 from django_ai_assistant.models import Message, Thread
 
 
@@ -50,3 +55,127 @@ def test_django_messages_with_can_return_rows_from_bulk_insert_false():
     mock_bulk_create.assert_not_called()
     assert Message.objects.count() == 1
     assert Message.objects.first().message["data"]["content"] == "Hello"
+
+
+@pytest.mark.parametrize("can_return_rows_from_bulk_insert", [True, False])
+@pytest.mark.django_db()
+def test_save_django_messages_sets_denormalized_fields(can_return_rows_from_bulk_insert):
+    class MockFeatures(DatabaseFeatures):
+        pass
+
+    MockFeatures.can_return_rows_from_bulk_insert = can_return_rows_from_bulk_insert
+    mock_features = MockFeatures(connections[Message.objects.db])
+
+    thread = baker.make(Thread, created_by=baker.make(User))
+    with patch.object(connection, "features", mock_features):
+        save_django_messages(
+            [
+                HumanMessage(content=[{"type": "text", "text": "Hello"}]),
+                AIMessage(content="", tool_calls=[{"name": "greet", "args": {}, "id": "call_1"}]),
+                AIMessage(content="Hi!"),
+            ],
+            thread=thread,
+        )
+
+    assert list(Message.objects.values_list("type", "has_tool_calls", "content")) == [
+        ("human", False, "Hello"),
+        ("ai", True, ""),
+        ("ai", False, "Hi!"),
+    ]
+
+
+@pytest.mark.django_db()
+def test_message_save_sets_denormalized_fields():
+    message = baker.make(
+        Message, message={"type": "ai", "data": {"content": "Hi!", "tool_calls": []}}
+    )
+    message.message = {"type": "human", "data": {"content": "Hello"}}
+    message.save(update_fields=["message"])
+    message.refresh_from_db()
+
+    assert (message.type, message.has_tool_calls, message.content) == ("human", False, "Hello")
+
+
+@pytest.mark.django_db()
+def test_save_django_messages_only_inserts_new_messages():
+    thread = baker.make(Thread, created_by=baker.make(User))
+    save_django_messages([HumanMessage(content="Hello")], thread=thread)
+
+    with CaptureQueriesContext(connection) as ctx:
+        save_django_messages(
+            [AIMessage(content="Hi!"), HumanMessage(content="How are you?")], thread=thread
+        )
+
+    # A bulk insert, and a bulk update to store the Django IDs in the messages, without reads:
+    assert [
+        q["sql"].split()[0]
+        for q in ctx.captured_queries
+        if q["sql"].startswith(("SELECT", "INSERT", "UPDATE"))
+    ] == ["INSERT", "UPDATE"]
+    assert [m.message["data"]["content"] for m in Message.objects.order_by("created_at")] == [
+        "Hello",
+        "Hi!",
+        "How are you?",
+    ]
+    assert [m.message["data"]["id"] for m in Message.objects.order_by("created_at")] == [
+        str(m.id) for m in Message.objects.order_by("created_at")
+    ]
+
+
+@pytest.mark.django_db()
+def test_save_django_messages_with_pks_before_insert_writes_once():
+    thread = baker.make(Thread, created_by=baker.make(User))
+    messages = [HumanMessage(content="Hello"), AIMessage(content="Hi!")]
+
+    with patch.object(Message._meta.pk, "get_default", side_effect=count(1000).__next__):
+        with patch.object(
+            Message.objects,
+            "bulk_update",
+            wraps=Message.objects.bulk_update,
+        ) as mock_bulk_update:
+            save_django_messages(messages, thread=thread)
+
+    mock_bulk_update.assert_not_called()
+    assert [m.id for m in messages] == ["1000", "1001"]
+    assert [m.message["data"]["id"] for m in Message.objects.order_by("created_at")] == [
+        "1000",
+        "1001",
+    ]
+
+
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.asyncio
+async def test_asave_django_messages():
+    thread = await Thread.objects.acreate(name="Async Thread")
+    messages = [HumanMessage(content="Hello"), AIMessage(content="Hi!")]
+
+    await asave_django_messages(messages, thread=thread)
+
+    stored_messages = [m async for m in Message.objects.order_by("created_at")]
+    assert [m.id for m in messages] == [str(m.pk) for m in stored_messages]
+    assert [m.message["data"]["content"] for m in stored_messages] == ["Hello", "Hi!"]
+    assert [m.message["data"]["id"] for m in stored_messages] == [
+        str(m.pk) for m in stored_messages
+    ]
+
+
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.asyncio
+async def test_asave_django_messages_with_pks_before_insert_uses_async_bulk_insert():
+    thread = await Thread.objects.acreate(name="Async Thread")
+    messages = [HumanMessage(content="Hello"), AIMessage(content="Hi!")]
+
+    with patch.object(Message._meta.pk, "get_default", side_effect=count(1000).__next__):
+        with patch.object(
+            Message.objects,
+            "abulk_create",
+            wraps=Message.objects.abulk_create,
+        ) as mock_abulk_create:
+            await asave_django_messages(messages, thread=thread)
+
+    mock_abulk_create.assert_called_once()
+    assert [m.id for m in messages] == ["1000", "1001"]
+    assert [m.message["data"]["id"] async for m in Message.objects.order_by("created_at")] == [
+        "1000",
+        "1001",
+    ]
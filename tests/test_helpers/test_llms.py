@@ -0,0 +1,77 @@
+from unittest.mock import MagicMock
+
+import pytest
+
+from django_ai_assistant.helpers import llms
+from django_ai_assistant.helpers.llms import clear_llm_registry, get_shared_llm
+
+
+@pytest.fixture(autouse=True)
+def clear_registry():
+    clear_llm_registry()
+    yield
+    clear_llm_registry()
+
+
+def get_pool_kwargs(provider, **kwargs):
+    return {"max_retries": 5} if provider == "openai" else {}
+
+
+def test_get_shared_llm_reuses_instance_for_same_key():
+    llm_class = MagicMock()
+
+    llm_a = get_shared_llm(llm_class, "openai", model="gpt-test", temperature=1.0, model_kwargs={})
+    llm_b = get_shared_llm(llm_class, "openai", model="gpt-test", temperature=1.0, model_kwargs={})
+
+    assert llm_a is llm_b
+    llm_class.assert_called_once_with(model="gpt-test", temperature=1.0, model_kwargs={})
+
+
+def test_get_shared_llm_creates_instance_for_different_key():
+    llm_class = MagicMock(side_effect=lambda **kwargs: object())
+
+    llm_a = get_shared_llm(llm_class, "openai", model="gpt-test", temperature=1.0, model_kwargs={})
+    llm_b = get_shared_llm(llm_class, "openai", model="gpt-test", temperature=0.5, model_kwargs={})
+    llm_c = get_shared_llm(
+        llm_class, "openai", model="gpt-test", temperature=1.0, model_kwargs={"top_p": 0.5}
+    )
+
+    assert len({id(llm_a), id(llm_b), id(llm_c)}) == 3
+    assert llm_class.call_count == 3
+
+
+def test_get_shared_llm_uses_client_kwargs_fn(settings):
+    settings.AI_ASSISTANT_LLM_CLIENT_KWARGS_FN = "tests.test_helpers.test_llms.get_pool_kwargs"
+    llm_class = MagicMock()
+
+    get_shared_llm(llm_class, "openai", model="gpt-test", model_kwargs={})
+    get_shared_llm(llm_class, "openai", model="gpt-test", model_kwargs={})
+
+    llm_class.assert_called_once_with(model="gpt-test", model_kwargs={}, max_retries=5)
+
+
+def test_get_shared_llm_does_not_share_non_serializable_kwargs():
+    llm_class = MagicMock(side_effect=lambda **kwargs: object())
+    callback = object()
+
+    llm_a = get_shared_llm(llm_class, "openai", model="gpt-test", model_kwargs={"cb": callback})
+    llm_b = get_shared_llm(llm_class, "openai", model="gpt-test", model_kwargs={"cb": callback})
+
+    assert llm_a is not llm_b
+    assert len(llms._llm_registry) == 0
+
+
+def test_get_shared_llm_drops_least_recently_used(monkeypatch):
+    monkeypatch.setattr(llms, "MAX_SHARED_LLMS", 2)
+    llm_class = MagicMock(side_effect=lambda **kwargs: object())
+
+    llm_a = get_shared_llm(llm_class, "openai", model="gpt-a")
+    get_shared_llm(llm_class, "openai", model="gpt-b")
+    assert get_shared_llm(llm_class, "openai", model="gpt-a") is llm_a
+    get_shared_llm(llm_class, "openai", model="gpt-c")
+
+    assert len(llms._llm_registry) == 2
+    assert get_shared_llm(llm_class, "openai", model="gpt-a") is llm_a
+    # "gpt-b" was dropped, so it's created again:
+    get_shared_llm(llm_class, "openai", model="gpt-b")
+    assert llm_class.call_count == 4
@@ -0,0 +1,137 @@
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+from model_bakery import baker
+
+from django_ai_assistant.helpers import messages_cache as messages_cache_module
+from django_ai_assistant.helpers import use_cases
+from django_ai_assistant.helpers.django_messages import (
+    asave_django_messages,
+    save_django_messages,
+)
+from django_ai_assistant.models import Message, Thread
+
+
+@pytest.fixture(autouse=True)
+def messages_cache(settings):
+    settings.AI_ASSISTANT_MESSAGES_CACHE = "default"
+    cache.clear()
+    yield cache
+    cache.clear()
+
+
+@pytest.mark.django_db(transaction=True)
+def test_get_messages_hits_cache_and_loads_only_new_messages(django_assert_num_queries):
+    thread = baker.make(Thread)
+    save_django_messages([HumanMessage(content="Hello"), AIMessage(content="Hi!")], thread=thread)
+    assert [m.content for m in thread.get_messages()] == ["Hello", "Hi!"]
+
+    with django_assert_num_queries(0):
+        assert [m.content for m in thread.get_messages()] == ["Hello", "Hi!"]
+
+    save_django_messages([HumanMessage(content="Bye")], thread=thread)
+    with django_assert_num_queries(1) as captured:
+        messages = thread.get_messages()
+
+    assert [m.content for m in messages] == ["Hello", "Hi!", "Bye"]
+    assert '"created_at" >' in captured.captured_queries[0]["sql"]
+
+
+@pytest.mark.django_db(transaction=True)
+def test_get_messages_reloads_messages_committed_late():
+    thread = baker.make(Thread)
+    messages = save_django_messages(
+        [HumanMessage(content="Hello"), AIMessage(content="Hi!")], thread=thread
+    )
+    Message.objects.filter(id=messages[0].id).update(
+        created_at=messages[1].created_at - timedelta(seconds=2)
+    )
+    assert [m.content for m in thread.get_messages()] == ["Hello", "Hi!"]
+
+    # Like a message created before "Hi!", but committed by a concurrent transaction after it:
+    late_messages = save_django_messages([HumanMessage(content="Hey")], thread=thread)
+    Message.objects.filter(id=late_messages[0].id).update(
+        created_at=messages[1].created_at - timedelta(seconds=1)
+    )
+    assert [m.content for m in thread.get_messages()] == ["Hello", "Hey", "Hi!"]
+
+
+@pytest.mark.django_db(transaction=True)
+def test_get_messages_from_cache_filters_and_limits_messages():
+    thread = baker.make(Thread)
+    save_django_messages(
+        [
+            HumanMessage(content="What's the temperature?"),
+            AIMessage(
+                content="",
+                tool_calls=[{"name": "fetch_current_temperature", "args": {}, "id": "call_1"}],
+            ),
+            ToolMessage(content="32 degrees Celsius", tool_call_id="call_1"),
+            AIMessage(content="It's 32 degrees Celsius."),
+        ],
+        thread=thread,
+    )
+
+    assert [m.content for m in thread.get_messages()] == [
+        "What's the temperature?",
+        "It's 32 degrees Celsius.",
+    ]
+    assert len(thread.get_messages(include_extra_messages=True)) == 4
+    assert [m.content for m in thread.get_messages(include_extra_messages=True, last_n=2)] == [
+        "32 degrees Celsius",
+        "It's 32 degrees Celsius.",
+    ]
+
+
+@pytest.mark.django_db(transaction=True)
+def test_get_messages_caches_only_most_recent_messages(monkeypatch, django_assert_num_queries):
+    monkeypatch.setattr(messages_cache_module, "MAX_CACHED_MESSAGES", 3)
+    thread = baker.make(Thread)
+    save_django_messages([HumanMessage(content=str(i)) for i in range(5)], thread=thread)
+
+    with django_assert_num_queries(1) as captured:
+        assert [m.content for m in thread.get_messages(last_n=2)] == ["3", "4"]
+    assert "LIMIT 3" in captured.captured_queries[0]["sql"]
+    with django_assert_num_queries(0):
+        assert [m.content for m in thread.get_messages(last_n=3)] == ["2", "3", "4"]
+
+    # Older messages than the cached ones are loaded from the database:
+    with django_assert_num_queries(1):
+        assert [m.content for m in thread.get_messages(last_n=4)] == ["1", "2", "3", "4"]
+    with django_assert_num_queries(1):
+        assert [m.content for m in thread.get_messages()] == ["0", "1", "2", "3", "4"]
+
+    save_django_messages([HumanMessage(content="5")], thread=thread)
+    assert [m.content for m in thread.get_messages(last_n=3)] == ["3", "4", "5"]
+    entry = cache.get(f"{messages_cache_module.KEY_PREFIX}:{thread.id}")
+    assert [m.content for m in entry["messages"]] == ["3", "4", "5"]
+
+
+@pytest.mark.django_db(transaction=True)
+def test_delete_message_invalidates_cache():
+    user = baker.make(User)
+    thread = baker.make(Thread, created_by=user)
+    messages = save_django_messages(
+        [HumanMessage(content="Hello"), AIMessage(content="Hi!")], thread=thread
+    )
+    thread.get_messages()
+
+    use_cases.delete_message(messages[1], user)
+
+    assert [m.content for m in thread.get_messages()] == ["Hello"]
+
+
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.asyncio
+async def test_aget_messages_loads_only_new_messages():
+    thread = await Thread.objects.acreate(name="Cached Thread")
+    await asave_django_messages([HumanMessage(content="Hello")], thread=thread)
+    assert [m.content for m in await thread.aget_messages()] == ["Hello"]
+
+    await asave_django_messages([AIMessage(content="Hi!")], thread=thread)
+
+    assert [m.content for m in await thread.aget_messages()] == ["Hello", "Hi!"]
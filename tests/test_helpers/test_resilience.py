@@ -0,0 +1,355 @@
+import asyncio
+import threading
+import time
+from unittest.mock import patch
+
+from django.core.cache import cache
+
+import pytest
+from langchain_core.messages import AIMessage
+from model_bakery import baker
+
+from django_ai_assistant.exceptions import AICircuitOpenError, AIRunTimeoutError
+from django_ai_assistant.helpers import resilience
+from django_ai_assistant.helpers.assistants import AIAssistant
+from django_ai_assistant.helpers.resilience import (
+    CircuitBreaker,
+    RetryPolicy,
+    acall_with_resilience,
+    call_with_resilience,
+    call_with_timeout,
+    is_retryable_error,
+)
+from django_ai_assistant.langchain.tools import method_tool
+from django_ai_assistant.models import Run, Thread
+from tests.utils import FakeToolCallingChatModel
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    cache.clear()
+    yield
+    cache.clear()
+
+
+class FlakyCall:
+    def __init__(self, errors, result="OK"):
+        self.errors = list(errors)
+        self.result = result
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return self.result
+
+
+class RateLimitError(Exception):
+    status_code = 429
+
+
+class BadRequestError(Exception):
+    status_code = 400
+
+
+class APITimeoutError(Exception):
+    pass
+
+
+@pytest.mark.parametrize(
+    ("error", "expected"),
+    [
+        (TimeoutError(), True),
+        (ConnectionResetError(), True),
+        (RateLimitError(), True),
+        (APITimeoutError(), True),
+        (BadRequestError(), False),
+        (ValueError(), False),
+    ],
+)
+def test_is_retryable_error(error, expected):
+    assert is_retryable_error(error) is expected
+
+
+def test_call_with_resilience_retries_retryable_errors():
+    call = FlakyCall([TimeoutError(), RateLimitError()])
+
+    result = call_with_resilience(call, retry=RetryPolicy(attempts=3, backoff=0))
+
+    assert result == "OK"
+    assert call.calls == 3
+
+
+def test_call_with_resilience_does_not_retry_other_errors():
+    call = FlakyCall([BadRequestError()])
+
+    with pytest.raises(BadRequestError):
+        call_with_resilience(call, retry=RetryPolicy(attempts=3, backoff=0))
+
+    assert call.calls == 1
+
+
+def test_RetryPolicy_get_delay_backs_off_with_jitter():
+    retry = RetryPolicy(backoff=1, max_backoff=3, jitter=False)
+    jittered_retry = RetryPolicy(backoff=1, max_backoff=3)
+
+    assert [retry.get_delay(attempt) for attempt in [1, 2, 3]] == [1, 2, 3]
+    assert all(0 <= jittered_retry.get_delay(3) <= 3 for _ in range(10))
+
+
+def test_CircuitBreaker_opens_after_failures_and_closes_after_success():
+    circuit_breaker = CircuitBreaker("weatherapi", failure_threshold=2)
+    call = FlakyCall([ConnectionError(), ConnectionError()])
+
+    for _ in range(2):
+        with pytest.raises(ConnectionError):
+            call_with_resilience(call, circuit_breaker=circuit_breaker)
+    with pytest.raises(AICircuitOpenError, match="The circuit breaker 'weatherapi' is open"):
+        call_with_resilience(call, circuit_breaker=circuit_breaker)
+    assert call.calls == 2
+
+    # Like after `reset_timeout`, in any worker sharing the cache:
+    cache.delete("django_ai_assistant:circuit_breaker:weatherapi:open")
+    assert call_with_resilience(call, circuit_breaker=circuit_breaker) == "OK"
+    assert cache.get("django_ai_assistant:circuit_breaker:weatherapi:failures") is None
+    assert call_with_resilience(call, circuit_breaker=circuit_breaker) == "OK"
+
+
+def test_CircuitBreaker_lets_a_single_probe_through_when_half_open():
+    circuit_breaker = CircuitBreaker("weatherapi", failure_threshold=1)
+    circuit_breaker.record_failure()
+    cache.delete("django_ai_assistant:circuit_breaker:weatherapi:open")
+
+    # Only the first caller tests the dependency, the others still fail fast:
+    assert circuit_breaker.before_call() is True
+    with pytest.raises(AICircuitOpenError):
+        circuit_breaker.before_call()
+
+    # A failed probe opens the circuit again, even if the failures expired:
+    cache.delete("django_ai_assistant:circuit_breaker:weatherapi:failures")
+    circuit_breaker.record_failure()
+    with pytest.raises(AICircuitOpenError):
+        circuit_breaker.before_call()
+
+    cache.delete("django_ai_assistant:circuit_breaker:weatherapi:open")
+    assert circuit_breaker.before_call() is True
+    circuit_breaker.record_success()
+    assert circuit_breaker.before_call() is False
+    assert circuit_breaker.before_call() is False
+
+
+@pytest.mark.asyncio
+async def test_CircuitBreaker_async_lets_a_single_probe_through_when_half_open():
+    circuit_breaker = CircuitBreaker("weatherapi", failure_threshold=1)
+    await circuit_breaker.arecord_failure()
+    await cache.adelete("django_ai_assistant:circuit_breaker:weatherapi:open")
+
+    assert await circuit_breaker.abefore_call() is True
+    with pytest.raises(AICircuitOpenError):
+        await circuit_breaker.abefore_call()
+
+    await circuit_breaker.arecord_success()
+    assert await circuit_breaker.abefore_call() is False
+
+
+def test_call_with_timeout_runs_in_shared_pool_and_closes_connections():
+    with patch("django_ai_assistant.helpers.resilience.connections") as mock_connections:
+        thread_names = {
+            call_with_timeout(lambda: threading.current_thread().name, timeout=1) for _ in range(20)
+        }
+
+    # The calls reuse the threads of the pool instead of starting one thread each:
+    assert len(thread_names) < 20
+    assert all(name.startswith("django_ai_assistant_timeout") for name in thread_names)
+    assert mock_connections.close_all.call_count == 20
+
+
+def test_call_with_timeout_skips_calls_waiting_for_busy_pool():
+    max_workers = resilience._timeout_executor._max_workers
+    started = threading.Semaphore(0)
+    release = threading.Event()
+    calls = []
+
+    def wait_for_release():
+        started.release()
+        release.wait(5)
+
+    busy = [
+        threading.Thread(target=call_with_timeout, args=(wait_for_release, 5))
+        for _ in range(max_workers)
+    ]
+    for thread in busy:
+        thread.start()
+    # Wait for all the pool threads to be busy:
+    for _ in range(max_workers):
+        assert started.acquire(timeout=5)
+
+    with pytest.raises(TimeoutError, match="The call timed out after 0.05 seconds"):
+        call_with_timeout(lambda: calls.append(1), timeout=0.05)
+    release.set()
+    for thread in busy:
+        thread.join(timeout=5)
+
+    assert calls == []
+
+
+@pytest.mark.asyncio
+async def test_acall_with_resilience_retries_timed_out_attempts():
+    calls = 0
+
+    async def slow_then_fast():
+        nonlocal calls
+        calls += 1
+        if calls == 1:
+            await asyncio.sleep(5)
+        return "OK"
+
+    result = await acall_with_resilience(
+        slow_then_fast, timeout=0.05, retry=RetryPolicy(attempts=2, backoff=0)
+    )
+
+    assert result == "OK"
+    assert calls == 2
+
+
+class FlakyChatModel(FakeToolCallingChatModel):
+    errors: list
+
+    def _generate(self, *args, **kwargs):
+        if self.errors:
+            raise self.errors.pop(0)
+        return super()._generate(*args, **kwargs)
+
+
+@pytest.fixture
+def resilient_assistant_cls():
+    class ResilientAssistant(AIAssistant):
+        id = "resilient_assistant"  # noqa: A003
+        name = "Resilient Assistant"
+        instructions = "You are a weather bot."
+        model = "gpt-4o"
+        llm_retry = RetryPolicy(attempts=2, backoff=0)
+
+        def __init__(self, responses, errors=(), **kwargs):
+            super().__init__(**kwargs)
+            self.responses = responses
+            self.errors = list(errors)
+            self.alerts_calls = 0
+
+        def get_llm(self):
+            return FlakyChatModel(responses=self.responses, errors=self.errors)
+
+        @method_tool(circuit_breaker=CircuitBreaker("weatherapi"))
+        def fetch_current_weather(self, location: str) -> str:
+            """Fetch the current weather data for a location"""
+            return f"Sunny in {location}"
+
+        @method_tool
+        def fetch_forecast_weather(self, location: str) -> str:
+            """Fetch the forecast weather data for a location"""
+            time.sleep(0.2)
+            return f"Rainy in {location}"
+
+        @method_tool(timeout=0.1, retry=RetryPolicy(attempts=2, backoff=0.2, jitter=False))
+        async def fetch_weather_alerts(self, location: str) -> str:
+            """Fetch the weather alerts for a location"""
+            self.alerts_calls += 1
+            if self.alerts_calls == 1:
+                await asyncio.sleep(5)
+            return f"No alerts in {location}"
+
+    yield ResilientAssistant
+
+    AIAssistant.get_cls_registry().pop(ResilientAssistant.id)
+
+
+def tool_call_message(name):
+    return AIMessage(
+        content="",
+        tool_calls=[
+            {"name": name, "args": {"location": "Recife"}, "id": "call_1", "type": "tool_call"}
+        ],
+    )
+
+
+def test_AIAssistant_invoke_retries_llm_calls(resilient_assistant_cls):
+    assistant = resilient_assistant_cls(
+        responses=[AIMessage(content="Hi!")], errors=[RateLimitError()]
+    )
+
+    # The first LLM call fails, and the retry succeeds:
+    assert assistant.run("Hello") == "Hi!"
+
+
+@pytest.mark.asyncio
+async def test_AIAssistant_ainvoke_times_out_each_tool_attempt(resilient_assistant_cls):
+    assistant = resilient_assistant_cls(
+        responses=[tool_call_message("fetch_weather_alerts"), AIMessage(content="No alerts.")]
+    )
+
+    response = await assistant.ainvoke({"input": "Are there weather alerts in Recife?"})
+
+    # The retry gets its own timeout, which doesn't include the backoff:
+    assert response["messages"][-2].content == "No alerts in Recife"
+    assert assistant.alerts_calls == 2
+
+
+def test_AIAssistant_invoke_returns_open_circuit_to_llm(resilient_assistant_cls):
+    cache.set("django_ai_assistant:circuit_breaker:weatherapi:open", True)
+    assistant = resilient_assistant_cls(
+        responses=[
+            tool_call_message("fetch_current_weather"),
+            AIMessage(content="The weather service is unavailable."),
+        ]
+    )
+
+    response = assistant.invoke({"input": "What's the weather in Recife?"})
+
+    assert response["messages"][-2].content == "Error: The circuit breaker 'weatherapi' is open"
+    assert response["output"] == "The weather service is unavailable."
+
+
+@pytest.mark.django_db(transaction=True)
+def test_AIAssistant_invoke_stops_after_run_timeout(resilient_assistant_cls):
+    thread = baker.make(Thread)
+    assistant = resilient_assistant_cls(
+        responses=[tool_call_message("fetch_forecast_weather"), AIMessage(content="Rainy.")]
+    )
+    assistant.run_timeout = 0.1
+
+    with pytest.raises(AIRunTimeoutError, match="The run timed out after 0.1 seconds"):
+        assistant.invoke({"input": "What's the forecast in Recife?"}, thread_id=thread.id)
+
+    run = Run.objects.get()
+    assert run.status == Run.Status.FAILED
+    assert run.error == "The run timed out after 0.1 seconds"
+    # The completed messages are saved, like in cancelled runs:
+    assert [m.type for m in thread.get_messages(include_extra_messages=True)] == [
+        "human",
+        "ai",
+        "tool",
+    ]
+
+
+@pytest.mark.asyncio
+async def test_AIAssistant_ainvoke_aborts_in_flight_calls_after_run_timeout():
+    class SlowChatModel(FakeToolCallingChatModel):
+        async def _agenerate(self, *args, **kwargs):
+            await asyncio.sleep(60)
+            return await super()._agenerate(*args, **kwargs)
+
+    class SlowAssistant(AIAssistant):
+        id = "slow_resilient_assistant"  # noqa: A003
+        name = "Slow Resilient Assistant"
+        instructions = "You are a slow bot."
+        model = "gpt-4o"
+        run_timeout = 0.1
+
+        def get_llm(self):
+            return SlowChatModel(responses=[AIMessage(content="Hi!")])
+
+    with pytest.raises(AIRunTimeoutError):
+        await asyncio.wait_for(SlowAssistant().ainvoke({"input": "Hello"}), timeout=5)
+
+    AIAssistant.get_cls_registry().pop(SlowAssistant.id)
@@ -0,0 +1,192 @@
+from typing import ClassVar
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.core.management import call_command
+
+import pytest
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from model_bakery import baker
+
+from django_ai_assistant.checks import check_retriever_index_cache
+from django_ai_assistant.helpers.retrievers import RetrieverIndex
+from django_ai_assistant.models import Thread
+
+
+class KeywordRetriever(BaseRetriever):
+    documents: list[Document]
+
+    def _get_relevant_documents(self, query, **kwargs):
+        return [document for document in self.documents if query in document.page_content]
+
+
+@pytest.fixture
+def thread_index_cls():
+    cache.clear()
+
+    class ThreadIndex(RetrieverIndex):
+        id = "thread_index"  # noqa: A003
+        model = Thread
+        indexed_pks: ClassVar[list] = []
+        builds = 0
+
+        def get_documents(self, instance):
+            self.indexed_pks.append(instance.pk)
+            return [Document(page_content=word) for word in instance.name.split()]
+
+        def build_retriever(self, documents):
+            ThreadIndex.builds += 1
+            return KeywordRetriever(documents=documents)
+
+    yield ThreadIndex
+
+    RetrieverIndex.get_cls_registry().pop(ThreadIndex.id)
+    RetrieverIndex._retrievers.pop(ThreadIndex.id, None)
+    cache.clear()
+
+
+@pytest.mark.django_db()
+def test_get_retriever_builds_index_once(thread_index_cls, django_assert_num_queries):
+    baker.make(Thread, name="Hello World")
+    baker.make(Thread, name="Goodbye")
+
+    retriever = thread_index_cls().get_retriever()
+
+    assert [d.page_content for d in retriever.invoke("World")] == ["World"]
+    with django_assert_num_queries(0):
+        assert thread_index_cls().get_retriever() is retriever
+    assert thread_index_cls.builds == 1
+
+
+@pytest.mark.django_db()
+def test_get_retriever_reuses_stored_index_in_other_processes(
+    thread_index_cls, django_assert_num_queries
+):
+    baker.make(Thread, name="Hello World")
+    thread_index_cls().get_retriever()
+    # Like another process, which didn't build the retriever yet:
+    RetrieverIndex._retrievers.clear()
+
+    with django_assert_num_queries(0):
+        retriever = thread_index_cls().get_retriever()
+
+    assert [d.page_content for d in retriever.invoke("Hello")] == ["Hello"]
+    assert thread_index_cls.indexed_pks == [Thread.objects.get().pk]
+
+
+@pytest.mark.django_db()
+def test_saved_and_deleted_rows_update_index(thread_index_cls, django_capture_on_commit_callbacks):
+    hello_thread = baker.make(Thread, name="Hello World")
+    goodbye_thread = baker.make(Thread, name="Goodbye")
+    thread_index_cls().get_retriever()
+    thread_index_cls.indexed_pks.clear()
+
+    with django_capture_on_commit_callbacks(execute=True):
+        hello_thread.name = "Hello Django"
+        hello_thread.save()
+        goodbye_thread.delete()
+
+    retriever = thread_index_cls().get_retriever()
+    assert [d.page_content for d in retriever.invoke("o")] == ["Hello", "Django"]
+    # Only the changed row was indexed again:
+    assert thread_index_cls.indexed_pks == [hello_thread.pk]
+    assert thread_index_cls.builds == 2
+
+
+@pytest.mark.django_db()
+def test_get_retriever_applies_changes_made_by_other_processes(
+    thread_index_cls, django_capture_on_commit_callbacks
+):
+    class IncrementalThreadIndex(thread_index_cls):
+        def update_retriever(self, retriever, documents, added, removed):
+            removed_ids = {doc.id for doc in removed}
+            retriever.documents = [d for d in retriever.documents if d.id not in removed_ids]
+            retriever.documents.extend(added)
+            return retriever
+
+    hello_thread = baker.make(Thread, name="Hello World")
+    goodbye_thread = baker.make(Thread, name="Goodbye")
+    unchanged_thread = baker.make(Thread, name="See you")
+    retriever = IncrementalThreadIndex().get_retriever()
+
+    # Like other processes, which changed the index after this one built its retriever:
+    with django_capture_on_commit_callbacks(execute=True):
+        hello_thread.name = "Hello Django"
+        hello_thread.save()
+        goodbye_thread.delete()
+    new_thread = baker.make(Thread, name="Good morning")
+    IncrementalThreadIndex().update([new_thread.pk])
+
+    with patch.object(cache, "get_many", wraps=cache.get_many) as mock_get_many:
+        assert IncrementalThreadIndex().get_retriever() is retriever
+
+    # Only the changed rows were read from the cache:
+    read_keys = {key for call in mock_get_many.call_args_list for key in call.args[0]}
+    assert f"django_ai_assistant:retriever_index:thread_index:row:{unchanged_thread.pk}" not in (
+        read_keys
+    )
+    assert [d.page_content for d in retriever.invoke("o")] == [
+        "you",
+        "Hello",
+        "Django",
+        "Good",
+        "morning",
+    ]
+    assert IncrementalThreadIndex.builds == 1
+
+
+@pytest.mark.django_db()
+def test_get_retriever_builds_again_when_changes_expired(thread_index_cls):
+    thread = baker.make(Thread, name="Hello World")
+    thread_index_cls().get_retriever()
+    thread_index_cls().update([thread.pk])
+    version = cache.get("django_ai_assistant:retriever_index:thread_index:version")
+    assert cache.delete(f"django_ai_assistant:retriever_index:thread_index:changes:{version}")
+
+    thread_index_cls().get_retriever()
+
+    assert thread_index_cls.builds == 2
+
+
+@pytest.mark.django_db()
+def test_ai_assistant_rebuild_indexes(thread_index_cls):
+    thread = baker.make(Thread, name="Hello World")
+    thread_index_cls().get_retriever()
+    Thread.objects.filter(id=thread.id).update(name="Goodbye")
+
+    call_command("ai_assistant_rebuild_indexes", "thread_index")
+
+    retriever = thread_index_cls().get_retriever()
+    assert [d.page_content for d in retriever.invoke("Goodbye")] == ["Goodbye"]
+
+
+@pytest.mark.django_db()
+def test_update_only_writes_changed_rows(thread_index_cls):
+    baker.make(Thread, name="Hello World")
+    thread_index_cls().get_retriever()
+    new_thread = baker.make(Thread, name="Goodbye")
+    other_thread = baker.make(Thread, name="See you")
+
+    with patch.object(cache, "set_many", wraps=cache.set_many) as mock_set_many:
+        thread_index_cls().update([new_thread.pk])
+        # Like another process, which read the index before the first update:
+        thread_index_cls().update([other_thread.pk])
+
+    assert [list(call.args[0]) for call in mock_set_many.call_args_list] == [
+        [f"django_ai_assistant:retriever_index:thread_index:row:{new_thread.pk}"],
+        [f"django_ai_assistant:retriever_index:thread_index:row:{other_thread.pk}"],
+    ]
+    retriever = thread_index_cls().get_retriever()
+    assert [d.page_content for d in retriever.invoke("o")] == ["Hello", "World", "Goodbye", "you"]
+
+
+def test_check_retriever_index_cache_warns_about_per_process_cache(thread_index_cls, settings):
+    settings.CACHES = {
+        **settings.CACHES,
+        "shared": {"BACKEND": "django.core.cache.backends.filebased.FileBasedCache"},
+    }
+
+    assert [e.id for e in check_retriever_index_cache(None)] == ["django_ai_assistant.W001"]
+    settings.AI_ASSISTANT_RETRIEVER_INDEX_CACHE = "shared"
+    assert check_retriever_index_cache(None) == []
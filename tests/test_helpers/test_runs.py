@@ -0,0 +1,140 @@
+import django
+from django.contrib.auth.models import User
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+
+import pytest
+from langchain_core.messages import AIMessage
+from model_bakery import baker
+
+from django_ai_assistant.helpers.assistants import AIAssistant
+from django_ai_assistant.helpers.runs import (
+    astream_run,
+    claim_next_run,
+    enqueue_run_with_django_tasks,
+    execute_run,
+)
+from django_ai_assistant.models import Run, Thread
+from tests.utils import FakeToolCallingChatModel
+
+
+@pytest.fixture
+def greeting_assistant_cls():
+    class GreetingAssistant(AIAssistant):
+        id = "greeting_assistant"  # noqa: A003
+        name = "Greeting Assistant"
+        instructions = "You are a greeting bot."
+        model = "gpt-4o"
+
+        def get_llm(self):
+            return FakeToolCallingChatModel(responses=[AIMessage(content="Hi!")])
+
+    yield GreetingAssistant
+
+    AIAssistant.get_cls_registry().pop(GreetingAssistant.id)
+
+
+@pytest.mark.django_db()
+def test_execute_run(greeting_assistant_cls):
+    user = baker.make(User)
+    thread = baker.make(Thread, created_by=user)
+    run = baker.make(
+        Run, thread=thread, assistant_id="greeting_assistant", created_by=user, input="Hello"
+    )
+
+    execute_run(run.id)
+
+    run.refresh_from_db()
+    assert run.status == Run.Status.SUCCEEDED
+    assert run.output == "Hi!"
+    assert run.started_at <= run.finished_at
+    assert run.node_timings[-1]["node"] == "respond"
+    assert Run.objects.count() == 1
+    assert [m.content for m in thread.get_messages()] == ["Hello", "Hi!"]
+
+
+@pytest.mark.skipif(django.VERSION < (6, 0), reason="The tasks framework requires Django 6.0+")
+@pytest.mark.django_db()
+def test_enqueue_run_with_django_tasks(greeting_assistant_cls, settings):
+    settings.TASKS = {"default": {"BACKEND": "django.tasks.backends.immediate.ImmediateBackend"}}
+    thread = baker.make(Thread)
+    run = baker.make(Run, thread=thread, assistant_id="greeting_assistant", input="Hello")
+
+    enqueue_run_with_django_tasks(run)
+
+    run.refresh_from_db()
+    assert run.status == Run.Status.SUCCEEDED
+    assert run.output == "Hi!"
+
+
+@pytest.mark.skipif(django.VERSION >= (6, 0), reason="Django 6.0+ has the tasks framework")
+@pytest.mark.django_db()
+def test_enqueue_run_with_django_tasks_requires_django_6():
+    run = baker.make(Run, thread=baker.make(Thread), assistant_id="greeting_assistant")
+
+    with pytest.raises(ImproperlyConfigured, match="requires Django 6.0+"):
+        enqueue_run_with_django_tasks(run)
+
+
+@pytest.mark.django_db()
+def test_execute_run_saves_error():
+    run = baker.make(Run, assistant_id="undefined_assistant", input="Hello")
+
+    execute_run(run.id)
+
+    run.refresh_from_db()
+    assert run.status == Run.Status.FAILED
+    assert run.error == "Assistant with id=undefined_assistant not found"
+    assert run.finished_at is not None
+
+
+@pytest.mark.django_db()
+def test_execute_run_skips_claimed_run(greeting_assistant_cls):
+    run = baker.make(Run, assistant_id="greeting_assistant", status=Run.Status.RUNNING)
+
+    assert execute_run(run.id) is None
+
+    run.refresh_from_db()
+    assert run.status == Run.Status.RUNNING
+    assert not run.thread.messages.exists()
+
+
+@pytest.mark.django_db()
+def test_claim_next_run_claims_oldest_queued_run():
+    baker.make(Run, status=Run.Status.SUCCEEDED)
+    oldest_run, newest_run = baker.make(Run, _quantity=2)
+
+    assert claim_next_run() == oldest_run
+    assert claim_next_run() == newest_run
+    assert claim_next_run() is None
+    assert set(Run.objects.values_list("status", flat=True)) == {
+        Run.Status.SUCCEEDED,
+        Run.Status.RUNNING,
+    }
+
+
+@pytest.mark.django_db()
+def test_ai_assistant_worker_executes_queued_runs(greeting_assistant_cls):
+    runs = baker.make(Run, assistant_id="greeting_assistant", input="Hello", _quantity=2)
+
+    call_command("ai_assistant_worker", "--burst")
+
+    assert set(Run.objects.values_list("status", flat=True)) == {Run.Status.SUCCEEDED}
+    assert [m.content for m in runs[1].thread.get_messages()] == ["Hello", "Hi!"]
+
+
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.asyncio
+async def test_astream_run_yields_status_changes():
+    thread = await Thread.objects.acreate(name="Run Thread")
+    run = await Run.objects.acreate(thread=thread, assistant_id="greeting_assistant")
+    statuses = []
+
+    async for streamed_run in astream_run(run, poll_interval=0):
+        statuses.append(streamed_run.status)
+        if streamed_run.status == Run.Status.QUEUED:
+            await Run.objects.filter(id=run.id).aupdate(status=Run.Status.RUNNING)
+        else:
+            await Run.objects.filter(id=run.id).aupdate(status=Run.Status.FAILED)
+
+    assert statuses == [Run.Status.QUEUED, Run.Status.RUNNING, Run.Status.FAILED]
@@ -0,0 +1,150 @@
+import asyncio
+import threading
+import time
+
+from django.core.cache import cache
+
+import pytest
+from model_bakery import baker
+
+from django_ai_assistant.helpers.assistants import AIAssistant
+from django_ai_assistant.helpers.tool_cache import ToolCache
+from django_ai_assistant.langchain.tools import method_tool
+
+
+@pytest.fixture
+def weather_assistant_cls():
+    cache.clear()
+
+    class CachedWeatherAssistant(AIAssistant):
+        id = "cached_weather_assistant"  # noqa: A003
+        name = "Cached Weather Assistant"
+        instructions = "You are a weather bot."
+        model = "gpt-4o"
+        calls = 0
+        release = threading.Event()
+
+        @method_tool(cache=600)
+        def fetch_current_weather(self, location: str) -> str:
+            """Fetch the current weather data for a location"""
+            CachedWeatherAssistant.calls += 1
+            self.release.wait(timeout=5)
+            if location == "Nowhere":
+                raise ValueError("Unknown location")
+            return f"Sunny in {location}"
+
+        @method_tool(cache=ToolCache(per_user=True, key_fn=lambda args: round(args["latitude"], 2)))
+        def find_nearby_attractions(self, latitude: float) -> str:
+            """Find nearby attractions"""
+            CachedWeatherAssistant.calls += 1
+            return f"Attractions near {latitude} for {self._user.username}"
+
+    CachedWeatherAssistant.release.set()
+    yield CachedWeatherAssistant
+
+    AIAssistant.get_cls_registry().pop(CachedWeatherAssistant.id)
+    cache.clear()
+
+
+def get_tool(assistant, name):
+    return next(tool for tool in assistant.get_tools() if tool.name == name)
+
+
+def test_method_tool_cache_reuses_results_across_instances(weather_assistant_cls):
+    first = get_tool(weather_assistant_cls(), "fetch_current_weather")
+    second = get_tool(weather_assistant_cls(), "fetch_current_weather")
+
+    assert first.invoke({"location": "Recife"}) == "Sunny in Recife"
+    assert second.invoke({"location": "Recife"}) == "Sunny in Recife"
+    assert second.invoke({"location": "Lisbon"}) == "Sunny in Lisbon"
+    assert weather_assistant_cls.calls == 2
+    assert weather_assistant_cls.fetch_current_weather._tool_cache.timeout == 600
+
+
+def test_method_tool_cache_does_not_cache_exceptions(weather_assistant_cls):
+    tool = get_tool(weather_assistant_cls(), "fetch_current_weather")
+
+    for _ in range(2):
+        with pytest.raises(ValueError, match="Unknown location"):
+            tool.invoke({"location": "Nowhere"})
+
+    assert weather_assistant_cls.calls == 2
+
+
+@pytest.mark.django_db()
+def test_method_tool_cache_uses_key_fn_and_user(weather_assistant_cls):
+    user = baker.make("auth.User", username="alice")
+    other_user = baker.make("auth.User", username="bob")
+
+    tool = get_tool(weather_assistant_cls(user=user), "find_nearby_attractions")
+    assert tool.invoke({"latitude": 40.7128}) == "Attractions near 40.7128 for alice"
+    # Same rounded latitude:
+    assert tool.invoke({"latitude": 40.7131}) == "Attractions near 40.7128 for alice"
+    other_tool = get_tool(weather_assistant_cls(user=other_user), "find_nearby_attractions")
+    assert other_tool.invoke({"latitude": 40.7128}) == "Attractions near 40.7128 for bob"
+
+    assert weather_assistant_cls.calls == 2
+
+
+def test_method_tool_cache_shares_concurrent_calls(weather_assistant_cls):
+    weather_assistant_cls.release.clear()
+    results = []
+
+    def call_tool():
+        tool = get_tool(weather_assistant_cls(), "fetch_current_weather")
+        results.append(tool.invoke({"location": "Recife"}))
+
+    threads = [threading.Thread(target=call_tool) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    # Give the other calls time to wait for the first one:
+    time.sleep(0.2)
+    weather_assistant_cls.release.set()
+    for thread in threads:
+        thread.join(timeout=5)
+
+    assert results == ["Sunny in Recife"] * 5
+    assert weather_assistant_cls.calls == 1
+
+
+def test_method_tool_cache_waits_for_calls_in_other_processes(weather_assistant_cls):
+    assistant = weather_assistant_cls()
+    key = ToolCache().make_key(assistant, "fetch_current_weather", {"location": "Recife"})
+    # Like another process running the same call:
+    cache.add(f"{key}:lock", True)
+    threading.Timer(0.2, lambda: cache.set(key, ("Cloudy in Recife",))).start()
+
+    tool = get_tool(assistant, "fetch_current_weather")
+
+    assert tool.invoke({"location": "Recife"}) == "Cloudy in Recife"
+    assert weather_assistant_cls.calls == 0
+
+
+@pytest.mark.asyncio
+async def test_async_method_tool_cache_shares_concurrent_calls():
+    cache.clear()
+
+    class AsyncCachedWeatherAssistant(AIAssistant):
+        id = "async_cached_weather_assistant"  # noqa: A003
+        name = "Async Cached Weather Assistant"
+        instructions = "You are a weather bot."
+        model = "gpt-4o"
+        calls = 0
+
+        @method_tool(cache=600)
+        async def fetch_current_weather(self, location: str) -> str:
+            """Fetch the current weather data for a location"""
+            AsyncCachedWeatherAssistant.calls += 1
+            await asyncio.sleep(0.1)
+            return f"Sunny in {location}"
+
+    tools = [get_tool(AsyncCachedWeatherAssistant(), "fetch_current_weather") for _ in range(3)]
+
+    results = await asyncio.gather(*[tool.ainvoke({"location": "Recife"}) for tool in tools])
+    results.append(await tools[0].ainvoke({"location": "Recife"}))
+
+    assert results == ["Sunny in Recife"] * 4
+    assert AsyncCachedWeatherAssistant.calls == 1
+
+    AIAssistant.get_cls_registry().pop(AsyncCachedWeatherAssistant.id)
+    cache.clear()
@@ -1,6 +1,7 @@
 from django.contrib.auth.models import User
 
 import pytest
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
 from model_bakery import baker
 
 from django_ai_assistant.exceptions import (
@@ -9,8 +10,9 @@ from django_ai_assistant.exceptions import (
 )
 from django_ai_assistant.helpers import use_cases
 from django_ai_assistant.helpers.assistants import AIAssistant
+from django_ai_assistant.helpers.django_messages import save_django_messages
 from django_ai_assistant.langchain.tools import BaseModel, Field, method_tool
-from django_ai_assistant.models import Message, Thread
+from django_ai_assistant.models import Message, Run, Thread
 
 
 # Set up
@@ -173,6 +175,116 @@ def test_create_message_raises_exception_when_user_not_allowed():
     assert str(exc_info.value) == "User is not allowed to create messages in this thread"
 
 
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.asyncio
+async def test_acreate_message_raises_exception_when_user_not_allowed():
+    user = await User.objects.acreate(username="async_user")
+    other_user = await User.objects.acreate(username="other_user")
+    thread = await Thread.objects.acreate(created_by=other_user)
+
+    with pytest.raises(AIUserNotAllowedError) as exc_info:
+        await use_cases.acreate_message(
+            "temperature_assistant",
+            thread,
+            user,
+            "Hello, will I have to use my umbrella in Lisbon tomorrow?",
+        )
+
+    assert str(exc_info.value) == "User is not allowed to create messages in this thread"
+
+
+# Run tests
+
+
+@pytest.mark.django_db(transaction=True)
+def test_create_run(settings):
+    settings.AI_ASSISTANT_ENQUEUE_RUN_FN = (
+        "django_ai_assistant.helpers.runs.enqueue_run_in_database"
+    )
+    user = baker.make(User)
+    thread = baker.make(Thread, created_by=user)
+
+    run = use_cases.create_run("temperature_assistant", thread, user, "Hello")
+
+    assert Run.objects.get() == run
+    assert run.status == Run.Status.QUEUED
+    assert (run.thread, run.assistant_id, run.created_by, run.input) == (
+        thread,
+        "temperature_assistant",
+        user,
+        "Hello",
+    )
+
+
+@pytest.mark.django_db(transaction=True)
+def test_create_run_raises_exception_when_user_not_allowed():
+    user = baker.make(User)
+    thread = baker.make(Thread)
+
+    with pytest.raises(AIUserNotAllowedError) as exc_info:
+        use_cases.create_run("temperature_assistant", thread, user, "Hello")
+
+    assert str(exc_info.value) == "User is not allowed to create messages in this thread"
+    assert not Run.objects.exists()
+
+
+@pytest.mark.django_db(transaction=True)
+def test_get_single_run():
+    user = baker.make(User)
+    run = baker.make(Run, thread__created_by=user)
+
+    assert use_cases.get_single_run(run.id, user) == run
+
+
+@pytest.mark.django_db(transaction=True)
+def test_get_single_run_raises_exception_when_user_not_allowed():
+    user = baker.make(User)
+    run = baker.make(Run)
+
+    with pytest.raises(AIUserNotAllowedError) as exc_info:
+        use_cases.get_single_run(run.id, user)
+
+    assert str(exc_info.value) == "User is not allowed to view this run"
+
+
+@pytest.mark.django_db(transaction=True)
+def test_cancel_run_cancels_queued_run():
+    user = baker.make(User)
+    run = baker.make(Run, thread__created_by=user)
+
+    run = use_cases.cancel_run(run, user)
+
+    assert run.status == Run.Status.CANCELLED
+    assert run.cancel_requested_at is not None
+    assert run.finished_at is not None
+
+
+@pytest.mark.django_db(transaction=True)
+def test_cancel_run_flags_running_run():
+    user = baker.make(User)
+    run = baker.make(Run, thread__created_by=user, status=Run.Status.RUNNING)
+
+    run = use_cases.cancel_run(run, user)
+
+    # The worker stops the run when it sees the flag:
+    assert run.status == Run.Status.RUNNING
+    assert run.cancel_requested_at is not None
+    assert run.finished_at is None
+
+
+@pytest.mark.django_db(transaction=True)
+def test_cancel_run_raises_exception_when_user_not_allowed():
+    user = baker.make(User)
+    run = baker.make(Run)
+
+    with pytest.raises(AIUserNotAllowedError) as exc_info:
+        use_cases.cancel_run(run, user)
+
+    assert str(exc_info.value) == "User is not allowed to cancel this run"
+    run.refresh_from_db()
+    assert run.cancel_requested_at is None
+
+
 # Thread tests
 
 
@@ -257,6 +369,75 @@ def test_get_threads_does_not_list_other_users_threads():
     assert len(response) == 0
 
 
+@pytest.mark.django_db(transaction=True)
+def test_get_threads_filters_in_a_single_query(django_assert_num_queries):
+    user = baker.make(User)
+    baker.make(Thread, created_by=user, _quantity=3)
+
+    with django_assert_num_queries(1):
+        response = use_cases.get_threads(user)
+
+    assert len(response) == 3
+
+
+def only_named_threads(queryset, **kwargs):
+    return queryset.exclude(name="")
+
+
+@pytest.mark.django_db(transaction=True)
+def test_get_threads_uses_filter_threads_qs_fn(settings):
+    settings.AI_ASSISTANT_FILTER_THREADS_QS_FN = (
+        "tests.test_helpers.test_use_cases.only_named_threads"
+    )
+    user = baker.make(User)
+    thread = baker.make(Thread, created_by=user, name="My thread")
+    baker.make(Thread, created_by=user, name="")
+    response = use_cases.get_threads(user)
+
+    assert response == [thread]
+
+
+def can_view_named_thread(thread, **kwargs):
+    return thread.name != ""
+
+
+@pytest.mark.django_db(transaction=True)
+def test_get_threads_falls_back_to_can_view_thread_fn(settings):
+    settings.AI_ASSISTANT_CAN_VIEW_THREAD_FN = (
+        "tests.test_helpers.test_use_cases.can_view_named_thread"
+    )
+    user = baker.make(User)
+    thread = baker.make(Thread, created_by=user, name="My thread")
+    baker.make(Thread, created_by=user, name="")
+    response = use_cases.get_threads(user)
+
+    assert response == [thread]
+
+
+@pytest.mark.django_db(transaction=True)
+def test_get_threads_with_pagination():
+    user = baker.make(User)
+    threads = baker.make(Thread, created_by=user, _quantity=5)
+    newest_first = sorted(threads, key=lambda t: (t.created_at, t.id), reverse=True)
+
+    first_page = use_cases.get_threads(user, limit=2)
+    second_page = use_cases.get_threads(user, before=first_page[-1].id, limit=2)
+    last_page = use_cases.get_threads(user, before=second_page[-1].id, limit=2)
+
+    assert first_page == newest_first[:2]
+    assert second_page == newest_first[2:4]
+    assert last_page == newest_first[4:]
+
+
+@pytest.mark.django_db(transaction=True)
+def test_get_threads_with_pagination_raises_exception_when_cursor_not_visible():
+    user = baker.make(User)
+    other_thread = baker.make(Thread)
+
+    with pytest.raises(Thread.DoesNotExist):
+        use_cases.get_threads(user, before=other_thread.id)
+
+
 @pytest.mark.django_db(transaction=True)
 def test_update_thread():
     user = baker.make(User)
@@ -312,6 +493,63 @@ def test_get_thread_messages():
     assert len(response) == 3
 
 
+@pytest.mark.django_db(transaction=True)
+def test_get_thread_messages_filters_out_tool_calls():
+    user = baker.make(User)
+    thread = baker.make(Thread, created_by=user)
+    save_django_messages(
+        [
+            HumanMessage(content="What's the temperature?"),
+            AIMessage(
+                content="",
+                tool_calls=[{"name": "fetch_current_temperature", "args": {}, "id": "call_1"}],
+            ),
+            ToolMessage(content="32 degrees Celsius", tool_call_id="call_1"),
+            AIMessage(content="It's 32 degrees Celsius."),
+        ],
+        thread=thread,
+    )
+    response = use_cases.get_thread_messages(thread, user)
+
+    assert [(m.type, m.content) for m in response] == [
+        ("human", "What's the temperature?"),
+        ("ai", "It's 32 degrees Celsius."),
+    ]
+
+
+@pytest.mark.django_db(transaction=True)
+def test_get_thread_message_dicts_with_pagination():
+    user = baker.make(User)
+    thread = baker.make(Thread, created_by=user)
+    messages = save_django_messages([HumanMessage(content=str(i)) for i in range(5)], thread=thread)
+
+    def contents(message_dicts):
+        return [m["data"]["content"] for m in message_dicts]
+
+    assert contents(use_cases.get_thread_message_dicts(thread, user, limit=2)) == ["3", "4"]
+    assert contents(
+        use_cases.get_thread_message_dicts(thread, user, before=messages[3].id, limit=2)
+    ) == ["1", "2"]
+    assert contents(
+        use_cases.get_thread_message_dicts(thread, user, after=messages[0].id, limit=2)
+    ) == ["1", "2"]
+    assert contents(
+        use_cases.get_thread_message_dicts(
+            thread, user, after=messages[0].id, before=messages[4].id
+        )
+    ) == ["1", "2", "3"]
+
+
+@pytest.mark.django_db(transaction=True)
+def test_get_thread_message_dicts_raises_exception_when_cursor_not_in_thread():
+    user = baker.make(User)
+    thread = baker.make(Thread, created_by=user)
+    other_message = baker.make(Message, message={"type": "human", "data": {"content": "hi"}})
+
+    with pytest.raises(Message.DoesNotExist):
+        use_cases.get_thread_message_dicts(thread, user, before=other_message.id)
+
+
 @pytest.mark.django_db(transaction=True)
 def test_get_thread_messages_raises_exception_when_user_not_allowed():
     user = baker.make(User)
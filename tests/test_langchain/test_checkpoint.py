@@ -0,0 +1,223 @@
+from unittest.mock import patch
+
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage
+from langgraph.checkpoint.base import empty_checkpoint
+from model_bakery import baker
+
+from django_ai_assistant.helpers.assistants import AIAssistant
+from django_ai_assistant.langchain.checkpoint import DjangoCheckpointSaver
+from django_ai_assistant.models import Checkpoint, CheckpointBlob, CheckpointWrite, Message, Thread
+from tests.utils import FakeToolCallingChatModel
+
+
+def make_config(thread, checkpoint_id=None):
+    configurable = {"thread_id": str(thread.id), "checkpoint_ns": ""}
+    if checkpoint_id:
+        configurable["checkpoint_id"] = checkpoint_id
+    return {"configurable": configurable}
+
+
+def put_checkpoint(saver, thread, checkpoint_id, values, versions, parent_id=None):
+    checkpoint = empty_checkpoint()
+    checkpoint["id"] = checkpoint_id
+    checkpoint["channel_values"] = values
+    checkpoint["channel_versions"] = versions
+    return saver.put(
+        make_config(thread, parent_id),
+        checkpoint,
+        {"source": "loop", "step": int(checkpoint_id[-1])},
+        new_versions={k: v for k, v in versions.items() if k in values},
+    )
+
+
+@pytest.mark.django_db()
+def test_DjangoCheckpointSaver_put_and_get_tuple():
+    thread = baker.make(Thread)
+    saver = DjangoCheckpointSaver()
+
+    config = put_checkpoint(
+        saver,
+        thread,
+        "checkpoint-1",
+        {"messages": [HumanMessage(content="Hello", id="1")], "input": "Hello"},
+        {"messages": "1", "input": "1"},
+    )
+    saver.put_writes(config, [("messages", [AIMessage(content="Hi!", id="2")])], task_id="task-1")
+
+    checkpoint_tuple = saver.get_tuple(make_config(thread))
+
+    assert checkpoint_tuple.config == make_config(thread, "checkpoint-1")
+    assert checkpoint_tuple.checkpoint["channel_values"] == {
+        "messages": [HumanMessage(content="Hello", id="1")],
+        "input": "Hello",
+    }
+    assert checkpoint_tuple.metadata == {"source": "loop", "step": 1}
+    assert checkpoint_tuple.parent_config is None
+    assert checkpoint_tuple.pending_writes == [
+        ("task-1", "messages", [AIMessage(content="Hi!", id="2")])
+    ]
+
+
+@pytest.mark.django_db()
+def test_DjangoCheckpointSaver_reuses_blobs_of_unchanged_channels():
+    thread = baker.make(Thread)
+    saver = DjangoCheckpointSaver(keep_last=None)
+
+    put_checkpoint(saver, thread, "checkpoint-1", {"input": "Hello"}, {"input": "1"})
+    put_checkpoint(
+        saver,
+        thread,
+        "checkpoint-2",
+        {"output": "Hi!"},
+        {"input": "1", "output": "1"},
+        parent_id="checkpoint-1",
+    )
+
+    checkpoint_tuple = saver.get_tuple(make_config(thread))
+
+    assert CheckpointBlob.objects.count() == 2
+    assert checkpoint_tuple.checkpoint["channel_values"] == {"input": "Hello", "output": "Hi!"}
+    assert checkpoint_tuple.parent_config == make_config(thread, "checkpoint-1")
+
+
+@pytest.mark.django_db()
+def test_DjangoCheckpointSaver_prunes_old_checkpoints(django_assert_num_queries):
+    thread = baker.make(Thread)
+    saver = DjangoCheckpointSaver(keep_last=2)
+
+    for i in range(1, 4):
+        config = put_checkpoint(
+            saver, thread, f"checkpoint-{i}", {"input": f"Hello {i}"}, {"input": str(i)}
+        )
+        saver.put_writes(config, [("output", f"Hi {i}")], task_id=f"task-{i}")
+    assert Checkpoint.objects.count() == 3
+
+    saver.prune(str(thread.id))
+
+    assert list(Checkpoint.objects.values_list("checkpoint_id", flat=True)) == [
+        "checkpoint-2",
+        "checkpoint-3",
+    ]
+    assert list(CheckpointBlob.objects.values_list("version", flat=True)) == ["2", "3"]
+    assert list(CheckpointWrite.objects.values_list("task_id", flat=True)) == ["task-2", "task-3"]
+
+    # Nothing older than the kept checkpoints, so no delete queries:
+    with django_assert_num_queries(1):
+        saver.prune(str(thread.id))
+
+
+@pytest.mark.django_db()
+def test_DjangoCheckpointSaver_list():
+    thread = baker.make(Thread)
+    saver = DjangoCheckpointSaver(keep_last=None)
+    for i in range(1, 4):
+        put_checkpoint(saver, thread, f"checkpoint-{i}", {"input": f"Hello {i}"}, {"input": str(i)})
+
+    checkpoint_ids = [
+        t.config["configurable"]["checkpoint_id"]
+        for t in saver.list(
+            make_config(thread), before=make_config(thread, "checkpoint-3"), limit=1
+        )
+    ]
+    filtered_checkpoint_ids = [
+        t.config["configurable"]["checkpoint_id"]
+        for t in saver.list(make_config(thread), filter={"step": 1})
+    ]
+
+    assert checkpoint_ids == ["checkpoint-2"]
+    assert filtered_checkpoint_ids == ["checkpoint-1"]
+
+
+@pytest.mark.django_db()
+def test_DjangoCheckpointSaver_delete_thread():
+    thread = baker.make(Thread)
+    other_thread = baker.make(Thread)
+    saver = DjangoCheckpointSaver()
+    put_checkpoint(saver, thread, "checkpoint-1", {"input": "Hello"}, {"input": "1"})
+    put_checkpoint(saver, other_thread, "checkpoint-1", {"input": "Hello"}, {"input": "1"})
+
+    saver.delete_thread(str(thread.id))
+
+    assert saver.get_tuple(make_config(thread)) is None
+    assert saver.get_tuple(make_config(other_thread)) is not None
+
+
+@pytest.fixture
+def checkpointed_assistant_cls():
+    class CheckpointedAssistant(AIAssistant):
+        id = "checkpointed_assistant"  # noqa: A003
+        name = "Checkpointed Assistant"
+        instructions = "You are a helpful assistant."
+        model = "gpt-4o"
+        checkpointer = DjangoCheckpointSaver()
+
+        def get_llm(self):
+            return FakeToolCallingChatModel(
+                responses=[AIMessage(content="Hi!"), AIMessage(content="Bye!")]
+            )
+
+    yield CheckpointedAssistant
+
+    AIAssistant.clear_cls_registry()
+
+
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.asyncio
+async def test_AIAssistant_with_checkpointer_resumes_from_checkpoint(checkpointed_assistant_cls):
+    thread = await Thread.objects.acreate(name="Checkpointed Thread")
+    assistant = checkpointed_assistant_cls()
+    await assistant.arun("Hello", thread_id=thread.id)
+
+    with patch.object(assistant, "aget_history_messages") as aget_history_messages:
+        response = await assistant.ainvoke({"input": "Goodbye"}, thread_id=thread.id)
+
+    aget_history_messages.assert_not_called()
+    assert [(m.type, m.content) for m in response["messages"]] == [
+        ("system", "You are a helpful assistant."),
+        ("human", "Hello"),
+        ("ai", "Hi!"),
+        ("human", "Goodbye"),
+        ("ai", "Bye!"),
+    ]
+    stored_messages = await thread.aget_messages(include_extra_messages=True)
+    assert [m.content for m in stored_messages] == ["Hello", "Hi!", "Goodbye", "Bye!"]
+    assert await Checkpoint.objects.acount() == 1
+
+
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.asyncio
+async def test_AIAssistant_with_checkpointer_prunes_checkpoints_once_per_run(
+    checkpointed_assistant_cls,
+):
+    thread = await Thread.objects.acreate(name="Checkpointed Thread")
+    assistant = checkpointed_assistant_cls()
+
+    with patch.object(DjangoCheckpointSaver, "aprune", autospec=True) as aprune:
+        await assistant.ainvoke({"input": "Hello"}, thread_id=thread.id)
+
+    aprune.assert_awaited_once_with(checkpointed_assistant_cls.checkpointer, str(thread.id))
+    assert await Checkpoint.objects.acount() > 1
+
+    await assistant.ainvoke({"input": "Goodbye"}, thread_id=thread.id)
+
+    assert await Checkpoint.objects.acount() == 1
+
+
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.asyncio
+async def test_AIAssistant_with_checkpointer_reloads_history_when_thread_changed(
+    checkpointed_assistant_cls,
+):
+    thread = await Thread.objects.acreate(name="Checkpointed Thread")
+    assistant = checkpointed_assistant_cls()
+    await assistant.arun("Hello", thread_id=thread.id)
+    await Message.objects.filter(thread=thread).adelete()
+
+    response = await assistant.ainvoke({"input": "Goodbye"}, thread_id=thread.id)
+
+    assert [(m.type, m.content) for m in response["messages"]] == [
+        ("system", "You are a helpful assistant."),
+        ("human", "Goodbye"),
+        ("ai", "Bye!"),
+    ]
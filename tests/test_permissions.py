@@ -4,7 +4,7 @@ import pytest
 from model_bakery import baker
 
 from django_ai_assistant.models import Thread
-from django_ai_assistant.permissions import owns_thread
+from django_ai_assistant.permissions import filter_owned_threads, owns_thread
 
 
 @pytest.fixture()
@@ -30,3 +30,12 @@ def test_owns_thread(superuser, regular_user):
     thread = baker.make(Thread, name="BBB", created_by=regular_user)
     assert owns_thread(superuser, thread)
     assert owns_thread(regular_user, thread)
+
+
+@pytest.mark.django_db()
+def test_filter_owned_threads(superuser, regular_user):
+    thread_a = baker.make(Thread, name="AAA")
+    thread_b = baker.make(Thread, name="BBB", created_by=regular_user)
+
+    assert set(filter_owned_threads(Thread.objects.all(), superuser)) == {thread_a, thread_b}
+    assert list(filter_owned_threads(Thread.objects.all(), regular_user)) == [thread_b]
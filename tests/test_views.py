@@ -1,17 +1,20 @@
+import json
 from http import HTTPStatus
 
 from django.contrib.auth.models import User
 from django.urls import reverse
 
 import pytest
-from langchain_core.messages import HumanMessage
+from asgiref.sync import async_to_sync
+from langchain_core.messages import AIMessage, HumanMessage
 from model_bakery import baker
 
 from django_ai_assistant import PACKAGE_NAME, VERSION
 from django_ai_assistant.helpers.assistants import AIAssistant
 from django_ai_assistant.helpers.django_messages import save_django_messages
 from django_ai_assistant.langchain.tools import BaseModel, Field, method_tool
-from django_ai_assistant.models import Message, Thread
+from django_ai_assistant.models import Message, Run, Thread
+from tests.utils import FakeToolCallingChatModel
 
 
 # Set up
@@ -51,6 +54,10 @@ def setup_assistants():
     AIAssistant.clear_cls_registry()
 
 
+async def read_streaming_content(response):
+    return b"".join([chunk async for chunk in response.streaming_content])
+
+
 @pytest.fixture
 def authenticated_client(client):
     User.objects.create_user(username="testuser", password="password")
@@ -159,6 +166,40 @@ def test_list_threads_with_assistant_id(authenticated_client):
     assert all(thread["assistant_id"] == assistant_id for thread in response.json())
 
 
+@pytest.mark.django_db(transaction=True)
+def test_list_threads_with_pagination(authenticated_client):
+    user = User.objects.first()
+    threads = baker.make(Thread, created_by=user, _quantity=3)
+    newest_first = sorted(threads, key=lambda t: (t.created_at, t.id), reverse=True)
+    response = authenticated_client.get(
+        reverse("django_ai_assistant:threads_list_create"),
+        data={"before": newest_first[0].id, "limit": 1},
+    )
+
+    assert response.status_code == HTTPStatus.OK
+    assert [thread["id"] for thread in response.json()] == [newest_first[1].id]
+
+
+@pytest.mark.django_db(transaction=True)
+def test_list_threads_with_pagination_cursor_that_does_not_exist(authenticated_client):
+    response = authenticated_client.get(
+        reverse("django_ai_assistant:threads_list_create"),
+        data={"before": 1000000},
+    )
+
+    assert response.status_code == HTTPStatus.NOT_FOUND
+
+
+@pytest.mark.django_db(transaction=True)
+def test_list_threads_with_pagination_malformed_cursor(authenticated_client):
+    response = authenticated_client.get(
+        reverse("django_ai_assistant:threads_list_create"),
+        data={"before": "abc"},
+    )
+
+    assert response.status_code == HTTPStatus.NOT_FOUND
+
+
 @pytest.mark.django_db(transaction=True)
 def test_does_not_list_other_users_threads(authenticated_client):
     baker.make(Thread)
@@ -332,6 +373,45 @@ def test_list_thread_messages(authenticated_client):
     assert len(response.json()) == 1
 
 
+@pytest.mark.django_db(transaction=True)
+def test_list_thread_messages_with_pagination(authenticated_client):
+    thread = baker.make(Thread, created_by=User.objects.first())
+    messages = save_django_messages(
+        [HumanMessage(content="Hello"), AIMessage(content="Hi!"), HumanMessage(content="Bye")],
+        thread=thread,
+    )
+    response = authenticated_client.get(
+        reverse("django_ai_assistant:messages_list_create", kwargs={"thread_id": thread.id}),
+        data={"before": messages[2].id, "limit": 1},
+    )
+
+    assert response.status_code == HTTPStatus.OK
+    assert response.json() == [{"id": str(messages[1].id), "type": "ai", "content": "Hi!"}]
+
+
+@pytest.mark.django_db(transaction=True)
+def test_list_thread_messages_with_pagination_cursor_that_does_not_exist(authenticated_client):
+    thread = baker.make(Thread, created_by=User.objects.first())
+    response = authenticated_client.get(
+        reverse("django_ai_assistant:messages_list_create", kwargs={"thread_id": thread.id}),
+        data={"after": 1000000},
+    )
+
+    assert response.status_code == HTTPStatus.NOT_FOUND
+
+
+@pytest.mark.parametrize("cursor", ["before", "after"])
+@pytest.mark.django_db(transaction=True)
+def test_list_thread_messages_with_pagination_malformed_cursor(authenticated_client, cursor):
+    thread = baker.make(Thread, created_by=User.objects.first())
+    response = authenticated_client.get(
+        reverse("django_ai_assistant:messages_list_create", kwargs={"thread_id": thread.id}),
+        data={cursor: "abc"},
+    )
+
+    assert response.status_code == HTTPStatus.NOT_FOUND
+
+
 @pytest.mark.django_db(transaction=True)
 def test_does_not_list_thread_messages_if_not_thread_user(authenticated_client):
     thread = baker.make(Thread, created_by=baker.make(User))
@@ -372,6 +452,97 @@ def test_create_thread_message(authenticated_client):
     )
 
 
+@pytest.mark.django_db(transaction=True)
+def test_stream_thread_message(authenticated_client):
+    class StreamingTemperatureAssistant(AIAssistant):
+        id = "streaming_temperature_assistant"  # noqa: A003
+        name = "Streaming Temperature Assistant"
+        instructions = "You are a temperature bot."
+        model = "gpt-4o"
+
+        def get_llm(self):
+            return FakeToolCallingChatModel(
+                responses=[
+                    AIMessage(
+                        content="",
+                        tool_calls=[
+                            {
+                                "name": "fetch_current_temperature",
+                                "args": {"location": "Recife"},
+                                "id": "call_1",
+                                "type": "tool_call",
+                            }
+                        ],
+                    ),
+                    AIMessage(content="It is 32 degrees Celsius in Recife."),
+                ]
+            )
+
+        @method_tool
+        def fetch_current_temperature(self, location: str) -> str:
+            """Fetch the current temperature data for a location"""
+            return "32 degrees Celsius"
+
+    thread = baker.make(Thread, created_by=User.objects.first())
+    response = authenticated_client.post(
+        reverse("django_ai_assistant:messages_stream", kwargs={"thread_id": thread.id}),
+        data={
+            "content": "What is the temperature in Recife?",
+            "assistant_id": "streaming_temperature_assistant",
+        },
+        content_type="application/json",
+    )
+
+    assert response.status_code == HTTPStatus.OK
+    assert response["Content-Type"] == "text/event-stream"
+    body = async_to_sync(read_streaming_content)(response).decode()
+    events = [
+        (
+            event.split("\n")[0].removeprefix("event: "),
+            json.loads(event.split("\n")[1].removeprefix("data: ")),
+        )
+        for event in body.strip().split("\n\n")
+    ]
+    ai_message = Message.objects.order_by("created_at").last()
+
+    assert events == [
+        (
+            "tool_call_start",
+            {"id": "call_1", "name": "fetch_current_temperature", "args": {"location": "Recife"}},
+        ),
+        (
+            "tool_call_end",
+            {"id": "call_1", "name": "fetch_current_temperature", "content": "32 degrees Celsius"},
+        ),
+        ("token", {"content": "It is 32 degrees Celsius in Recife."}),
+        (
+            "message",
+            {
+                "id": str(ai_message.id),
+                "type": "ai",
+                "content": "It is 32 degrees Celsius in Recife.",
+            },
+        ),
+    ]
+    assert len(thread.get_messages(include_extra_messages=True)) == 4
+
+
+@pytest.mark.django_db(transaction=True)
+def test_cannot_stream_thread_message_in_other_users_threads(authenticated_client):
+    thread = baker.make(Thread)
+    response = authenticated_client.post(
+        reverse("django_ai_assistant:messages_stream", kwargs={"thread_id": thread.id}),
+        data={
+            "content": "What is the temperature in Recife?",
+            "assistant_id": "temperature_assistant",
+        },
+        content_type="application/json",
+    )
+
+    assert response.status_code == HTTPStatus.FORBIDDEN
+    assert not Message.objects.filter(thread=thread).exists()
+
+
 # DELETE
 
 
@@ -398,3 +569,130 @@ def test_delete_thread_message(authenticated_client):
 
     assert response.status_code == HTTPStatus.NO_CONTENT
     assert not Message.objects.filter(id=message.id).exists()
+
+
+# Run Views
+
+
+@pytest.mark.django_db(transaction=True)
+def test_create_thread_run(authenticated_client):
+    class GreetingAssistant(AIAssistant):
+        id = "greeting_assistant"  # noqa: A003
+        name = "Greeting Assistant"
+        instructions = "You are a greeting bot."
+        model = "gpt-4o"
+
+        def get_llm(self):
+            return FakeToolCallingChatModel(responses=[AIMessage(content="Hi!")])
+
+    thread = baker.make(Thread, created_by=User.objects.first())
+    response = authenticated_client.post(
+        reverse("django_ai_assistant:runs_create", kwargs={"thread_id": thread.id}),
+        data={"content": "Hello", "assistant_id": "greeting_assistant"},
+        content_type="application/json",
+    )
+
+    run = Run.objects.get()
+    assert response.status_code == HTTPStatus.ACCEPTED
+    assert response.json()["id"] == run.id
+    assert response.json()["thread"] == thread.id
+    # The test settings use the inline execution backend, so the run is already finished:
+    assert run.status == Run.Status.SUCCEEDED
+    assert run.output == "Hi!"
+    assert [m.content for m in thread.get_messages()] == ["Hello", "Hi!"]
+
+
+@pytest.mark.django_db(transaction=True)
+def test_cannot_create_run_in_other_users_threads(authenticated_client):
+    thread = baker.make(Thread)
+    response = authenticated_client.post(
+        reverse("django_ai_assistant:runs_create", kwargs={"thread_id": thread.id}),
+        data={"content": "Hello", "assistant_id": "temperature_assistant"},
+        content_type="application/json",
+    )
+
+    assert response.status_code == HTTPStatus.FORBIDDEN
+    assert not Run.objects.exists()
+
+
+@pytest.mark.django_db()
+def test_get_run(authenticated_client):
+    run = baker.make(
+        Run,
+        thread__created_by=User.objects.first(),
+        status=Run.Status.FAILED,
+        error="Something went wrong",
+    )
+    response = authenticated_client.get(
+        reverse("django_ai_assistant:run_detail_cancel", kwargs={"run_id": run.id})
+    )
+
+    assert response.status_code == HTTPStatus.OK
+    assert response.json()["status"] == "failed"
+    assert response.json()["error"] == "Something went wrong"
+    assert response.json()["node_timings"] == []
+    assert response.json()["token_usage"] is None
+
+
+@pytest.mark.django_db()
+def test_get_run_that_does_not_exist(authenticated_client):
+    response = authenticated_client.get(
+        reverse("django_ai_assistant:run_detail_cancel", kwargs={"run_id": 1000})
+    )
+
+    assert response.status_code == HTTPStatus.NOT_FOUND
+
+
+@pytest.mark.django_db()
+def test_cannot_get_other_users_runs(authenticated_client):
+    run = baker.make(Run)
+    response = authenticated_client.get(
+        reverse("django_ai_assistant:run_detail_cancel", kwargs={"run_id": run.id})
+    )
+
+    assert response.status_code == HTTPStatus.FORBIDDEN
+
+
+@pytest.mark.django_db()
+def test_cancel_run(authenticated_client):
+    run = baker.make(Run, thread__created_by=User.objects.first())
+    response = authenticated_client.delete(
+        reverse("django_ai_assistant:run_detail_cancel", kwargs={"run_id": run.id})
+    )
+
+    assert response.status_code == HTTPStatus.ACCEPTED
+    assert response.json()["status"] == "cancelled"
+    run.refresh_from_db()
+    assert run.status == Run.Status.CANCELLED
+
+
+@pytest.mark.django_db()
+def test_cannot_cancel_other_users_runs(authenticated_client):
+    run = baker.make(Run)
+    response = authenticated_client.delete(
+        reverse("django_ai_assistant:run_detail_cancel", kwargs={"run_id": run.id})
+    )
+
+    assert response.status_code == HTTPStatus.FORBIDDEN
+    run.refresh_from_db()
+    assert run.status == Run.Status.QUEUED
+
+
+@pytest.mark.django_db(transaction=True)
+def test_stream_run(authenticated_client):
+    run = baker.make(
+        Run,
+        thread__created_by=User.objects.first(),
+        status=Run.Status.SUCCEEDED,
+        output="Hi!",
+    )
+    response = authenticated_client.get(
+        reverse("django_ai_assistant:run_stream", kwargs={"run_id": run.id})
+    )
+
+    assert response.status_code == HTTPStatus.OK
+    assert response["Content-Type"] == "text/event-stream"
+    body = async_to_sync(read_streaming_content)(response).decode()
+    event, data = body.strip().split("\n")
+    assert event == "event: status"
+    assert json.loads(data.removeprefix("data: "))["output"] == "Hi!"
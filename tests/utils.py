@@ -1,3 +1,6 @@
+from langchain_core.language_models.fake_chat_models import FakeMessagesListChatModel
+
+
 class DictSubSet:
     def __init__(self, items: dict):
         self.items = items
@@ -7,3 +10,8 @@ class DictSubSet:
 
     def __repr__(self):
         return repr(self.items)
+
+
+class FakeToolCallingChatModel(FakeMessagesListChatModel):
+    def bind_tools(self, tools, **kwargs):
+        return self